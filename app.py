@@ -1,13 +1,22 @@
-import time
-
+import contextlib
+import threading
+import uuid
 import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
-from sw_prediction_file import predict_booked_days, load_data
-from sa_simulation_file import update_columns_by_fee_change, calculate_revenue
-import altair as alt
-import folium
-from streamlit_folium import st_folium
-from grid_search_for_best_fee import grid_search_optimal_fee
+import numpy as np
+from sw_prediction_file import load_data, download_predict_model, MODEL_PATH, MEMBERS, DEFAULT_WEIGHTS
+from incremental_features import feature_cache_dir
+from simulation_cache import SimulationCache, simulation_key
+from optimization_jobs import JobManager, JobStore, surface_optimization_task, surface_build_task
+from model_registry import registry
+from dataset_store import load_locations, dataset_source_key
+from spatial_index import GridIndex
+from profiling import profiler, span, capture
+from prediction_service import PredictionService, SCENARIO_FEE_MAP
+from city_registry import CityRegistry, DEFAULT_CITY, prewarm_from_env
+import warmup
 
 st.set_page_config(
     page_title="구해줘 숙소",
@@ -16,6 +25,14 @@ st.set_page_config(
 )
 if "page" not in st.session_state:
     st.session_state.page = "home"
+
+# 성능 계측 기록에 붙일 세션 태그 (Streamlit 세션 ID, 세션이 끝나면 계측을 끄고 기록을 지울 때 씀)
+if "profile_session" not in st.session_state:
+    ctx = get_script_run_ctx()
+    st.session_state.profile_session = ctx.session_id if ctx is not None else uuid.uuid4().hex[:12]
+# 끝난 세션의 계측 태그/기록 정리
+if Runtime.exists():
+    profiler.prune_sessions(Runtime.instance().is_active_session)
 if "selected_city" not in st.session_state:
     st.session_state.selected_city = None
 
@@ -24,8 +41,24 @@ def go_to(page_name):
     st.session_state.page = page_name
     st.rerun()
 
+# 전체 숙소 마커 데이터: 데이터마다 한 번만 생성 (모든 세션이 읽기만 함)
+# 지도(folium 객체)는 st_folium 이 렌더하면서 바꾸므로 공유하지 않고 렌더할 때마다 새로 만듦
+@st.cache_resource(show_spinner=False)
+def get_marker_payload(dataset_key, _location_df):
+    from map_view import marker_payload
+    return marker_payload(_location_df)
+
+# 숙소 위치 격자 인덱스 (화면 안 숙소 찾기 등): 데이터마다 한 번만 생성
+@st.cache_resource(show_spinner=False)
+def get_spatial_index(dataset_key, _location_df):
+    return GridIndex.from_frame(_location_df)
+
 def show_map():
-    location_df = pd.read_csv('assets/inside_airbnb_location.csv').iloc[:200, :]
+    # folium/streamlit_folium 은 지도 페이지에서만 import (다른 페이지 첫 요청이 느려지지 않게)
+    from streamlit_folium import st_folium
+    from map_view import listing_map, viewport_layer
+    location_path = get_city_registry().cities[DEFAULT_CITY].location_path
+    location_df = load_locations(location_path)
     st.title("🌍 Airbnb 숙소 한 눈에 보기")
     st.markdown("""
     <div style="padding: 15px 20px;border-radius: 10px; ">
@@ -49,40 +82,174 @@ def show_map():
     </div>
     """, unsafe_allow_html=True)
     st.markdown("---")
-    map_center = [location_df["latitude"].mean(), location_df["longitude"].mean()]
-    m = folium.Map(location=map_center, zoom_start=12)
-
-    # 마커 추가
-    for _, row in location_df.iterrows():
-        folium.Marker(
-            location=[row["latitude"], row["longitude"]],
-            icon=folium.DivIcon(html='<div style="font-size:18px;">🏘️</div>'),
-            popup=folium.Popup(
-                html=f'<a href="{row["listing_url"]}" target="_blank" '
-                     f'style="font-size:15px; white-space:nowrap; display:inline;">🔗 URL</a>',
-            )
-        ).add_to(m)
-
-    # Streamlit에 지도 출력
-    st_folium(m, use_container_width=True, height=600)
-    # st.markdown(f"<p style='text-align:right; color:gray;'>표시된 숙소 수: <b>{len(location_df):,}</b>개</p>", unsafe_allow_html=True)
-
-def show_city_fee():
-    df = load_data()
-    df = df[df['host_days'] >= 365].copy()
-    with st.spinner("⏳ 매출 증진을 위한 최적의 수수료 탐색 중입니다..."):
-        # best_fee_map = grid_search_optimal_fee(df)
-
-        # 🏆 최적 수수료 비율 (short, mid, long): 2.30%, 3.10%, 4.10%
-        # ✅ 최적 Airbnb 수익: $53,949,471
-        # ✅ 해당 호스트 수익: $1,555,860,442
-
-        time.sleep(11)
-        best_fee_map = {
-            'high': 3.0,
-            'mid': 3.2,
-            'low': 4.0
-        }
+    # 전체 숙소를 클러스터로 표시 (마커 데이터는 한 번만 만들어 모든 세션이 공유)
+    # "현재 화면 안 숙소만" 을 고르면 지도를 움직일 때마다 화면 안 숙소만 다시 보냄
+    viewport_only = st.toggle("현재 화면 안의 숙소만 불러오기", value=False)
+    dataset_key = dataset_source_key(location_path)
+    if viewport_only:
+        bounds = (st.session_state.get('listing_map_viewport') or {}).get('bounds')
+        group, shown = viewport_layer(location_df, bounds, index=get_spatial_index(dataset_key, location_df))
+        with span('render.folium', shown):
+            m = listing_map(location_df, with_markers=False)
+            st_folium(m, key='listing_map_viewport', feature_group_to_add=group, returned_objects=['bounds'],
+                      use_container_width=True, height=600)
+    else:
+        shown = len(location_df)
+        with span('render.folium', shown):
+            m = listing_map(location_df, payload=get_marker_payload(dataset_key, location_df))
+            st_folium(m, returned_objects=[], use_container_width=True, height=600)
+    st.markdown(f"<p style='text-align:right; color:gray;'>표시된 숙소 수: <b>{shown:,}</b>개</p>", unsafe_allow_html=True)
+
+# 조건을 만족하는 조합이 없을 때 보여줄 기본 수수료
+DEFAULT_FEE_MAP = {
+    'high': 3.0,
+    'mid': 3.2,
+    'low': 4.0
+}
+
+# 사이드바 가중치 슬라이더 이름
+MEMBER_LABELS = {
+    'rf': '랜덤 포레스트',
+    'lgb': 'LightGBM',
+    'gb': '그래디언트 부스팅',
+    'knn': 'KNN'
+}
+
+# 최적 수수료 탐색 작업: 모든 세션이 공유, 같은 (데이터, 모델) 작업은 한 번만 실행하고 결과는 디스크에 저장
+@st.cache_resource(show_spinner=False)
+def get_job_manager():
+    return JobManager(store=JobStore('.cache/jobs'))
+
+# 내린 도시의 매출 곡면을 놓고, 곡면만 만드는 작업(persist=False)은 목록에서 뺌 (작업이 도시 데이터를 붙잡고 있지 않게)
+def release_city_jobs(name):
+    jobs = get_job_manager()
+    jobs.release_values(lambda key: key[0] in ('best_fee_map', 'revenue_surface') and key[-1] == name)
+    jobs.drop(lambda key: key[0] == 'revenue_surface' and key[-1] == name)
+
+# 도시별 데이터/모델: 처음 선택할 때 올리고 상주 메모리 상한을 넘으면 오래 안 쓴 도시부터 내림
+# 내린 도시의 매출 곡면(작업이 들고 있는 것, 상주 메모리에 같이 셈)도 같이 놓음
+# PREWARM_CITIES 환경변수에 적은 도시는 시작할 때 백그라운드로 미리 올림
+@st.cache_resource(show_spinner=False)
+def get_city_registry():
+    cities = CityRegistry()
+    cities.on_evict(release_city_jobs)
+    prewarm_from_env(cities)
+    return cities
+
+# 곡면을 만드는 작업: 다 만든 곡면의 메모리는 그 도시 몫으로 셈 (CITY_MEMORY_MB 상한에 포함)
+# 만드는 사이 도시가 내려갔으면 곡면을 바로 놓음
+def charged_to_city(cities, city_name, task):
+    def run(job):
+        result = task(job)
+        if job.value is not None and not cities.charge(city_name, job.key, job.value.nbytes):
+            job.value = None
+        return result
+    return run
+
+# 그룹별 매출 곡면은 (데이터, 모델, 도시)마다 작업 관리자가 들고 모든 세션이 공유 (데이터 지문 + 모델 지문으로 구분)
+# 최적 수수료 탐색 작업이 만든 곡면이 있으면 그 작업을, 없으면 (재시작 후 저장된 결과만 읽은 경우, 도시가 내려가 곡면을 놓은 경우)
+# 곡면만 다시 만드는 백그라운드 작업을 돌려줌 -> job.value 가 곡면 (아직 만드는 중이면 None)
+def get_surface_job(dataset_key, model_key, city, view):
+    jobs = get_job_manager()
+    job = jobs.get(('best_fee_map', dataset_key, model_key, city.name))
+    if job is not None and job.value is not None:
+        return job
+    task = surface_build_task(view.frame, model_path=city.model_path,
+                              features_dir=feature_cache_dir(dataset_key, model_key))
+    task = charged_to_city(get_city_registry(), city.name, task)
+    return jobs.submit(('revenue_surface', dataset_key, model_key, city.name), task, persist=False)
+
+def show_optimization_progress(job_key, message="⏳ 매출 증진을 위한 최적의 수수료 탐색 중입니다...", cancellable=True):
+    # 작업이 끝날 때까지 진행률(수수료 단계)만 보여주고, 끝나면 페이지 전체를 다시 실행
+    @st.fragment(run_every=1.0)
+    def progress_panel():
+        job = get_job_manager().get(job_key)
+        progress = job.progress()
+        if job.done:
+            st.rerun()
+        st.progress(progress['fraction'],
+                    text=f"{message} {progress['evaluated']:,} / {progress['total'] or 0:,} 수수료 단계 "
+                         f"({progress['seconds']:.0f}초)")
+        best = progress['best']
+        if best:
+            st.markdown(f"현재까지 최적 수수료: 상위 <b>{best['high']:.1f}%</b> · 중위 <b>{best['mid']:.1f}%</b> · "
+                        f"하위 <b>{best['low']:.1f}%</b>", unsafe_allow_html=True)
+        if cancellable and st.button("⏹️ 탐색 취소", key="cancel_optimization"):
+            get_job_manager().cancel(job_key)
+            st.rerun()
+
+    st.title("📊 수수료율 변화에 따른 매출 시뮬레이션")
+    progress_panel()
+
+# 시뮬레이션 결과 캐시: 모든 세션이 공유, 디스크에도 남겨서 재시작 후에도 재사용
+@st.cache_resource(show_spinner=False)
+def get_simulation_cache():
+    return SimulationCache(max_bytes=256 * 2**20, spill_dir='.cache/simulations', max_disk_bytes=2**30)
+
+# 시나리오 예측 서비스: 모델을 올려 둔 채 모든 세션이 공유 (모델 파일이 바뀌면 새로 만듦)
+# is_popular 기준값은 기존 페이지처럼 예시 숙소 데이터 기준
+# 하나만 유지하고, 새로 만들면 이전 서비스(배치 스레드 + 모델 참조)는 닫음
+SCENARIO_PATH = "assets/capstone_example.csv"
+
+@st.cache_resource(show_spinner=False)
+def get_prediction_service_slot():
+    return {'service': None, 'lock': threading.Lock()}
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def get_prediction_service(model_key, fee_items):
+    service = PredictionService(dict(fee_items), reference_path=SCENARIO_PATH)
+    slot = get_prediction_service_slot()
+    with slot['lock']:
+        replaced, slot['service'] = slot['service'], service
+    if replaced is not None:
+        replaced.close()
+    return service
+
+def scenario_prediction(record, fee_map):
+    fee_items = tuple(sorted(fee_map.items()))
+    service = get_prediction_service(registry.fingerprint(MODEL_PATH), fee_items)
+    try:
+        return service.predict(record)
+    except RuntimeError:
+        if not service.closed:
+            raise
+        # 다른 세션에서 모델이 바뀌어 방금 닫힌 서비스 -> 새 서비스로 한 번 더
+        return get_prediction_service(registry.fingerprint(MODEL_PATH), fee_items).predict(record)
+
+def show_city_fee(city_name):
+    import altair as alt  # 차트는 이 페이지에서만 사용
+    # 도시 데이터/모델은 레지스트리에서 (처음이면 이때 올림)
+    # host_days 필터는 모든 세션이 같이 쓰는 행 번호 배열 (세션마다 데이터를 복사하지 않음, 도시가 내려가도 그대로 사용)
+    with get_city_registry().use(city_name) as resident, span('host_days_filter', len(resident.df)):
+        city = resident.city
+        view = resident.view(city.min_host_days)
+
+    cache = get_simulation_cache()
+    dataset_key = view.key
+    model_key = registry.fingerprint(city.model_path)
+    # 최적 수수료 탐색은 백그라운드 작업으로 (다른 세션이 이미 시작했으면 같은 작업을 지켜봄)
+    jobs = get_job_manager()
+    job_key = ('best_fee_map', dataset_key, model_key, city.name)
+    task = surface_optimization_task(view.frame, model_path=city.model_path, max_mid_fee=city.max_mid_fee,
+                                     min_host_delta=city.min_host_delta,
+                                     features_dir=feature_cache_dir(dataset_key, model_key))
+    task = charged_to_city(get_city_registry(), city.name, task)
+    job = jobs.get(job_key)
+    if job is not None and job.status in ('cancelled', 'failed'):
+        st.title("📊 수수료율 변화에 따른 매출 시뮬레이션")
+        if job.status == 'cancelled':
+            st.warning("최적 수수료 탐색이 취소되었습니다.")
+        else:
+            st.error(f"최적 수수료 탐색 중 오류가 발생했습니다: {job.error}")
+        if st.button("🔄 다시 탐색", key="restart_optimization"):
+            jobs.submit(job_key, task)
+            st.rerun()
+        return
+    job = jobs.submit(job_key, task)
+    if job.status != 'done':
+        show_optimization_progress(job_key)
+        return
+    best_fee_map = job.result['best_fee_map'] or DEFAULT_FEE_MAP
 
     # 완료 알림
     st.success("✅ 최적 수수료 탐색 완료!")
@@ -99,15 +266,44 @@ def show_city_fee():
 
     fee_map = {'high': top_fee, 'mid': middle_fee, 'low': bottom_fee}
 
-    # booked_group, fee_rate df에 추가됨
-    df = update_columns_by_fee_change(df, fee_map) # 수수료 변화에 따라 컬럼 변화
-    # sw feature engineering 모두 추가되고, booked_new 생성
-    df = predict_booked_days(df) # 수수료 변화하면 그에 따른 booked_new 생성
-
-    df['fee'] = df['booked_group'].map(fee_map) # 수수료 고정해서 컬럼에 매칭
-    # 각각 수수료까지 곱해서 만들어진 총 매출, 오리지널 매출, 시뮬레이션 돌렸을때 매출, 비율
-    df['sales'], original_total, simulated_total, revenue_change = calculate_revenue(df)
-    group_sales = df.groupby('booked_group')['sales'].sum()
+    # 앙상블 가중치 / 모델 간 편차
+    st.sidebar.markdown("### 앙상블 가중치")
+    weights = {m: st.sidebar.slider(MEMBER_LABELS[m], 0, 10, DEFAULT_WEIGHTS[m], key=f"weight_{m}") for m in MEMBERS}
+    if sum(weights.values()) == 0:
+        st.sidebar.warning("가중치가 모두 0 이라 기본 가중치를 사용합니다.")
+        weights = dict(DEFAULT_WEIGHTS)
+    show_spread = st.sidebar.toggle("모델 간 예측 편차 보기", value=False, key="show_spread")
+
+    with span('simulate', len(view)):
+        # 같은 슬라이더 조합은 캐시에서, 처음 보는 조합은 매출 곡면에서 조회 (모델 호출 없음)
+        # 숙소별 booked_new/sales, 오리지널 매출, 시뮬레이션 돌렸을때 매출, 비율
+        default_blend = weights == DEFAULT_WEIGHTS and not show_spread
+        sim_key = simulation_key(dataset_key, model_key, fee_map)
+        result = cache.get(sim_key) if default_blend else None
+        if result is None:
+            # 곡면이 메모리에 없으면 페이지에서 만들지 않고 백그라운드 작업이 끝날 때까지 진행률을 보여줌
+            surface_job = get_surface_job(dataset_key, model_key, city, view)
+            surface = surface_job.value
+            if surface is None:
+                if surface_job.status == 'failed':
+                    st.error(f"매출 곡면을 만드는 중 오류가 발생했습니다: {surface_job.error}")
+                else:
+                    show_optimization_progress(surface_job.key, "⏳ 매출 곡면을 다시 불러오는 중입니다...",
+                                               cancellable=False)
+                return
+            if default_blend:
+                result = surface.simulate(fee_map)
+                cache.put(sim_key, result)
+            else:
+                # 수수료 조합별 멤버 예측값은 한 번만 계산해 캐시 -> 가중치 변경/편차 표시는 모델 호출 없이 다시 블렌드
+                members = cache.get_or_compute(
+                    ('members',) + sim_key[1:],
+                    lambda: {'members': surface.member_predictions(fee_map)})['members']
+                result = surface.reweight(members, fee_map, weights)
+    original_total = result['original_total']
+    simulated_total = result['simulated_total']
+    revenue_change = result['revenue_change']
+    group_sales = pd.Series(result['group_sales'])
 
 
     st.title("📊 수수료율 변화에 따른 매출 시뮬레이션")
@@ -119,6 +315,21 @@ def show_city_fee():
     </div>
     """, unsafe_allow_html=True)
     st.markdown(f"<p style='margin-left:35px; font-size:10px; text-align:left; color:gray;'>호스트 수수료에 대한 매출만 해당함.</p>", unsafe_allow_html=True)
+    if show_spread:
+        member_totals = result['member_totals']
+        st.markdown(f"""
+        <div style="font-size:16px; margin-bottom:4px;">
+            🎯 모델별 단독 예측 매출 범위: <b>{min(member_totals.values()):,.0f} ~ {max(member_totals.values()):,.0f}</b>
+            (숙소당 예약일수 편차 평균 ±{np.nanmean(result['booked_std']):.1f}일)
+        </div>
+        """, unsafe_allow_html=True)
+        spread_df = pd.DataFrame({
+            "모델": [MEMBER_LABELS[m] for m in member_totals],
+            "매출": list(member_totals.values()),
+        })
+        st.altair_chart(alt.Chart(spread_df).mark_bar().encode(
+            x=alt.X("모델:N", sort=None), y="매출:Q", tooltip=["모델", "매출"]
+        ).properties(height=200), use_container_width=True)
     st.markdown(f"""
     <div style="font-size:18px; margin-bottom:4px;">
         💡 예약 일수 기준 숙소 그룹 별 최적 수수료율</div>
@@ -169,7 +380,8 @@ def show_city_fee():
         tooltip=["그룹", "매출"]
     ).properties(height=300)
 
-    st.altair_chart(area_chart, use_container_width=True)
+    with span('render.altair'):
+        st.altair_chart(area_chart, use_container_width=True)
     st.markdown("---")
 
     col1, col2 = st.columns(2)
@@ -177,7 +389,7 @@ def show_city_fee():
     with col1:
         st.markdown("#### 🏘️ 차등 수수료 적용 기준별 숙소 개수")
 
-        group_counts = df['booked_group'].value_counts().rename_axis("숙소 그룹").reset_index(name="숙소 수")
+        group_counts = view.group_counts().sort_values(ascending=False).rename_axis("숙소 그룹").reset_index(name="숙소 수")
 
         color_scale = alt.Scale(
             domain=["high", "mid", "low"],
@@ -201,7 +413,8 @@ def show_city_fee():
         bar_chart = (bar_chart + labels).properties(
             height=300
         )
-        st.altair_chart(bar_chart, use_container_width=True)
+        with span('render.altair'):
+            st.altair_chart(bar_chart, use_container_width=True)
 
     # 우측: bar chart
     with col2:
@@ -242,7 +455,8 @@ def show_city_fee():
         bar_label_chart = (bar + labels).properties(
             height=300
         )
-        st.altair_chart(bar_label_chart, use_container_width=True)
+        with span('render.altair'):
+            st.altair_chart(bar_label_chart, use_container_width=True)
 
 def show_scenario():
     selected_top_fee = 2.4
@@ -290,15 +504,12 @@ def show_scenario():
     else:
         # 선택된 시나리오에 해당하는 데이터 로드
         scenario_index = st.session_state.selected_scenario
-        example= load_data("assets/capstone_example.csv")
-        example = update_columns_by_fee_change(example, fee_map)
-        example = predict_booked_days(example)
+        example = load_data(SCENARIO_PATH)
+        download_predict_model()
+        prediction = scenario_prediction(example.iloc[scenario_index], fee_map)
 
-        example['booked_group'] = pd.cut(example['booked_new'], bins=[-1, 120, 240, 365], labels=['low', 'mid', 'high'])
-        example['fee'] = example['booked_group'].map(fee_map)
-
-        predicted_days = int(example['booked_new'][scenario_index])
-        fee_rate = example['fee'][scenario_index]
+        predicted_days = int(prediction['booked_new'])
+        fee_rate = prediction['fee']
 
         # 출력
         st.markdown("<div style='text-align: center;'>", unsafe_allow_html=True)
@@ -319,12 +530,72 @@ def show_scenario():
         st.markdown("</div>", unsafe_allow_html=True)
 
 
+# 사이드바 성능 계측 패널 (켜져 있을 때만 단계별 시간/행 수/메모리 변화를 기록)
+# 토글은 이 세션만 켜고, 표/내려받기/지우기도 이 세션 기록만 (프로세스 전체는 PIPELINE_PROFILE=1 로만 켬)
+def toggle_profiling():
+    profiler.enable_session(st.session_state.profile_session, st.session_state.profiling_enabled)
+
+def show_profiling_panel(session):
+    st.sidebar.markdown("### 🛠️ 성능 계측")
+    enabled = profiler.session_enabled(session)
+    st.sidebar.toggle("단계별 실행 시간 기록", value=enabled, key="profiling_enabled", on_change=toggle_profiling,
+                      disabled=profiler.enabled)
+    if not enabled:
+        return
+    if st.sidebar.button("다음 실행 프로파일 (cProfile/tracemalloc)", key="capture_next"):
+        st.session_state.capture_next_run = True
+        st.rerun()
+    summary = profiler.summary(session)
+    if summary:
+        st.sidebar.dataframe(pd.DataFrame(summary), hide_index=True, use_container_width=True)
+    st.sidebar.download_button("📥 기록 내려받기 (JSON lines)", profiler.to_jsonl(session), file_name="pipeline_spans.jsonl",
+                               mime="application/json", key="download_spans")
+    if st.sidebar.button("기록 지우기", key="clear_spans"):
+        profiler.clear(session)
+        st.rerun()
+    cities = get_city_registry()
+    resident = [m for m in cities.metrics() if m['loads']]
+    if resident:
+        with st.sidebar.expander(f"도시 데이터/모델 메모리 ({cities.resident_bytes() / 2**20:,.0f} / {cities.max_bytes / 2**20:,.0f}MB)"):
+            st.dataframe(pd.DataFrame(resident).drop(columns=['last_used']), hide_index=True, use_container_width=True)
+    snapshot = st.session_state.get("last_capture")
+    if snapshot and 'profile' in snapshot:
+        with st.sidebar.expander(f"마지막 프로파일 ({snapshot['seconds']:.2f}초, 최대 {snapshot['peak_mb']:.1f}MB)"):
+            st.code(snapshot['profile'], language=None)
+            st.code(snapshot['allocations'], language=None)
+
+
+# 시작 워밍업 (APP_WARMUP=1): 프로세스에서 한 번, 백그라운드로
+# 기본 도시 데이터/모델 -> 지도 위치 데이터 -> 시나리오 예시/예측 서비스 -> 페이지 전용 모듈 순서
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    if not warmup.enabled():
+        return None
+    cities = get_city_registry()
+    default_city = cities.cities[DEFAULT_CITY]
+
+    def scenario_service():
+        download_predict_model()
+        get_prediction_service(registry.fingerprint(MODEL_PATH), tuple(sorted(SCENARIO_FEE_MAP.items())))
+
+    steps = [
+        ('city', lambda: cities.get(DEFAULT_CITY)),
+        ('locations', lambda: load_locations(default_city.location_path)),
+        ('scenario_example', lambda: load_data(SCENARIO_PATH)),
+        ('prediction_service', scenario_service),
+    ]
+    steps += [warmup.import_step(name) for name in warmup.PAGE_MODULES]
+    return warmup.start(steps)
+
+
 # session_state 초기화
 if "selected_city" not in st.session_state:
     st.session_state.selected_city = None
 
 
-available_cities = ["New York", "Los Angeles", "Washington, D.C.", "Chicago", "Houston", "Denver", "Phoenix", "Seattle", "Austin"]
+city_registry = get_city_registry()
+start_warmup()
+available_cities = city_registry.names()
 
 st.sidebar.markdown("### 수수료 정책 시뮬레이션 👇")
 cols = st.sidebar.columns(3)
@@ -345,14 +616,24 @@ if st.sidebar.button("시나리오 실행하기"):
     st.rerun()
 
 
-if st.session_state.page == "scenario":
-    show_scenario()
-elif st.session_state.selected_city =='New York':
-    show_city_fee()
-elif st.session_state.selected_city != None:
-    st.toast(f"🚧 {st.session_state.selected_city}은(는) 아직 서비스 준비 중입니다.", icon="⚠️")
-    st.session_state.selected_city = None
-    go_to("home")
-elif st.session_state.selected_city is None:
-    show_map()
-
+# 성능 계측 패널에서 "다음 실행 프로파일" 을 누르면 이번 실행 전체를 cProfile/tracemalloc 으로 기록
+capture_run = st.session_state.pop("capture_next_run", False)
+snapshot = None
+try:
+    with profiler.session(st.session_state.profile_session), \
+            (capture() if capture_run else contextlib.nullcontext()) as snapshot, span('page'):
+        if st.session_state.page == "scenario":
+            show_scenario()
+        elif st.session_state.selected_city is not None and city_registry.available(st.session_state.selected_city):
+            show_city_fee(st.session_state.selected_city)
+        elif st.session_state.selected_city != None:
+            st.toast(f"🚧 {st.session_state.selected_city}은(는) 아직 서비스 준비 중입니다.", icon="⚠️")
+            st.session_state.selected_city = None
+            go_to("home")
+        elif st.session_state.selected_city is None:
+            show_map()
+finally:
+    if capture_run:
+        st.session_state.last_capture = snapshot
+
+show_profiling_panel(st.session_state.profile_session)
@@ -0,0 +1,108 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from benchmarks.run_benchmarks import WORKSPACE
+from benchmarks.synthetic_data import write_dataset
+from benchmarks.stand_in_model import write_stand_in_model, DEFAULT_TRAIN_ROWS
+
+# 도시 수를 늘려 가며 CityRegistry 의 상주 메모리와 도시 전환 시간을 잼
+# 도시마다 가짜 데이터(시드가 다름)와 대역 모델 사본(경로가 다르면 따로 로드됨)을 만들고
+# 상한을 도시 max_resident 개 정도로 잡아서, 도시가 늘어도 상주 메모리/RSS 가 평평한지 확인
+# 실행: 저장소 루트에서 python -m benchmarks.city_residency [--cities 9] [--rows 50000]
+
+
+def _rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def make_cities(n_cities, rows, seed=0):
+    from city_registry import city
+    from sw_prediction_file import MODEL_PATH
+
+    os.makedirs('models', exist_ok=True)
+    write_stand_in_model(MODEL_PATH, DEFAULT_TRAIN_ROWS, seed)
+    cities = {}
+    for i in range(n_cities):
+        name = f"city_{i}"
+        listings, locations = write_dataset(rows, os.path.join('assets', 'cities', name), seed + i)
+        model_path = os.path.join('models', 'cities', name, 'ensemble_model.pkl')
+        if not os.path.exists(model_path):
+            os.makedirs(os.path.dirname(model_path), exist_ok=True)
+            shutil.copyfile(MODEL_PATH, model_path)
+        cities[name] = city(name, name, dataset_path=listings, location_path=locations, model_path=model_path)
+    return cities
+
+
+def residency_report(n_cities=9, rows=50_000, max_resident=3, rounds=3, seed=0):
+    from city_registry import CityRegistry
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cities = make_cities(n_cities, rows, seed)
+        # 한 도시 크기를 재서 상한을 max_resident 개 분량으로
+        probe = CityRegistry(cities, max_bytes=2**62)
+        city_bytes = probe.get(next(iter(cities))).bytes
+        probe.evict(next(iter(cities)))
+    registry = CityRegistry(cities, max_bytes=int(city_bytes * (max_resident + 0.5)))
+
+    rows_out = []
+    names = list(cities)
+    with contextlib.redirect_stdout(io.StringIO()):
+        # 1) 도시를 하나씩 처음 선택 (cold: 디스크 변환본은 있고 메모리에는 없음)
+        for i, name in enumerate(names, 1):
+            start = time.perf_counter()
+            registry.get(name)
+            rows_out.append({'step': 'first_visit', 'cities_seen': i, 'ms': round((time.perf_counter() - start) * 1000, 1),
+                             'resident_mb': round(registry.resident_bytes() / 2**20, 1), 'rss_mb': _rss_mb()})
+        # 2) 최근 도시끼리 왔다 갔다 (상주 중 -> 바로 반환)
+        hot = names[-max_resident:]
+        hits = []
+        for _ in range(rounds * 10):
+            for name in hot:
+                start = time.perf_counter()
+                registry.get(name)
+                hits.append(time.perf_counter() - start)
+        # 3) 전체 도시를 돌아가며 (상한 때문에 내렸다 다시 올림)
+        misses = []
+        for _ in range(rounds):
+            for name in names:
+                start = time.perf_counter()
+                registry.get(name)
+                misses.append(time.perf_counter() - start)
+
+    rows_out.append({'step': 'switch_resident', 'count': len(hits),
+                     'p50_ms': round(float(np.percentile(hits, 50)) * 1000, 3),
+                     'p99_ms': round(float(np.percentile(hits, 99)) * 1000, 3)})
+    rows_out.append({'step': 'switch_cycle_all', 'count': len(misses),
+                     'p50_ms': round(float(np.percentile(misses, 50)) * 1000, 1),
+                     'p99_ms': round(float(np.percentile(misses, 99)) * 1000, 1),
+                     'resident_mb': round(registry.resident_bytes() / 2**20, 1),
+                     'cap_mb': round(registry.max_bytes / 2**20, 1), 'rss_mb': _rss_mb()})
+    return rows_out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='도시 레지스트리 상주 메모리/전환 시간')
+    parser.add_argument('--cities', type=int, default=9)
+    parser.add_argument('--rows', type=int, default=50_000)
+    parser.add_argument('--max-resident', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    os.makedirs(WORKSPACE, exist_ok=True)
+    os.chdir(WORKSPACE)
+    for row in residency_report(args.cities, args.rows, args.max_resident, args.rounds):
+        print(json.dumps(row, ensure_ascii=False))
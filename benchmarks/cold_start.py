@@ -0,0 +1,98 @@
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+# 콜드 스타트 측정: 페이지마다 새 파이썬 프로세스에서
+#   1) app.py 맨 위 import 문만 실행하는 시간
+#   2) 그 페이지의 첫 요청(AppTest 첫 실행) 시간과 그때까지 올라온 무거운 모듈
+# 을 잼. --warmup 이면 APP_WARMUP=1 로 띄우고 첫 실행(지도) 후 워밍업이 끝난 뒤에 대상 페이지를 잼
+# 실행: 모델/데이터가 있는 폴더에서 python -m benchmarks.cold_start [--app 경로] [--warmup]
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['pandas', 'sklearn', 'scipy', 'lightgbm', 'folium', 'streamlit_folium', 'altair', 'gdown']
+PAGES = ('map', 'scenario', 'city')
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+exec(compile({source!r}, 'app_imports', 'exec'))
+print(json.dumps({{'seconds': time.perf_counter() - start,
+                   'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+_PAGE_SCRIPT = """
+import json, sys, time
+sys.path.insert(0, {repo!r})
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file({app!r}, default_timeout=600)
+warm = None
+if {warmup!r}:
+    at.run()  # 부팅 (지도 페이지) -> 워밍업 스레드 시작
+    import warmup
+    warm = warmup.wait(600)
+    at = AppTest.from_file({app!r}, default_timeout=600)
+if {page!r} == 'scenario':
+    at.session_state.page = 'scenario'
+    at.session_state.selected_scenario = 0
+elif {page!r} == 'city':
+    at.session_state.selected_city = 'New York'
+start = time.perf_counter()
+at.run()
+print(json.dumps({{'seconds': time.perf_counter() - start, 'errors': [str(e.value) for e in at.exception],
+                   'loaded': [m for m in {heavy!r} if m in sys.modules], 'warmup': warm}}))
+"""
+
+
+def top_level_imports(app_path):
+    # app.py 의 모듈 맨 위 import 문만 (페이지 코드는 실행하지 않음)
+    with open(app_path) as f:
+        tree = ast.parse(f.read())
+    nodes = [node for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return '\n'.join(ast.unparse(node) for node in nodes)
+
+
+def _run(script, env=None):
+    out = subprocess.run([sys.executable, '-W', 'ignore', '-c', script], capture_output=True, text=True,
+                         env={**os.environ, **(env or {})}, timeout=900)
+    lines = [line for line in out.stdout.splitlines() if line.startswith('{')]
+    if out.returncode != 0 or not lines:
+        raise RuntimeError(out.stderr[-2000:])
+    return json.loads(lines[-1])
+
+
+def cold_start_report(app_path, pages=PAGES, warmup=False, repeat=1):
+    repo = os.path.dirname(os.path.abspath(app_path))
+    rows = []
+    for _ in range(repeat):
+        result = _run(_IMPORT_SCRIPT.format(repo=repo, source=top_level_imports(app_path), heavy=HEAVY_MODULES))
+        rows.append({'case': 'app_imports', 'seconds': round(result['seconds'], 3), 'loaded': result['loaded']})
+    env = {'APP_WARMUP': '1'} if warmup else {'APP_WARMUP': '0'}
+    for page in pages:
+        for _ in range(repeat):
+            result = _run(_PAGE_SCRIPT.format(repo=repo, app=os.path.abspath(app_path), page=page,
+                                              warmup=warmup, heavy=HEAVY_MODULES), env)
+            row = {'case': f"first_request.{page}", 'warmup': warmup, 'seconds': round(result['seconds'], 3),
+                   'loaded': result['loaded']}
+            if result['errors']:
+                row['errors'] = result['errors']
+            if result['warmup']:
+                row['warmup_seconds'] = result['warmup'].get('seconds')
+            rows.append(row)
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='앱 콜드 스타트 (import 시간 / 페이지별 첫 요청 시간)')
+    parser.add_argument('--app', default=os.path.join(REPO_DIR, 'app.py'))
+    parser.add_argument('--pages', nargs='+', default=list(PAGES), choices=PAGES)
+    parser.add_argument('--warmup', action='store_true', help='APP_WARMUP=1 로 띄우고 워밍업이 끝난 뒤 측정')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    for row in cold_start_report(args.app, args.pages, args.warmup, args.repeat):
+        print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,256 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# 실행: 저장소 루트에서 python -m benchmarks.run_benchmarks [--sizes 1000 10000] [--save [경로]] [--compare [경로]]
+# 파이프라인 코드는 상대 경로(models/ensemble_model.pkl, .cache/...)를 쓰므로
+# 작업 폴더를 .cache/benchmarks 로 옮겨서 대역 모델/가짜 데이터로 실행 (실제 모델/데이터는 건드리지 않음)
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKSPACE = os.path.join(REPO_DIR, '.cache', 'benchmarks')
+BASELINE_PATH = os.path.join(REPO_DIR, 'benchmarks', 'baselines', 'baseline.json')
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+FEE_MAP = {'high': 3.0, 'mid': 3.2, 'low': 4.0}
+# grid_search_optimal_fee 는 조합마다 전체 예측을 하므로 조합 수를 작게 (short < mid < long, mid <= 3.3% -> 2개)
+GRID_FEE_RANGE = (0.0, 0.061, 0.02)
+GRID_MAX_ROWS = 100_000
+# 매출 곡면/최적 수수료 작업: 슬라이더 전체 범위(0~10%)를 1% 간격으로 (101칸 전체는 1만 행에서도 1분 넘게 걸림)
+SURFACE_FEES = (0.0, 10.0, 11)
+SURFACE_FEE_MAP = {'high': 6.0, 'mid': 8.0, 'low': 10.0}
+SURFACE_MAX_ROWS = 10_000
+# 리뷰 0개 숙소만 골라 슬라이더 최대 수수료로 예측 (수수료 반영 후 피처가 NaN 이 되면 오류로 잡힘)
+HIGH_FEE_MAP = {'high': 10.0, 'mid': 10.0, 'low': 10.0}
+# 비교 기준: 이보다 느리거나(비율) 메모리를 더 쓰면 회귀, 아주 작은 차이(잡음)는 무시
+TIME_TOLERANCE = 0.30
+MEMORY_TOLERANCE = 0.20
+MIN_SECONDS_DIFF = 0.005
+MIN_MB_DIFF = 1.0
+
+sys.path.insert(0, REPO_DIR)
+
+
+def measure(func, setup=None, repeat=3):
+    # setup() 의 반환값(인자 튜플)은 시간에 포함하지 않음
+    # 시간은 repeat 번 실행의 최소/중앙값, 최대 메모리는 tracemalloc 을 켜고 한 번 더 실행해서 따로 잼
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            args = setup() if setup else ()
+            start = time.perf_counter()
+            func(*args)
+            times.append(time.perf_counter() - start)
+        args = setup() if setup else ()
+        tracemalloc.start()
+        try:
+            func(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {'seconds_min': min(times), 'seconds_median': float(np.median(times)), 'peak_mb': peak / 2**20}
+
+
+def _cases(rows, listings_path, locations_path):
+    # (이름, 실행 함수, 준비 함수) - 모든 import 는 작업 폴더로 옮긴 뒤에
+    import dataset_store
+    from sw_prediction_file import load_data, make_features, predict_booked_days
+    from sa_simulation_file import update_columns_by_fee_change, calculate_revenue
+    from grid_search_for_best_fee import grid_search_optimal_fee, grid_search_optimal_fee_batched
+    from map_view import listing_map, marker_payload
+    from revenue_surface import RevenueSurface
+    from optimization_jobs import Job, surface_optimization_task
+
+    def drop_memo(path):
+        dataset_store._loaded.pop(os.path.abspath(path), None)
+
+    def cold_load():
+        # 변환본(.npy)까지 지워서 CSV 변환부터
+        drop_memo(listings_path)
+        shutil.rmtree(dataset_store.DATASET_CACHE_DIR, ignore_errors=True)
+        return ()
+
+    def warm_load():
+        # 디스크 변환본은 있고 프로세스 메모는 없는 상태 (새 프로세스의 첫 호출)
+        load_data(listings_path)
+        drop_memo(listings_path)
+        return ()
+
+    raw = load_data(listings_path)
+    updated = update_columns_by_fee_change(raw.copy(), FEE_MAP)
+    predicted = predict_booked_days(updated.copy())
+    predicted['fee'] = predicted['booked_group'].map(FEE_MAP)
+    locations = dataset_store.load_locations(locations_path)
+    fee_range = np.arange(*GRID_FEE_RANGE)
+    zero_reviews = raw[raw['number_of_reviews'] == 0]
+
+    def predict_high_fee(df):
+        booked = predict_booked_days(update_columns_by_fee_change(df, HIGH_FEE_MAP))['booked_new']
+        if booked.isna().any():
+            raise ValueError("예측값에 NaN 이 있습니다")
+        return booked
+
+    cases = [
+        ('load_data.cold', lambda: load_data(listings_path), cold_load),
+        ('load_data.warm', lambda: load_data(listings_path), warm_load),
+        ('update_columns_by_fee_change', lambda df: update_columns_by_fee_change(df, FEE_MAP), lambda: (raw.copy(),)),
+        ('make_features', make_features, lambda: (updated.copy(),)),
+        ('predict_booked_days', predict_booked_days, lambda: (updated.copy(),)),
+        ('calculate_revenue', calculate_revenue, lambda: (predicted,)),
+        ('predict_booked_days.high_fee_zero_reviews', predict_high_fee, lambda: (zero_reviews.copy(),)),
+        ('show_map.marker_payload', lambda: marker_payload(locations), None),
+        ('show_map.render', lambda: listing_map(locations).get_root().render(), None),
+    ]
+    if rows <= GRID_MAX_ROWS:
+        cases += [
+            ('grid_search_optimal_fee', lambda: grid_search_optimal_fee(raw, fee_range), None),
+            ('grid_search_optimal_fee_batched', lambda: grid_search_optimal_fee_batched(raw, fee_range), None),
+        ]
+    if rows <= SURFACE_MAX_ROWS:
+        surface_fees = np.round(np.linspace(*SURFACE_FEES), 1)
+        surface = RevenueSurface(raw, fees=surface_fees)
+        cases += [
+            ('surface_optimization_job',
+             lambda: surface_optimization_task(raw, fees=surface_fees)(Job(('benchmark', rows), None)), None),
+            ('revenue_surface.simulate', lambda: surface.simulate(SURFACE_FEE_MAP), None),
+        ]
+    return cases
+
+
+def run(sizes=DEFAULT_SIZES, repeat=3, seed=0, train_rows=None, only=None, verbose=True):
+    from benchmarks.synthetic_data import write_dataset
+    from benchmarks.stand_in_model import write_stand_in_model, DEFAULT_TRAIN_ROWS
+
+    train_rows = train_rows or DEFAULT_TRAIN_ROWS
+    os.makedirs(os.path.join(WORKSPACE, 'models'), exist_ok=True)
+    previous = os.getcwd()
+    os.chdir(WORKSPACE)
+    try:
+        from sw_prediction_file import MODEL_PATH, load_predict_model
+        write_stand_in_model(MODEL_PATH, train_rows, seed)
+        with contextlib.redirect_stdout(io.StringIO()):
+            load_predict_model()  # 번들/트리 배열/KNN 인덱스 준비는 측정에서 제외
+
+        results = []
+        for rows in sizes:
+            with contextlib.redirect_stdout(io.StringIO()):
+                listings_path, locations_path = write_dataset(rows, 'assets', seed)
+                cases = _cases(rows, listings_path, locations_path)
+            for name, func, setup in cases:
+                if only and not any(name.startswith(prefix) for prefix in only):
+                    continue
+                row = {'name': name, 'rows': rows}
+                try:
+                    stats = measure(func, setup, repeat)
+                except Exception as e:
+                    row['error'] = f"{type(e).__name__}: {e}"
+                else:
+                    row.update({k: round(v, 4) for k, v in stats.items()})
+                    row['rows_per_s'] = round(rows / stats['seconds_median'], 1) if stats['seconds_median'] else None
+                results.append(row)
+                if verbose:
+                    print(json.dumps(row, ensure_ascii=False), flush=True)
+    finally:
+        os.chdir(previous)
+
+    return {'meta': environment(sizes, repeat, seed, train_rows), 'results': results}
+
+
+def environment(sizes, repeat, seed, train_rows):
+    import pandas
+    import sklearn
+    import lightgbm
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'sklearn': sklearn.__version__,
+        'lightgbm': lightgbm.__version__,
+        'sizes': list(sizes),
+        'repeat': repeat,
+        'seed': seed,
+        'train_rows': train_rows,
+        'fee_map': FEE_MAP,
+        'grid_fee_range': list(GRID_FEE_RANGE),
+        'surface_fees': list(SURFACE_FEES),
+        'high_fee_map': HIGH_FEE_MAP,
+    }
+
+
+def compare(current, baseline, time_tolerance=TIME_TOLERANCE, memory_tolerance=MEMORY_TOLERANCE):
+    # (이름, 행 수) 별로 기준 결과와 비교 -> status: ok / regression / improved / new / error
+    base = {(r['name'], r['rows']): r for r in baseline['results']}
+    rows = []
+    for r in current['results']:
+        b = base.get((r['name'], r['rows']))
+        row = {'name': r['name'], 'rows': r['rows']}
+        if 'error' in r:
+            row['status'] = 'error'
+        elif b is None or 'error' in b:
+            row['status'] = 'new'
+        else:
+            time_diff = r['seconds_median'] - b['seconds_median']
+            mem_diff = r['peak_mb'] - b['peak_mb']
+            row['time_ratio'] = round(r['seconds_median'] / b['seconds_median'], 3) if b['seconds_median'] else None
+            row['memory_ratio'] = round(r['peak_mb'] / b['peak_mb'], 3) if b['peak_mb'] else None
+            slower = time_diff > MIN_SECONDS_DIFF and time_diff > b['seconds_median'] * time_tolerance
+            bigger = mem_diff > MIN_MB_DIFF and mem_diff > b['peak_mb'] * memory_tolerance
+            faster = -time_diff > MIN_SECONDS_DIFF and -time_diff > b['seconds_median'] * time_tolerance
+            row['status'] = 'regression' if slower or bigger else 'improved' if faster else 'ok'
+        rows.append(row)
+    return rows
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(result, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    return path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='파이프라인 벤치마크 (가짜 데이터 + 대역 모델)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='숙소 수 (예: 1000 10000 1000000)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--train-rows', type=int, default=None, help='대역 모델 학습 행 수')
+    parser.add_argument('--only', nargs='+', default=None, help='이 이름으로 시작하는 벤치마크만')
+    parser.add_argument('--save', nargs='?', const=BASELINE_PATH, default=None,
+                        help='결과 JSON 저장 (경로 생략 시 benchmarks/baselines/baseline.json)')
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, default=None,
+                        help='기준 JSON 과 비교, 회귀가 있으면 종료 코드 1 (경로 생략 시 baseline.json)')
+    args = parser.parse_args()
+
+    result = run(args.sizes, args.repeat, args.seed, args.train_rows, args.only)
+    if args.save:
+        print(f"💾 결과 저장: {save(result, args.save)}")
+    if args.compare:
+        report = compare(result, _load(args.compare))
+        for row in report:
+            print(json.dumps(row, ensure_ascii=False))
+        regressions = [r for r in report if r['status'] in ('regression', 'error')]
+        if regressions:
+            print(f"❌ 회귀 {len(regressions)}건")
+            sys.exit(1)
+        print("✅ 회귀 없음")
@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import multiprocessing as mp
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from benchmarks.run_benchmarks import WORKSPACE
+from benchmarks.synthetic_data import write_dataset
+from benchmarks.stand_in_model import write_stand_in_model, DEFAULT_TRAIN_ROWS
+from benchmarks.city_residency import _rss_mb
+
+# 동시 세션 수(1/10/50)별 세션당 메모리: 도시 페이지의 세션이 자기 수수료 조합으로 숙소별 결과를 들고 있는 상태
+#   copy:   세션마다 필터 결과 .copy() + 수수료 반영 열 갱신(update_columns_by_fee_change) + 매출 곡면 결과
+#   shared: 앱(show_city_fee)이 실제로 하는 것 - 공유 기본 데이터(mmap) + 공유 필터 행 번호(SharedView) 의 지문/그룹 수
+#           + 공유 매출 곡면에서 읽은 시뮬레이션 결과 (세션별 숙소 열 없음)
+# 그리고 같은 데이터를 여는 서버 워커 프로세스 여러 개의 RSS/PSS (mmap 이면 페이지를 나눠 가져서 PSS 가 줄어듦)
+# 실행: 저장소 루트에서 python -m benchmarks.session_memory [--rows 100000] [--sessions 1 10 50] [--workers 3]
+FEES = np.round(np.linspace(0.0, 10.0, 11), 1)
+MIN_HOST_DAYS = 365
+
+
+def _fee_maps(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [{label: float(rng.choice(FEES)) for label in ('high', 'mid', 'low')} for _ in range(n)]
+
+
+def _prepare(rows, seed=0):
+    from sw_prediction_file import MODEL_PATH, load_predict_model
+
+    os.makedirs('models', exist_ok=True)
+    write_stand_in_model(MODEL_PATH, DEFAULT_TRAIN_ROWS, seed)
+    load_predict_model()
+    listings, _ = write_dataset(rows, 'assets', seed)
+    return listings
+
+
+def _copy_session(base, surface, fee_map):
+    from sw_prediction_file import dataset_fingerprint
+    from sa_simulation_file import update_columns_by_fee_change
+
+    df = base[base['host_days'] >= MIN_HOST_DAYS].copy()
+    dataset_fingerprint(df)
+    update_columns_by_fee_change(df, fee_map)
+    return df, surface.simulate(fee_map)
+
+
+def _shared_session(view, surface, fee_map):
+    view.key
+    view.group_counts()
+    return surface.simulate(fee_map)
+
+
+def session_report(rows=100_000, sessions=(1, 10, 50), seed=0):
+    from dataset_store import load_dataset
+    from shared_dataset import SharedView
+    from revenue_surface import RevenueSurface
+    from incremental_features import feature_cache_dir
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        listings = _prepare(rows, seed)
+        shared_base = load_dataset(listings)
+        memory_base = shared_base.copy()  # mmap 이전처럼 메모리에 올린 기본 데이터
+        view = SharedView.at_least(shared_base, 'host_days', MIN_HOST_DAYS)
+        surface = RevenueSurface(view.frame(), fees=FEES, features_dir=feature_cache_dir(view.key, 'bench'))
+        # 보기의 공유 값과 기본 데이터 페이지는 세션 측정 전에 한 번 만들어 둠
+        _shared_session(view, surface, _fee_maps(1)[0])
+        _copy_session(memory_base, surface, _fee_maps(1)[0])
+
+    rows_out = [{'case': 'shared_base', 'rows': rows, 'view_rows': len(view),
+                 'base_mb': round(shared_base.memory_usage().sum() / 2**20, 1),
+                 'view_mb': round(view.nbytes / 2**20, 2)}]
+    for mode, run in [('copy', lambda fee_map: _copy_session(memory_base, surface, fee_map)),
+                      ('shared', lambda fee_map: _shared_session(view, surface, fee_map))]:
+        for n in sessions:
+            gc.collect()
+            rss_before = _rss_mb()
+            tracemalloc.start()
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=min(n, 8)) as pool:
+                states = list(pool.map(run, _fee_maps(n, seed + n)))
+            seconds = time.perf_counter() - start
+            traced = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            rss_after = _rss_mb()
+            rows_out.append({'case': f'sessions.{mode}', 'sessions': n,
+                             'per_session_mb': round(traced / n / 2**20, 2),
+                             'total_mb': round(traced / 2**20, 1),
+                             'rss_growth_mb': round(rss_after - rss_before, 1) if rss_before is not None else None,
+                             'seconds': round(seconds, 2)})
+            del states
+    return rows_out
+
+
+def _smaps_rollup(pid):
+    values = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0] in ('Rss:', 'Pss:', 'Shared_Clean:', 'Private_Dirty:'):
+                    values[parts[0][:-1]] = int(parts[1]) / 1024
+    except OSError:
+        pass
+    return values
+
+
+def _worker(workspace, listings, features_dir, mmap_mode, ready, stop):
+    # 서버 워커 하나: 기본 데이터 + 기본 피처를 올리고 전부 한 번 읽은 뒤 대기
+    os.chdir(workspace)
+    with contextlib.redirect_stdout(io.StringIO()):
+        from dataset_store import load_dataset
+        from sw_prediction_file import load_predict_model
+        from incremental_features import IncrementalFeatures
+        from shared_dataset import SharedView
+
+        base = load_dataset(listings, mmap_mode=mmap_mode)
+        scaler = load_predict_model()['scaler']
+        if mmap_mode is None:
+            features = IncrementalFeatures(SharedView.at_least(base, 'host_days', MIN_HOST_DAYS).frame(), scaler)
+        else:
+            features = IncrementalFeatures.load(features_dir, scaler)
+        total = sum(float(np.nansum(base[c].to_numpy(dtype=float))) for c in base.columns)
+        total += float(np.asarray(features.X_base).sum())
+    ready.put(total)
+    stop.wait()
+
+
+def worker_report(rows=100_000, workers=3, seed=0):
+    from dataset_store import load_dataset
+    from shared_dataset import SharedView
+    from sw_prediction_file import load_predict_model
+    from incremental_features import feature_cache_dir, load_or_build
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        listings = os.path.abspath(_prepare(rows, seed))
+        view = SharedView.at_least(load_dataset(listings), 'host_days', MIN_HOST_DAYS)
+        features_dir = os.path.join(feature_cache_dir(view.key, 'bench'), 'all')
+        load_or_build(features_dir, view.frame(), load_predict_model()['scaler'])
+
+    context = mp.get_context('spawn')
+    rows_out = []
+    for mode in ('r', None):
+        ready, stop = context.Queue(), context.Event()
+        procs = [context.Process(target=_worker, args=(os.getcwd(), listings, features_dir, mode, ready, stop))
+                 for _ in range(workers)]
+        for p in procs:
+            p.start()
+        for _ in procs:
+            ready.get(timeout=600)
+        stats = [_smaps_rollup(p.pid) for p in procs]
+        stop.set()
+        for p in procs:
+            p.join()
+        rows_out.append({'case': f"workers.{'mmap' if mode else 'memory'}", 'workers': workers,
+                         'rss_mb_each': round(np.mean([s.get('Rss', 0) for s in stats]), 1),
+                         'pss_mb_each': round(np.mean([s.get('Pss', 0) for s in stats]), 1),
+                         'private_dirty_mb_each': round(np.mean([s.get('Private_Dirty', 0) for s in stats]), 1),
+                         'pss_mb_total': round(sum(s.get('Pss', 0) for s in stats), 1)})
+    return rows_out
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='동시 세션/워커 프로세스별 메모리 (세션 복사본 vs 공유 기본 데이터)')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--workers', type=int, default=3, help='0 이면 워커 프로세스 측정 생략')
+    args = parser.parse_args()
+
+    os.makedirs(WORKSPACE, exist_ok=True)
+    os.chdir(WORKSPACE)
+    for row in session_report(args.rows, args.sessions):
+        print(json.dumps(row, ensure_ascii=False), flush=True)
+    if args.workers:
+        for row in worker_report(args.rows, args.workers):
+            print(json.dumps(row, ensure_ascii=False), flush=True)
@@ -0,0 +1,59 @@
+import filecmp
+import os
+import pickle
+import shutil
+
+import lightgbm as lgb
+from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.preprocessing import StandardScaler
+
+from sw_prediction_file import make_features, NON_FEATURE_COLUMNS
+from sa_simulation_file import assign_booked_group, FEE_BEFORE
+from benchmarks.synthetic_data import generate_listings
+
+# 실제 모델 번들(Google Drive)과 같은 구조의 대역 앙상블: {'scaler', 'rf', 'lgb', 'gb', 'knn'}
+# 가짜 데이터로 작게 학습 -> 정확도가 아니라 예측 경로의 속도/메모리를 재는 용도
+# 크기는 실제 번들보다 작으므로 절대값보다 같은 조건의 이전 결과와 비교하는 데 사용
+# 버전이 바뀌면(하이퍼파라미터 등) 올려서 이전 파일을 다시 만들게 함
+STAND_IN_VERSION = 3
+DEFAULT_TRAIN_ROWS = 20_000
+
+
+def training_matrix(df):
+    # predict_booked_days 가 모델에 넣는 것과 같은 열 (fee 관련 열은 기존 수수료로 채움)
+    df = df.copy()
+    df['booked_group'] = assign_booked_group(df['booked'])
+    df['fee_before'] = FEE_BEFORE
+    df['fee_rate'] = FEE_BEFORE
+    df = make_features(df)
+    return df.drop(columns=NON_FEATURE_COLUMNS), df['booked'].to_numpy(dtype=float)
+
+
+def train_stand_in_model(train_rows=DEFAULT_TRAIN_ROWS, seed=0):
+    X, y = training_matrix(generate_listings(train_rows, seed + 1000))
+    scaler = StandardScaler().fit(X)
+    X_scaled = scaler.transform(X)
+    return {
+        'scaler': scaler,
+        'rf': RandomForestRegressor(n_estimators=50, max_depth=12, n_jobs=-1, random_state=seed).fit(X_scaled, y),
+        'lgb': lgb.LGBMRegressor(n_estimators=100, random_state=seed, verbose=-1).fit(X_scaled, y),
+        'gb': GradientBoostingRegressor(n_estimators=100, random_state=seed).fit(X_scaled, y),
+        'knn': KNeighborsRegressor(n_neighbors=5).fit(X_scaled, y),
+    }
+
+
+def write_stand_in_model(path, train_rows=DEFAULT_TRAIN_ROWS, seed=0):
+    # 같은 설정으로 이미 만든 파일이 있으면 그대로 사용 (파일 이름에 설정이 들어 있음)
+    source = os.path.join(os.path.dirname(path) or '.', f"stand_in_v{STAND_IN_VERSION}_{train_rows}_{seed}.pkl")
+    if not os.path.exists(source):
+        print(f"🏋️ 대역 모델 학습 중... ({train_rows:,}행)")
+        bundle = train_stand_in_model(train_rows, seed)
+        tmp = f"{source}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            pickle.dump(bundle, f)
+        os.replace(tmp, source)
+    # 파이프라인이 읽는 경로(models/ensemble_model.pkl)에 복사 (내용이 다를 때만 다시 씀)
+    if not os.path.exists(path) or not filecmp.cmp(source, path, shallow=False):
+        shutil.copyfile(source, path)
+    return path
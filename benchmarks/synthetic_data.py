@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import MERGED_SCHEMA
+
+# 벤치마크용 가짜 숙소 데이터 (capstone_example.csv 와 같은 열/순서)
+# 실제 데이터는 저장소에 없으므로 분포만 비슷하게 맞추고, booked 는 피처와 상관 있게 만들어
+# 대역 모델(stand_in_model)이 의미 있는 예측을 하도록 함. seed 가 같으면 항상 같은 데이터
+NEIGHBOURHOODS = ['Brooklyn', 'Manhattan', 'Queens', 'Staten Island', None]  # None = 원핫 전부 0 (Bronx)
+NEIGHBOURHOOD_P = [0.38, 0.42, 0.13, 0.01, 0.06]
+URL_PREFIX = 'https://www.airbnb.com/rooms/'
+CENTER = (40.73, -73.95)
+DATA_VERSION = 3
+
+
+def _clip_round(values, low, high, decimals=0):
+    return np.round(np.clip(values, low, high), decimals)
+
+
+def generate_listings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    d = {}
+
+    superhost = rng.random(n) < 0.25
+    d['host_response_rate'] = _clip_round(rng.normal(92, 12, n) + superhost * 5, 0, 100)
+    d['host_acceptance_rate'] = _clip_round(d['host_response_rate'] - rng.normal(5, 10, n), 0, 100)
+    d['accommodates'] = np.clip(rng.poisson(1.8, n) + 1, 1, 16)
+    d['bedrooms'] = _clip_round(d['accommodates'] / 2 + rng.normal(0, 0.5, n), 0, 8)
+    host_days = rng.integers(30, 5000, n)
+    # 실제 데이터처럼 리뷰 0개 숙소도 있음 (약 3%)
+    d['number_of_reviews'] = rng.negative_binomial(1, 0.03, n)
+    d['number_of_reviews_ltm'] = rng.binomial(d['number_of_reviews'], 0.15)
+    d['reviews_per_month'] = _clip_round(d['number_of_reviews'] / np.maximum(host_days / 30, 1) * 3, 0, 30, 2)
+    d['host_is_superhost'] = superhost.astype(int)
+    d['host_response_time'] = rng.integers(1, 5, n)
+    d['instant_bookable'] = (rng.random(n) < 0.35).astype(int)
+    d['calculated_host_listings_count_private_rooms'] = rng.poisson(0.6, n)
+    d['calculated_host_listings_count_shared_rooms'] = rng.poisson(0.05, n)
+
+    # 숙소 품질 하나에서 세부 리뷰 점수들이 흩어지게
+    quality = np.clip(rng.normal(4.7, 0.25, n) + superhost * 0.1, 1, 5)
+    for col in ['rating', 'accuracy', 'cleanliness', 'checkin', 'communication', 'location', 'value']:
+        d[f'review_scores_{col}'] = _clip_round(quality + rng.normal(0, 0.15, n), 1, 5, 2)
+    d['host_days'] = host_days
+    d['days_since_last_review'] = np.clip(rng.exponential(200, n), 0, 3000).astype(int)
+
+    area = rng.choice(len(NEIGHBOURHOODS), size=n, p=NEIGHBOURHOOD_P)
+    for i, name in enumerate(NEIGHBOURHOODS):
+        if name is not None:
+            d[f'neighbourhood_group_cleansed_{name}'] = (area == i).astype(int)
+    d['room_type_1.0'] = (rng.random(n) < 0.55).astype(int)
+    d['listing_id'] = np.arange(n) + 10001
+
+    manhattan = area == NEIGHBOURHOODS.index('Manhattan')
+    d['price'] = _clip_round(np.exp(rng.normal(4.8, 0.6, n)) * (1 + 0.4 * manhattan) * (1 + 0.1 * d['accommodates']), 20, 2000)
+
+    d['cleanliness_score'] = _clip_round(d['review_scores_cleanliness'] + rng.normal(0, 0.3, n), 1, 5)
+    d['host_friendliness_score'] = _clip_round((d['review_scores_communication'] + d['host_response_rate'] / 20) / 2, 1, 5)
+    d['value_score'] = _clip_round(d['review_scores_value'] - (d['price'] > 300), 1, 5)
+    d['id'] = np.arange(n) + 1
+
+    for name in ['basic', 'safety', 'hygiene', 'cooking', 'sleep', 'appliances', 'work', 'checkin', 'pet']:
+        d[f'has_{name}_score'] = rng.integers(0, 3, n).astype(float)
+    d['has_longterm_score'] = np.round(rng.random(n), 4)
+    d['facility_score'] = _clip_round(sum(d[f'has_{name}_score'] for name in ['basic', 'safety', 'cooking', 'sleep']) / 1.6, 1, 5)
+
+    # 예약일수: 리뷰/슈퍼호스트/즉시예약/가격에 따라 (0~365)
+    latent = (90 + 60 * superhost + 25 * d['instant_bookable'] + 4 * d['number_of_reviews_ltm']
+              + 30 * (quality - 4.7) - 0.05 * d['price'] + rng.normal(0, 50, n))
+    d['booked'] = np.clip(latent, 0, 365).astype(int)
+
+    return pd.DataFrame(d)[list(MERGED_SCHEMA)]
+
+
+def generate_locations(n, seed=0):
+    # show_map 용 위치 데이터 (inside_airbnb_location.csv 와 같은 열)
+    rng = np.random.default_rng(seed + 1)
+    return pd.DataFrame({
+        'latitude': np.round(rng.normal(CENTER[0], 0.06, n), 6),
+        'longitude': np.round(rng.normal(CENTER[1], 0.06, n), 6),
+        'listing_url': [f"{URL_PREFIX}{i}" for i in np.arange(n) + 10001],
+    })
+
+
+def write_dataset(n, folder, seed=0):
+    # (숙소 CSV, 위치 CSV) 경로. 이미 있으면 다시 만들지 않음 (생성 규칙이 바뀌면 DATA_VERSION 을 올려 새 파일로)
+    os.makedirs(folder, exist_ok=True)
+    listings = os.path.join(folder, f"listings_{n}_{seed}_v{DATA_VERSION}.csv")
+    locations = os.path.join(folder, f"locations_{n}_{seed}_v{DATA_VERSION}.csv")
+    for path, generate in ((listings, generate_listings), (locations, generate_locations)):
+        if not os.path.exists(path):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            generate(n, seed).to_csv(tmp, index=False)
+            os.replace(tmp, path)
+    return listings, locations
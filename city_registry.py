@@ -0,0 +1,268 @@
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+from dataset_store import load_dataset, unload_dataset
+from model_registry import registry as model_registry
+from sw_prediction_file import load_predict_model, MODEL_PATH, MODEL_FILE_ID
+from shared_dataset import SharedView
+
+# 도시별 데이터/위치/모델/수수료 조건
+# dataset_path: 시뮬레이션 데이터 (merged 스키마), location_path: 지도용 위치 데이터
+# model_path / model_file_id: 앙상블 번들과 (없을 때 받을) Google Drive 파일 ID
+# max_mid_fee / min_host_delta: 최적 수수료 탐색 조건 (중위 수수료 상한 %, 호스트 수익 최소 증가율 %)
+# min_host_days: 시뮬레이션에 넣을 호스트 경력 하한 (일)
+City = namedtuple('City', ['name', 'dataset_path', 'location_path', 'model_path', 'model_file_id',
+                           'max_mid_fee', 'min_host_delta', 'min_host_days'])
+
+
+def city(name, slug, model_file_id=None, max_mid_fee=3.3, min_host_delta=1.5, min_host_days=365, **paths):
+    # 경로를 따로 주지 않으면 assets/cities/<slug>/, models/<slug>/ 아래 같은 파일 이름
+    return City(
+        name=name,
+        dataset_path=paths.get('dataset_path', f"assets/cities/{slug}/inside_airbnb_merged_final_data.csv"),
+        location_path=paths.get('location_path', f"assets/cities/{slug}/inside_airbnb_location.csv"),
+        model_path=paths.get('model_path', f"models/{slug}/ensemble_model.pkl"),
+        model_file_id=model_file_id,
+        max_mid_fee=max_mid_fee,
+        min_host_delta=min_host_delta,
+        min_host_days=min_host_days,
+    )
+
+
+DEFAULT_CITY = 'New York'
+CITIES = OrderedDict((c.name, c) for c in [
+    city('New York', 'new_york', MODEL_FILE_ID,
+         dataset_path='assets/inside_airbnb_merged_final_data.csv',
+         location_path='assets/inside_airbnb_location.csv',
+         model_path=MODEL_PATH),
+    city('Los Angeles', 'los_angeles'),
+    city('Washington, D.C.', 'washington_dc'),
+    city('Chicago', 'chicago'),
+    city('Houston', 'houston'),
+    city('Denver', 'denver'),
+    city('Phoenix', 'phoenix'),
+    city('Seattle', 'seattle'),
+    city('Austin', 'austin'),
+])
+
+# 상주 데이터+모델 메모리 상한 (환경변수 CITY_MEMORY_MB 로 조정)
+DEFAULT_MAX_BYTES = int(float(os.environ.get('CITY_MEMORY_MB', 1024)) * 2**20)
+
+
+class _Resident:
+    def __init__(self, city):
+        self.city = city
+        self.lock = threading.Lock()
+        self.df = None
+        self.model_bundle = None
+        self.views = {}
+        self.bytes = 0
+        # 이 도시 데이터로 만든 큰 객체(예: 매출 곡면)의 메모리 {키: 바이트} - 상한 계산에 포함, 도시를 내리면 비움
+        self.extra = {}
+        self.users = 0
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_seconds = None
+        self.last_used = None
+
+    @property
+    def loaded(self):
+        return self.df is not None
+
+    @property
+    def total_bytes(self):
+        return self.bytes + sum(self.extra.values())
+
+    def view(self, min_host_days):
+        # host_days >= min_host_days 인 행 (행 번호 배열을 모든 세션이 같이 씀, 올라와 있을 때만 - registry.use 안에서)
+        with self.lock:
+            view = self.views.get(min_host_days)
+            if view is None:
+                view = self.views[min_host_days] = SharedView.at_least(self.df, 'host_days', min_host_days)
+            return view
+
+
+# 도시별 데이터/모델을 처음 선택될 때 올리고, 상주 메모리가 max_bytes 를 넘으면
+# 쓰는 중이 아닌 도시부터 가장 오래 안 쓴 순서(LRU)로 내림
+# 내린 도시는 디스크 변환본(.npy)/모델 파일이 남아 있어서 다시 올리는 비용은 CSV 변환/다운로드보다 훨씬 작음
+# 메모리는 데이터 DataFrame 크기 + 모델 파일 크기로 셈 (sklearn 번들은 대부분 numpy 배열이라 파일 크기와 비슷)
+# 도시 데이터로 만든 매출 곡면 등은 charge 로 그 도시 몫에 더함 (도시를 내리면 on_evict 쪽에서 놓음)
+class CityRegistry:
+    def __init__(self, cities=CITIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.cities = OrderedDict(cities)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # 앞쪽이 가장 오래 안 쓴 도시
+        self._listeners = []
+
+    def names(self):
+        return list(self.cities)
+
+    def available(self, name):
+        # 데이터가 있고 모델이 있거나 받을 수 있으면 선택 가능
+        c = self.cities.get(name)
+        if c is None or not os.path.exists(c.dataset_path):
+            return False
+        return os.path.exists(c.model_path) or c.model_file_id is not None
+
+    def on_evict(self, callback):
+        # callback(도시 이름): 도시를 내린 뒤 호출 (그 도시 데이터로 만든 캐시를 같이 비울 때)
+        self._listeners.append(callback)
+
+    def _entry(self, name):
+        if name not in self.cities:
+            raise KeyError(f"등록되지 않은 도시입니다: {name}")
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._entries[name] = _Resident(self.cities[name])
+        return entry
+
+    @contextmanager
+    def use(self, name):
+        # 쓰는 동안(with 블록)에는 내리지 않음
+        entry = self._acquire(name)
+        try:
+            yield entry
+        finally:
+            with self._lock:
+                entry.users -= 1
+            self._enforce_limit()
+
+    def get(self, name):
+        # 올리기만 하고 바로 놓음 (반환된 데이터/모델은 그대로 쓸 수 있지만 이후 내려갈 수 있음)
+        with self.use(name) as entry:
+            return entry
+
+    def charge(self, name, key, nbytes):
+        # 도시 데이터로 만든 객체의 메모리를 그 도시 몫으로 셈 (같은 키는 덮어씀)
+        # 도시가 올라와 있지 않으면(만드는 사이 내려감) False -> 호출한 쪽에서 객체를 놓음
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or not entry.loaded:
+                return False
+            entry.extra[key] = int(nbytes)
+        self._enforce_limit()
+        return True
+
+    def _acquire(self, name):
+        with self._lock:
+            entry = self._entry(name)
+            entry.users += 1
+            entry.last_used = time.time()
+            self._entries.move_to_end(name)
+        try:
+            with entry.lock:
+                if entry.loaded:
+                    entry.hits += 1
+                else:
+                    self._load(entry)
+        except Exception:
+            with self._lock:
+                entry.users -= 1
+            raise
+        self._enforce_limit()
+        return entry
+
+    def _load(self, entry):
+        c = entry.city
+        start = time.perf_counter()
+        # 공유 DataFrame (읽기 전용 mmap, 수정할 때는 호출하는 쪽에서 .copy())
+        df = load_dataset(c.dataset_path)
+        model_bundle = load_predict_model(c.model_path, c.model_file_id)
+        entry.bytes = int(df.memory_usage(deep=True).sum()) + os.path.getsize(c.model_path)
+        entry.df, entry.model_bundle = df, model_bundle
+        entry.load_seconds = time.perf_counter() - start
+        entry.loads += 1
+        print(f"🏙️ 도시 로드: {c.name} ({entry.load_seconds:.2f}s, {entry.bytes / 2**20:,.1f}MB)")
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(e.total_bytes for e in self._entries.values() if e.loaded)
+
+    def _enforce_limit(self):
+        evicted = []
+        with self._lock:
+            total = sum(e.total_bytes for e in self._entries.values() if e.loaded)
+            for entry in list(self._entries.values()):
+                if total <= self.max_bytes:
+                    break
+                if entry.users or not entry.loaded:
+                    continue
+                total -= entry.total_bytes
+                self._unload(entry)
+                evicted.append(entry.city.name)
+        for name in evicted:
+            for callback in self._listeners:
+                callback(name)
+
+    def _unload(self, entry):
+        # 다른 상주 도시가 같은 파일을 쓰면 그 파일은 남겨 둠
+        c = entry.city
+        others = [e.city for e in self._entries.values() if e is not entry and e.loaded]
+        if all(o.dataset_path != c.dataset_path for o in others):
+            unload_dataset(c.dataset_path)
+        if all(o.model_path != c.model_path for o in others):
+            model_registry.evict(c.model_path)
+        entry.df = entry.model_bundle = None
+        entry.views = {}
+        entry.bytes = 0
+        entry.extra = {}
+        entry.evictions += 1
+        print(f"🧹 도시 내림: {c.name}")
+
+    def evict(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry.users or not entry.loaded:
+                return False
+            self._unload(entry)
+        for callback in self._listeners:
+            callback(name)
+        return True
+
+    def prewarm(self, names, background=False):
+        # 시작할 때 미리 올려 둘 도시 (background=True 면 별도 스레드에서, 실패는 출력만)
+        names = [n for n in names if self.available(n)]
+
+        def run():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    print(f"⚠️ 도시 미리 로드 실패: {name} ({e})")
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='city-prewarm', daemon=True)
+        thread.start()
+        return thread
+
+    def metrics(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        return [
+            {
+                'city': e.city.name,
+                'loaded': e.loaded,
+                'mb': round(e.total_bytes / 2**20, 1),
+                'extra_mb': round(sum(e.extra.values()) / 2**20, 1),
+                'users': e.users,
+                'loads': e.loads,
+                'hits': e.hits,
+                'evictions': e.evictions,
+                'load_seconds': None if e.load_seconds is None else round(e.load_seconds, 3),
+                'last_used': e.last_used,
+            }
+            for e in entries
+        ]
+
+
+def prewarm_from_env(city_registry, variable='PREWARM_CITIES'):
+    # 예: PREWARM_CITIES="New York,Chicago" -> 시작할 때 백그라운드로 올림
+    names = [n.strip() for n in os.environ.get(variable, '').split(',') if n.strip()]
+    return city_registry.prewarm(names, background=True) if names else None
@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DATASET_CACHE_DIR = '.cache/datasets'
+# 변환본 .npy 를 읽기 전용 mmap 으로 염 -> 같은 파일을 여는 세션/서버 워커 프로세스가 OS 페이지 캐시를 같이 씀
+# (공유 DataFrame 의 열에 값을 쓰면 에러가 나므로 고칠 때는 .copy(), None 이면 메모리로 읽음)
+MMAP_MODE = 'r'
+# 스키마/저장 형식이 바뀌면 올려서 이전 변환본을 무효화
+SCHEMA_VERSION = 2
+
+# 열별 저장 dtype: 점수/비율은 float32, 0/1 플래그와 원핫은 int8, 일수는 int16
+# price 는 매출(가격 x 예약일수) 합계에 쓰이므로 float64 (float32 로 합하면 총액이 어긋남)
+# 값이 dtype 범위를 넘으면 더 넓은 정수로, NaN 이 있거나 정수가 아니면 float64 로 자동으로 넓힘 (id 같은 큰 정수도 정확히)
+MERGED_SCHEMA = {
+    'host_response_rate': 'float32',
+    'host_acceptance_rate': 'float32',
+    'accommodates': 'int8',
+    'bedrooms': 'float32',
+    'number_of_reviews': 'int32',
+    'number_of_reviews_ltm': 'int32',
+    'reviews_per_month': 'float32',
+    'host_is_superhost': 'int8',
+    'host_response_time': 'int8',
+    'instant_bookable': 'int8',
+    'calculated_host_listings_count_private_rooms': 'int16',
+    'calculated_host_listings_count_shared_rooms': 'int16',
+    'review_scores_rating': 'float32',
+    'review_scores_accuracy': 'float32',
+    'review_scores_cleanliness': 'float32',
+    'review_scores_checkin': 'float32',
+    'review_scores_communication': 'float32',
+    'review_scores_location': 'float32',
+    'review_scores_value': 'float32',
+    'host_days': 'int16',
+    'days_since_last_review': 'int16',
+    'neighbourhood_group_cleansed_Brooklyn': 'int8',
+    'neighbourhood_group_cleansed_Manhattan': 'int8',
+    'neighbourhood_group_cleansed_Queens': 'int8',
+    'neighbourhood_group_cleansed_Staten Island': 'int8',
+    'room_type_1.0': 'int8',
+    'listing_id': 'int64',
+    'booked': 'int16',
+    'price': 'float64',
+    'cleanliness_score': 'float32',
+    'host_friendliness_score': 'float32',
+    'value_score': 'float32',
+    'facility_score': 'float32',
+    'id': 'int64',
+    'has_basic_score': 'float32',
+    'has_safety_score': 'float32',
+    'has_hygiene_score': 'float32',
+    'has_cooking_score': 'float32',
+    'has_sleep_score': 'float32',
+    'has_appliances_score': 'float32',
+    'has_work_score': 'float32',
+    'has_checkin_score': 'float32',
+    'has_pet_score': 'float32',
+    'has_longterm_score': 'float32',
+}
+
+LOCATION_SCHEMA = {
+    'latitude': 'float32',
+    'longitude': 'float32',
+    'listing_url': 'bytes',
+}
+
+
+def _required_merged_columns():
+    # make_features / update_columns_by_fee_change / scale_X 가 원본에서 읽는 열
+    # (sw_prediction_file.load_data 가 이 모듈을 쓰므로 순환 import 를 피해 여기서 import)
+    from sw_prediction_file import FEATURES, NON_FEATURE_COLUMNS
+    from sa_simulation_file import base_coefficients
+
+    computed = {f.name for f in FEATURES} | {'fee_before', 'booked_group', 'fee_rate'}
+    required = set(base_coefficients) | {'booked', 'price'}
+    required |= {c for f in FEATURES for c in f.inputs}
+    required |= set(NON_FEATURE_COLUMNS)
+    return sorted(required - computed)
+
+
+REQUIRED_COLUMNS = {
+    'merged': _required_merged_columns,
+    'location': lambda: ['latitude', 'longitude', 'listing_url'],
+}
+
+
+def validate_schema(columns, kind):
+    missing = [c for c in REQUIRED_COLUMNS[kind]() if c not in columns]
+    if missing:
+        raise ValueError(f"데이터에 필요한 열이 없습니다 ({kind}): {missing}")
+
+
+_INT_TYPES = ['int8', 'int16', 'int32', 'int64']
+
+
+def _compact(series, dtype):
+    # 선언한 dtype 으로 줄이되, 값이 손실되면 더 넓은 타입으로
+    if dtype == 'bytes':
+        return series.astype(str).str.encode('utf-8').to_numpy(dtype=bytes)
+    values = series.to_numpy()
+    if dtype is None:
+        if values.dtype.kind == 'f':
+            dtype = 'float32'
+        elif values.dtype.kind in 'iub':
+            dtype = 'int8'
+        else:
+            return values.astype(str).astype(bytes)
+    if dtype in _INT_TYPES:
+        if np.isnan(values.astype(float)).any() or not np.array_equal(values, np.round(values)):
+            return values.astype('float64')  # float32 는 2^24 보다 큰 정수(id 등)를 정확히 못 담음
+        for candidate in _INT_TYPES[_INT_TYPES.index(dtype):]:
+            info = np.iinfo(candidate)
+            if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+                return values.astype(candidate)
+    return values.astype(dtype)
+
+
+def _source_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def dataset_source_key(path):
+    # 파일을 읽지 않는 데이터 키 (원본 경로 + mtime/크기 + 스키마 버전) - 화면마다 내용 해시를 하지 않도록
+    path = os.path.abspath(path)
+    mtime, size = _source_key(path)
+    return f"{path}|{mtime}|{size}|{SCHEMA_VERSION}"
+
+
+def _cache_folder(path, source_key, cache_dir):
+    tag = f"{os.path.abspath(path)}|{source_key[0]}|{source_key[1]}|{SCHEMA_VERSION}"
+    digest = hashlib.sha1(tag.encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{os.path.basename(path)}-{digest}")
+
+
+def convert_csv(path, schema, kind, folder):
+    # CSV -> 열별 .npy + manifest.json (한 번만)
+    start = time.perf_counter()
+    raw = pd.read_csv(path)
+    validate_schema(raw.columns, kind)
+    default_bytes = int(raw.memory_usage(deep=True).sum())
+
+    columns = {c: _compact(raw[c], schema.get(c)) for c in raw.columns}
+    convert_seconds = time.perf_counter() - start
+
+    tmp = f"{folder}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    files = {}
+    for i, (name, values) in enumerate(columns.items()):
+        files[name] = f"{i:03d}.npy"
+        np.save(os.path.join(tmp, files[name]), values)
+    manifest = {
+        'source': os.path.abspath(path),
+        'kind': kind,
+        'rows': len(raw),
+        'columns': list(columns),
+        'files': files,
+        'dtypes': {name: str(values.dtype) for name, values in columns.items()},
+        'csv_default_bytes': default_bytes,
+        'convert_seconds': convert_seconds,
+    }
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    # 같은 원본의 이전 변환본 정리 후 교체 (파일 이름이 같은 다른 도시 데이터의 변환본은 남김)
+    prefix = f"{os.path.basename(path)}-"
+    parent = os.path.dirname(folder)
+    for name in os.listdir(parent):
+        stale = os.path.join(parent, name)
+        if name.startswith(prefix) and stale != folder and not name.endswith('.tmp') \
+                and _manifest_source(stale) in (None, manifest['source']):
+            shutil.rmtree(stale, ignore_errors=True)
+    if os.path.exists(folder):
+        shutil.rmtree(tmp, ignore_errors=True)
+    else:
+        os.replace(tmp, folder)
+    return manifest
+
+
+def _manifest_source(folder):
+    # 변환본의 원본 CSV 경로 (manifest 가 없거나 깨졌으면 None)
+    try:
+        with open(os.path.join(folder, 'manifest.json')) as f:
+            return json.load(f).get('source')
+    except (OSError, ValueError):
+        return None
+
+
+def read_columns(folder, manifest, mmap_mode=None):
+    data = {}
+    for name in manifest['columns']:
+        values = np.load(os.path.join(folder, manifest['files'][name]), mmap_mode=mmap_mode)
+        if values.dtype.kind == 'S':
+            values = values.astype(str)
+        data[name] = values
+    # mmap 이면 열을 한 블록으로 합치지 않고(copy=False) 파일 매핑을 그대로 참조
+    return pd.DataFrame(data, columns=manifest['columns'], copy=mmap_mode is None)
+
+
+# 프로세스 단위 메모: 원본 경로 -> (원본 mtime/크기, DataFrame, 리포트)
+_loaded = {}
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def _path_lock(path):
+    with _locks_lock:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def load_dataset(path, schema=MERGED_SCHEMA, kind='merged', cache_dir=DATASET_CACHE_DIR, mmap_mode=MMAP_MODE):
+    # 반환되는 DataFrame 은 프로세스 안에서 공유되므로 수정하지 말고 필요하면 .copy() 해서 사용
+    # (메모는 경로별 하나라 mmap_mode 는 처음 올릴 때만 적용됨)
+    path = os.path.abspath(path)
+    source_key = _source_key(path)
+    cached = _loaded.get(path)
+    if cached is not None and cached[0] == source_key:
+        return cached[1]
+
+    with _path_lock(path):
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == source_key:
+            return cached[1]
+
+        start = time.perf_counter()
+        folder = _cache_folder(path, source_key, cache_dir)
+        manifest_path = os.path.join(folder, 'manifest.json')
+        cold = not os.path.exists(manifest_path)
+        if cold:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                manifest = convert_csv(path, schema, kind, folder)
+            except OSError:
+                # 캐시 디렉터리에 쓸 수 없으면 CSV 에서 바로 (dtype 만 줄여서) 읽음
+                raw = pd.read_csv(path)
+                validate_schema(raw.columns, kind)
+                df = pd.DataFrame({c: _compact(raw[c], schema.get(c)) for c in raw.columns})
+                if 'listing_url' in df:
+                    df['listing_url'] = df['listing_url'].str.decode('utf-8')
+                manifest = {'rows': len(df), 'csv_default_bytes': int(raw.memory_usage(deep=True).sum())}
+                folder = None
+        else:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+
+        if folder is not None:
+            df = read_columns(folder, manifest, mmap_mode)
+        report = {
+            'path': path,
+            'rows': manifest['rows'],
+            'cold': cold,
+            'mmap': folder is not None and mmap_mode is not None,
+            'load_seconds': time.perf_counter() - start,
+            'memory_bytes': int(df.memory_usage(deep=True).sum()),
+            'csv_default_bytes': manifest['csv_default_bytes'],
+        }
+        print(f"🗂️ 데이터 로드: {os.path.basename(path)} ({'CSV 변환' if cold else 'mmap' if report['mmap'] else '캐시'}, "
+              f"{report['load_seconds']:.2f}s, {report['memory_bytes'] / 2**20:,.1f}MB"
+              f" / CSV 기본 {report['csv_default_bytes'] / 2**20:,.1f}MB)")
+        _loaded[path] = (source_key, df, report)
+        return df
+
+
+def dataset_reports():
+    return [report for _, _, report in _loaded.values()]
+
+
+def unload_dataset(path):
+    # 프로세스 메모에서 내림 (디스크 변환본은 남아 있어서 다음 load_dataset 은 빠름)
+    # 반환: 내린 DataFrame 의 메모리 크기 (없었으면 0)
+    path = os.path.abspath(path)
+    with _path_lock(path):
+        cached = _loaded.pop(path, None)
+    return cached[2]['memory_bytes'] if cached is not None else 0
+
+
+def load_locations(path='assets/inside_airbnb_location.csv'):
+    return load_dataset(path, LOCATION_SCHEMA, kind='location')
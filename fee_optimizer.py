@@ -0,0 +1,282 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from sw_prediction_file import load_predict_model, dataset_fingerprint, MODEL_PATH
+from grid_search_for_best_fee import evaluate_fee_blocks, original_host_revenue, triple_to_fee_map
+from incremental_features import IncrementalFeatures
+from model_registry import registry
+
+GROUPS = ('high', 'mid', 'low')
+
+
+# ---- 제약 조건 (선언형) ----
+# mask() 가 있는 제약은 수수료 값만으로 판단 -> 모델 호출 전에 후보에서 제거
+# satisfied() 가 있는 제약은 평가 결과로 판단
+class FeeOrder:
+    # 상위 < 중위 < 하위 (예약이 많을수록 낮은 수수료)
+    def __init__(self, order=GROUPS):
+        self.order = order
+
+    def mask(self, fees):
+        ok = np.ones(np.shape(fees[self.order[0]]), dtype=bool)
+        for lower, upper in zip(self.order, self.order[1:]):
+            ok &= fees[lower] < fees[upper]
+        return ok
+
+
+class FeeBound:
+    def __init__(self, group, lower=None, upper=None):
+        self.group, self.lower, self.upper = group, lower, upper
+
+    def mask(self, fees):
+        ok = np.ones(np.shape(fees[self.group]), dtype=bool)
+        if self.lower is not None:
+            ok &= fees[self.group] >= self.lower - 1e-12
+        if self.upper is not None:
+            ok &= fees[self.group] <= self.upper + 1e-12
+        return ok
+
+
+class MinHostDelta:
+    # 호스트 수익이 기존 대비 min_delta% 이상 증가
+    def __init__(self, min_delta=1.5):
+        self.min_delta = min_delta
+
+    def satisfied(self, result):
+        return result['host_delta'] >= self.min_delta
+
+
+# 기존 grid_search_optimal_fee 조건: short < mid < long, mid <= 3.3%, 호스트 수익 1.5% 이상 증가
+DEFAULT_CONSTRAINTS = [FeeOrder(), FeeBound('mid', upper=0.033), MinHostDelta(1.5)]
+
+
+# ---- 평가 + 메모 ----
+# (데이터, 모델) 별 메모 테이블을 프로세스 안에서 공유 -> 전략/실행 간에 평가 결과 재사용
+# 최근에 쓴 MAX_MEMO_TABLES 개만 남김 (데이터/모델 지문이 바뀔 때마다 테이블이 쌓이지 않게, 앞쪽이 가장 오래 안 쓴 것)
+MAX_MEMO_TABLES = 8
+_memo_tables = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def memo_table(dataset_key, model_key):
+    key = (dataset_key, model_key)
+    with _memo_lock:
+        table = _memo_tables.get(key)
+        if table is None:
+            table = _memo_tables[key] = {}
+        _memo_tables.move_to_end(key)
+        while len(_memo_tables) > MAX_MEMO_TABLES:
+            _memo_tables.popitem(last=False)
+        return table
+
+
+def fee_key(triple):
+    return tuple(round(float(f), 6) for f in triple)
+
+
+class FeeEvaluator:
+    def __init__(self, df, model_path=MODEL_PATH, memo=None, max_block_rows=250_000):
+        self.df = df
+        self.model_path = model_path
+        self.max_block_rows = max_block_rows
+        self.model_bundle = load_predict_model(model_path)
+        self.memo = memo if memo is not None else memo_table(dataset_fingerprint(df), registry.fingerprint(model_path))
+        self.orig_host_total = original_host_revenue(df)
+        self.price = df['price'].to_numpy(dtype=float)
+        self._features = None
+        self.evaluations = 0
+        self.memo_hits = 0
+
+    @property
+    def features(self):
+        # 메모에 다 있으면 피처 행렬도 만들 필요 없음
+        if self._features is None:
+            self._features = IncrementalFeatures(self.df, self.model_bundle['scaler'])
+        return self._features
+
+    def evaluate(self, triples):
+        keys = [fee_key(t) for t in triples]
+        missing = list(dict.fromkeys(k for k in keys if k not in self.memo))
+        self.memo_hits += len(keys) - len(missing)
+        if missing:
+            airbnb, host = evaluate_fee_blocks(self.features, self.price, self.model_bundle,
+                                               [triple_to_fee_map(k) for k in missing], self.max_block_rows)
+            for key, a, h in zip(missing, airbnb, host):
+                self.memo[key] = (float(a), float(h))
+            self.evaluations += len(missing)
+        return [self.result(k) for k in keys]
+
+    def result(self, key):
+        airbnb, host = self.memo[key]
+        return {
+            'fee': key,
+            'airbnb_revenue': airbnb,
+            'host_revenue': host,
+            'host_delta': float((host - self.orig_host_total) / self.orig_host_total * 100),
+        }
+
+
+# ---- 탐색 공간 ----
+# 수수료는 resolution 의 정수배로만 다룸 (float 누적 오차 방지)
+class FeeSpace:
+    def __init__(self, constraints, lower=0.0, upper=0.06, resolution=0.001):
+        self.resolution = resolution
+        self.lower = int(round(lower / resolution))
+        self.upper = int(round(upper / resolution))
+        self.fee_constraints = [c for c in constraints if hasattr(c, 'mask')]
+        self.result_constraints = [c for c in constraints if hasattr(c, 'satisfied')]
+
+    def to_fee(self, units):
+        return tuple(round(u * self.resolution, 6) for u in units)
+
+    def feasible(self, high, mid, low):
+        # 정수 단위 배열 -> 수수료 제약 만족 여부 (모델 호출 없음)
+        fees = {'high': high * self.resolution, 'mid': mid * self.resolution, 'low': low * self.resolution}
+        ok = np.ones(np.broadcast(high, mid, low).shape, dtype=bool)
+        for constraint in self.fee_constraints:
+            ok &= constraint.mask(fees)
+        return ok
+
+    def grid(self, step=1, center=None, radius=None):
+        # step 간격 격자 (center 주변 radius 만 보려면 center/radius 지정) 중 수수료 제약을 만족하는 조합
+        axes = []
+        for g in range(3):
+            lo, hi = self.lower, self.upper
+            if center is not None:
+                lo, hi = max(lo, center[g] - radius), min(hi, center[g] + radius)
+            axes.append(np.arange(lo, hi + 1, step))
+        high, mid, low = np.meshgrid(*axes, indexing='ij')
+        ok = self.feasible(high, mid, low)
+        return np.column_stack([high[ok], mid[ok], low[ok]])
+
+    def score(self, result):
+        # 제약을 만족하면 (1, Airbnb 수익), 아니면 (0, 호스트 수익 변화율) -> 큰 쪽이 좋음
+        if all(c.satisfied(result) for c in self.result_constraints):
+            return 1, result['airbnb_revenue']
+        return 0, result['host_delta']
+
+
+def _best_of(space, evaluator, units):
+    if len(units) == 0:
+        return None, None
+    results = evaluator.evaluate([space.to_fee(u) for u in units])
+    scores = [space.score(r) for r in results]
+    best = max(range(len(units)), key=lambda i: scores[i])
+    if scores[best][0] == 0:
+        return None, None
+    return tuple(int(u) for u in units[best]), results[best]
+
+
+# ---- 전략 ----
+STRATEGIES = {}
+
+
+def register_strategy(name):
+    def decorator(func):
+        STRATEGIES[name] = func
+        return func
+    return decorator
+
+
+@register_strategy('exhaustive')
+def exhaustive(space, evaluator, **options):
+    # resolution 격자 전체 전수 탐색 (수수료 제약으로 미리 걸러낸 조합만 평가)
+    return _best_of(space, evaluator, space.grid())
+
+
+@register_strategy('coarse_to_fine')
+def coarse_to_fine(space, evaluator, coarse_step=0.005, refine=5, max_moves=50, **options):
+    # 거친 격자에서 최적점을 찾고, 그 주변을 점점 촘촘한 격자로 다시 탐색
+    # 가장 촘촘한 단계에서는 최적점이 움직이지 않을 때까지 주변 격자를 다시 탐색
+    step = max(1, int(round(coarse_step / space.resolution)))
+    best, best_result = _best_of(space, evaluator, space.grid(step))
+    moves = 0
+    while best is not None and moves < max_moves:
+        radius, step = step, max(1, step // refine)
+        candidate, result = _best_of(space, evaluator, space.grid(step, center=best, radius=radius))
+        improved = candidate is not None and space.score(result) > space.score(best_result)
+        if improved:
+            best, best_result = candidate, result
+        if radius == 1 and not improved:
+            break
+        moves += radius == 1
+    return best, best_result
+
+
+@register_strategy('coordinate')
+def coordinate_descent(space, evaluator, start_step=0.01, max_rounds=5, **options):
+    # 그룹 하나씩 나머지를 고정하고 golden-section 으로 1차원 최적화 (매출이 그룹별로 거의 분리되므로 잘 수렴)
+    best, best_result = _best_of(space, evaluator, space.grid(max(1, int(round(start_step / space.resolution)))))
+    if best is None:
+        return None, None
+
+    for _ in range(max_rounds):
+        improved = False
+        for g in range(3):
+            axis = np.arange(space.lower, space.upper + 1)
+            units = np.tile(np.array(best), (len(axis), 1))
+            units[:, g] = axis
+            candidates = units[space.feasible(units[:, 0], units[:, 1], units[:, 2])]
+            if len(candidates) == 0:
+                continue
+
+            def score(i):
+                return space.score(evaluator.evaluate([space.to_fee(candidates[i])])[0])
+
+            i = _golden_section(score, len(candidates))
+            candidate = tuple(int(u) for u in candidates[i])
+            result = evaluator.evaluate([space.to_fee(candidate)])[0]
+            if space.score(result) > space.score(best_result):
+                best, best_result, improved = candidate, result, True
+        if not improved:
+            break
+    return best, best_result
+
+
+def _golden_section(score, n):
+    # 0..n-1 정수 구간에서 단봉 함수 최대값 위치 (값은 evaluator 메모로 재사용)
+    lo, hi = 0, n - 1
+    while hi - lo > 3:
+        m1 = lo + int(round((hi - lo) * 0.382))
+        m2 = max(lo + int(round((hi - lo) * 0.618)), m1 + 1)
+        if score(m1) < score(m2):
+            lo = m1 + 1
+        else:
+            hi = m2
+    return max(range(lo, hi + 1), key=score)
+
+
+def optimize_fees(df, constraints=DEFAULT_CONSTRAINTS, strategy='coarse_to_fine', lower=0.0, upper=0.06,
+                  resolution=0.001, model_path=MODEL_PATH, memo=None, **options):
+    # 전략만 바꿔서 같은 제약/메모로 수수료 최적화
+    # 반환: 최적 수수료(%), 수익, 사용한 평가 수와 전수 탐색 대비 비율
+    start = time.perf_counter()
+    space = FeeSpace(constraints, lower, upper, resolution)
+    evaluator = FeeEvaluator(df, model_path=model_path, memo=memo)
+    best, result = STRATEGIES[strategy](space, evaluator, **options)
+
+    exhaustive_evaluations = len(space.grid())
+    report = {
+        'strategy': strategy,
+        'fee_map': None,
+        'airbnb_revenue': None,
+        'host_revenue': None,
+        'host_delta': None,
+        'evaluations': evaluator.evaluations,
+        'memo_hits': evaluator.memo_hits,
+        'exhaustive_evaluations': exhaustive_evaluations,
+        'evaluation_ratio': evaluator.evaluations / max(exhaustive_evaluations, 1),
+        'seconds': time.perf_counter() - start,
+    }
+    if best is not None:
+        fee = space.to_fee(best)
+        report.update(
+            fee_map={group: round(f * 100, 3) for group, f in zip(GROUPS, fee)},
+            airbnb_revenue=result['airbnb_revenue'],
+            host_revenue=result['host_revenue'],
+            host_delta=result['host_delta'],
+        )
+    return report
@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
-from sw_prediction_file import predict_booked_days
+from sw_prediction_file import predict_booked_days, predict_ensemble, load_predict_model
+from sa_simulation_file import FEE_BEFORE
+from incremental_features import IncrementalFeatures
 
 def grid_search_optimal_fee(df_raw, fee_range=np.arange(0.00, 0.061, 0.005)):
     best_fee = None
@@ -55,7 +57,6 @@ def grid_search_optimal_fee(df_raw, fee_range=np.arange(0.00, 0.061, 0.005)):
                     best_airbnb_revenue = airbnb_revenue
                     best_host_revenue = sim_host_total
                     best_fee = (short_fee, mid_fee, long_fee)
-                    best_df_changed = df_changed.copy()
 
     # ✅ 결과 출력
     if best_fee:
@@ -65,6 +66,7 @@ def grid_search_optimal_fee(df_raw, fee_range=np.arange(0.00, 0.061, 0.005)):
         print(f"✅ 해당 호스트 수익: ${best_host_revenue:,.0f}")
     else:
         print("❌ 조건을 만족하는 최적 수수료를 찾지 못했습니다.")
+        return None
 
     best_fee_map = {
         'high': round(best_fee[0]*100, 3),
@@ -72,6 +74,104 @@ def grid_search_optimal_fee(df_raw, fee_range=np.arange(0.00, 0.061, 0.005)):
         'low': round(best_fee[2]*100, 3)
     }
     return best_fee_map
+
+
+def build_fee_triples(fee_range=np.arange(0.00, 0.061, 0.005), max_mid_fee=0.033):
+    # 기존 루프와 같은 순서로 (short, mid, long) 조합 중 조건을 만족하는 것만 남김
+    # ✅ short < mid < long, ✅ mid_fee <= 3.3%
+    return [
+        (short_fee, mid_fee, long_fee)
+        for long_fee in fee_range
+        for mid_fee in fee_range
+        for short_fee in fee_range
+        if short_fee < mid_fee < long_fee and mid_fee <= max_mid_fee
+    ]
+
+
+def triple_to_fee_map(triple):
+    short_fee, mid_fee, long_fee = triple
+    return {'high': short_fee, 'mid': mid_fee, 'low': long_fee}
+
+
+def evaluate_fee_scenarios(df_raw, fee_maps, max_block_rows=250_000):
+    # 여러 수수료 시나리오를 블록 단위로 묶어서 평가
+    # - 수수료와 무관한 피처는 한 번만 만들고, 시나리오마다 수수료에 반응하는 열만 다시 계산
+    # - 시나리오별 피처 행렬을 쌓아서 앙상블 모델은 블록당 한 번씩만 호출
+    # - 매출 집계는 (시나리오 수, 숙소 수) 행렬에서 한 번에 계산
+    model_bundle = load_predict_model()
+    features = IncrementalFeatures(df_raw, model_bundle['scaler'])
+    price = df_raw['price'].to_numpy(dtype=float)
+    return evaluate_fee_blocks(features, price, model_bundle, fee_maps, max_block_rows)
+
+
+def evaluate_fee_blocks(features, price, model_bundle, fee_maps, max_block_rows=250_000):
+    n_rows = len(features)
+    block_size = max(1, max_block_rows // max(n_rows, 1))
+
+    airbnb_revenue = np.empty(len(fee_maps))
+    host_revenue = np.empty(len(fee_maps))
+
+    # 블록 행렬/fee_rate 는 한 번만 잡아두고 시나리오마다 그 자리에 씀 (vstack 복사 없음)
+    block_size = max(1, min(block_size, len(fee_maps)))
+    X_buffer = np.empty((block_size * n_rows, len(features.columns)), dtype=features.dtype)
+    fee_buffer = np.empty((block_size, n_rows))
+
+    for start in range(0, len(fee_maps), block_size):
+        block = fee_maps[start:start + block_size]
+        for i, fee_map in enumerate(block):
+            features.transform(fee_map, out=X_buffer[i * n_rows:(i + 1) * n_rows])
+            features.fee_rate(fee_map, out=fee_buffer[i])
+        X_block = X_buffer[:len(block) * n_rows]
+        booked_new = predict_ensemble(X_block, model_bundle).reshape(len(block), n_rows)
+
+        fee_rate = fee_buffer[:len(block)]
+        gross = booked_new * price
+        # 그룹 밖(NaN) 숙소는 pandas sum 처럼 집계에서 제외
+        airbnb_revenue[start:start + len(block)] = np.nansum(gross * fee_rate, axis=1)
+        host_revenue[start:start + len(block)] = np.nansum(gross * (1 - fee_rate), axis=1)
+
+    return airbnb_revenue, host_revenue
+
+
+def original_host_revenue(df_raw):
+    return (df_raw['price'] * df_raw['booked'] * (1 - FEE_BEFORE)).sum()
+
+
+def grid_search_optimal_fee_batched(df_raw, fee_range=np.arange(0.00, 0.061, 0.005),
+                                    max_mid_fee=0.033, min_host_delta=1.5, max_block_rows=250_000):
+    # grid_search_optimal_fee 의 배치 버전
+    # 시나리오마다 update_columns_by_fee_change 로 수수료 변화를 반영하고, 그룹별 fee_rate 로 수익을 나눔
+    triples = build_fee_triples(fee_range, max_mid_fee)
+    if not triples:
+        print("❌ 조건을 만족하는 수수료 조합이 없습니다.")
+        return None
+
+    airbnb_revenue, host_revenue = evaluate_fee_scenarios(
+        df_raw, [triple_to_fee_map(t) for t in triples], max_block_rows=max_block_rows)
+
+    orig_host_total = original_host_revenue(df_raw)
+    host_delta = (host_revenue - orig_host_total) / orig_host_total * 100
+
+    # ✅ 조건: 호스트 수익 1.5% 이상 증가 + Airbnb 수익 최대화 (동점이면 먼저 나온 조합)
+    candidates = np.where(host_delta >= min_host_delta, airbnb_revenue, -np.inf)
+    best = int(np.argmax(candidates))
+    if not np.isfinite(candidates[best]):
+        print("❌ 조건을 만족하는 최적 수수료를 찾지 못했습니다.")
+        return None
+
+    best_fee = triples[best]
+    print(f"🏆 최적 수수료 비율 (short, mid, long): "
+          f"{round(best_fee[0]*100, 3)}%, {round(best_fee[1]*100, 3)}%, {round(best_fee[2]*100, 3)}%")
+    print(f"✅ 최적 Airbnb 수익: ${airbnb_revenue[best]:,.0f}")
+    print(f"✅ 해당 호스트 수익: ${host_revenue[best]:,.0f}")
+
+    return {
+        'high': round(float(best_fee[0])*100, 3),
+        'mid': round(float(best_fee[1])*100, 3),
+        'low': round(float(best_fee[2])*100, 3)
+    }
+
+
 '''
 🏆 최적 수수료 비율 (short, mid, long): 2.5%, 3.0%, 6.0%
 ✅ 최적 Airbnb 수익: $64,185,188
@@ -79,6 +179,7 @@ def grid_search_optimal_fee(df_raw, fee_range=np.arange(0.00, 0.061, 0.005)):
 
 # 앙상블 모델로 바꿨을 때 1 3 5로 나와야 함!!
 '''
-if __name__ == '__name__':
+if __name__ == '__main__':
     df = pd.read_csv('assets/inside_airbnb_merged_final_data.csv')
-    grid_search_optimal_fee(df)
\ No newline at end of file
+    df = df[df['host_days'] >= 365].copy()
+    grid_search_optimal_fee_batched(df)
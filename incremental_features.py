@@ -0,0 +1,310 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from sw_prediction_file import make_features, features_depending_on, FEATURES, NON_FEATURE_COLUMNS
+from sa_simulation_file import assign_booked_group, base_coefficients, FEE_BEFORE, NON_NEGATIVE_COLUMNS
+from profiling import span
+
+# 수수료가 바뀌면 값이 달라지는 원본 열과 파생 피처
+FEE_COLUMNS = list(base_coefficients)
+FEE_DEPENDENT_FEATURES = features_depending_on(FEE_COLUMNS)
+
+# 스케일된 피처 행렬 dtype
+# sklearn 트리(rf/gb)는 입력을 어차피 float32 로 바꿔 비교하므로 결과가 같고, 메모리/복사는 절반
+# lgb/knn 은 float32 로 반올림된 값을 보므로 예측이 아주 조금 달라질 수 있음 (float64 를 원하면 dtype 지정)
+FEATURE_DTYPE = np.float32
+
+# 데이터/모델별 기본 피처 저장 위치 (피처 정의가 바뀌면 FEATURE_CACHE_VERSION 을 올려서 이전 저장본 무효화)
+FEATURE_CACHE_DIR = '.cache/features'
+FEATURE_CACHE_VERSION = 1
+
+
+# 수수료 시나리오용 증분 피처 행렬
+# 수수료와 무관한 피처(시설 점수 합, log_beds, size/bedroom 카테고리, is_premium 등)는
+# 데이터셋당 한 번만 계산/스케일링 해두고, 시나리오마다 수수료에 반응하는 원본 열 5개와
+# 그에 의존하는 파생 피처(review_density, reviews_x_beds, log_reviews, recent_review_ratio, is_popular)만 다시 계산한다.
+# 시나리오마다 새 DataFrame 을 만들지 않고, 수수료 변화량(fee_delta)과 바뀐 열은 스레드별로 미리 잡아둔 버퍼에,
+# 결과 행렬은 out 버퍼에 바로 씀
+class IncrementalFeatures:
+    def __init__(self, df, scaler, dtype=FEATURE_DTYPE):
+        self.scaler = scaler
+        self.dtype = np.dtype(dtype)
+
+        base = df.copy()
+        base['booked_group'] = assign_booked_group(base['booked'])
+        base['fee_before'] = FEE_BEFORE
+        base['fee_rate'] = FEE_BEFORE
+        base = make_features(base)
+        X = base.drop(columns=NON_FEATURE_COLUMNS)
+        self._setup(list(X.columns), list(base['booked_group'].cat.categories))
+
+        # 그룹 코드 (-1 = 구간 밖, update_columns_by_fee_change 에서 NaN 이 되는 숙소)
+        self.group_codes = base['booked_group'].cat.codes.to_numpy()
+        # 다시 계산할 때 필요한 원본 입력
+        self.inputs = {c: base[c].to_numpy(dtype=float) for c in self.input_columns}
+
+        # 스케일된 기본 행렬 (열 단위 스케일러가 아니면 원본 행렬을 들고 있다가 매번 전체 변환)
+        X_raw = X.to_numpy(dtype=float)
+        if self._affine is not None:
+            self.X_base, self.X_raw = self._scale_full(X_raw).astype(self.dtype), None
+        else:
+            self.X_base, self.X_raw = None, X_raw
+
+    def _setup(self, columns, group_labels):
+        self.columns = columns
+        self.group_index = {label: i for i, label in enumerate(group_labels)}
+
+        # 다시 계산할 열과, 그 계산에 필요한 원본 입력 열
+        self.dirty_columns = [c for c in FEE_COLUMNS + FEE_DEPENDENT_FEATURES if c in self.columns]
+        self.dirty_index = np.array([self.columns.index(c) for c in self.dirty_columns])
+        feature_inputs = {f.name: f.inputs for f in FEATURES}
+        needed = set(FEE_COLUMNS)
+        for name in FEE_DEPENDENT_FEATURES:
+            needed.update(feature_inputs[name])
+        self.input_columns = sorted(needed)
+        self._affine = _affine_params(self.scaler, len(self.columns))
+        self._local = threading.local()
+
+    def to_arrays(self):
+        # 다른 프로세스로 넘길 배열(공유 메모리용)과 작은 메타데이터
+        arrays = {'group_codes': self.group_codes, 'X': self.X_base if self.X_base is not None else self.X_raw}
+        arrays.update({f'input:{c}': v for c, v in self.inputs.items()})
+        meta = {'columns': self.columns, 'group_labels': list(self.group_index)}
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, scaler, arrays, meta):
+        # to_arrays() 결과로 다시 조립 (피처 계산/스케일링 없이 배열을 그대로 참조)
+        self = cls.__new__(cls)
+        self.scaler = scaler
+        self._setup(meta['columns'], meta['group_labels'])
+        self.group_codes = arrays['group_codes']
+        self.inputs = {c: arrays[f'input:{c}'] for c in self.input_columns}
+        if self._affine is not None:
+            self.X_base, self.X_raw = arrays['X'], None
+            self.dtype = arrays['X'].dtype
+        else:
+            self.X_base, self.X_raw = None, arrays['X']
+            self.dtype = np.dtype(FEATURE_DTYPE)
+        return self
+
+    # ---- 저장/로드 (배열별 .npy -> mmap, 서버 워커 프로세스끼리 같은 페이지를 같이 씀) ----
+    def save(self, folder):
+        arrays, meta = self.to_arrays()
+        tmp = f"{folder}.{os.getpid()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        files = {}
+        for i, (name, values) in enumerate(arrays.items()):
+            files[name] = f"{i:03d}.npy"
+            np.save(os.path.join(tmp, files[name]), values)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(dict(meta, files=files), f, indent=1)
+        if os.path.exists(folder):
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.replace(tmp, folder)
+
+    @classmethod
+    def load(cls, folder, scaler, mmap_mode='r'):
+        with open(os.path.join(folder, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(folder, file), mmap_mode=mmap_mode) for name, file in meta['files'].items()}
+        return cls.from_arrays(scaler, arrays, meta)
+
+    @property
+    def nbytes(self):
+        # 들고 있는 배열 크기 (기본 행렬 + 원본 입력 + 그룹 코드, mmap 으로 연 것도 포함)
+        X = self.X_base if self.X_base is not None else self.X_raw
+        return int(X.nbytes + self.group_codes.nbytes + sum(v.nbytes for v in self.inputs.values()))
+
+    def __len__(self):
+        return len(self.group_codes)
+
+    def fee_rate(self, fee_map, out=None):
+        # booked_group.map(fee_map).astype(float).clip(lower=0) 과 같은 값
+        lookup = np.full(len(self.group_index) + 1, np.nan)
+        for label, i in self.group_index.items():
+            if label in fee_map:
+                lookup[i] = max(float(fee_map[label]), 0.0)
+        return np.take(lookup, self.group_codes, out=out)  # 코드 -1 은 마지막 칸(NaN)
+
+    def fee_columns(self, fee_map, buffers=None):
+        # update_columns_by_fee_change 와 같은 순서/연산으로 바뀐 원본 열 계산
+        # buffers({'fee_delta': ..., 열 이름: ...}) 를 주면 새 배열 없이 거기에 씀
+        if buffers is None:
+            buffers = {name: np.empty(len(self)) for name in ['fee_delta'] + FEE_COLUMNS}
+        fee_delta = self.fee_rate(fee_map, out=buffers['fee_delta'])
+        fee_delta -= FEE_BEFORE
+        fee_delta *= 100
+        values = dict(self.inputs)
+        for col, coef in base_coefficients.items():
+            column = np.multiply(fee_delta, coef, out=buffers[col])
+            column += self.inputs[col]
+            values[col] = column
+        for col in NON_NEGATIVE_COLUMNS:
+            np.maximum(values[col], 0, out=values[col])
+        return values
+
+    def _scenario_buffers(self):
+        # 스레드별 시나리오 버퍼 (여러 세션/작업이 같은 객체를 동시에 써도 섞이지 않게)
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = {name: np.empty(len(self)) for name in ['fee_delta'] + FEE_COLUMNS}
+            self._local.buffers = buffers
+        return buffers
+
+    def transform(self, fee_map, popular_threshold=None, out=None):
+        rows = len(self.X_raw if self.X_base is None else self.X_base)
+        with span('make_features.incremental', rows):
+            return self._transform(fee_map, popular_threshold, out)
+
+    def _transform(self, fee_map, popular_threshold=None, out=None):
+        # out: (숙소 수, 열 수) self.dtype 버퍼 (없으면 새로 만듦)
+        values = self.fee_columns(fee_map, self._scenario_buffers())
+        if popular_threshold is None:
+            # pandas mean 과 같게 NaN 은 제외
+            popular_threshold = np.nanmean(values['number_of_reviews'])
+        stats = {'popular_threshold': popular_threshold}
+        for feature in FEATURES:
+            if feature.name in FEE_DEPENDENT_FEATURES:
+                values[feature.name] = feature.func(values, stats)
+
+        if out is None:
+            out = np.empty((len(self), len(self.columns)), dtype=self.dtype)
+        if self._affine is None:
+            # 열 단위로 분해되지 않는 스케일러면 전체 행렬을 다시 변환
+            X_raw = self.X_raw.copy()
+            for j, c in zip(self.dirty_index, self.dirty_columns):
+                X_raw[:, j] = values[c]
+            out[...] = self.scaler.transform(pd.DataFrame(X_raw, columns=self.columns))
+            return out
+
+        np.copyto(out, self.X_base)
+        for j, c in zip(self.dirty_index, self.dirty_columns):
+            out[:, j] = self._scale_column(np.asarray(values[c], dtype=float), j)
+        return out
+
+    def _scale_full(self, X):
+        return self.scaler.transform(pd.DataFrame(X, columns=self.columns))
+
+    def _scale_column(self, values, j):
+        # 열 하나를 sklearn 과 같은 연산 순서로 스케일 (float64 로 계산한 뒤 out 에 쓸 때 dtype 변환)
+        kind, a, b = self._affine
+        if kind == 'standard':
+            out = values - a[j] if a is not None else values.copy()
+            if b is not None:
+                out /= b[j]
+            return out
+        out = values * a[j]
+        out += b[j]
+        return out
+
+
+def feature_cache_dir(dataset_key, model_key):
+    return os.path.join(FEATURE_CACHE_DIR, f"{dataset_key[:16]}-{model_key[:12]}-v{FEATURE_CACHE_VERSION}")
+
+
+_lock = threading.Lock()
+
+
+def load_or_build(folder, df, scaler):
+    # 저장된 기본 피처가 있으면 mmap 으로 열고, 없으면 계산해서 저장 (저장할 수 없으면 메모리에 둔 채 사용)
+    with _lock:
+        if not os.path.exists(os.path.join(folder, 'meta.json')):
+            start = time.perf_counter()
+            features = IncrementalFeatures(df, scaler)
+            try:
+                os.makedirs(os.path.dirname(folder) or '.', exist_ok=True)
+                features.save(folder)
+            except OSError:
+                return features
+            print(f"🧮 기본 피처 저장: {folder} ({len(features):,}행, {time.perf_counter() - start:.2f}s)")
+        return IncrementalFeatures.load(folder, scaler)
+
+
+def _affine_params(scaler, n_columns):
+    # 열 단위로 계산되는 스케일러만 부분 갱신 (sklearn 구현과 같은 연산 순서)
+    # (스케일러가 이미 unpickle 된 뒤라 여기서 import 해도 추가 비용 없음, 모듈 import 시점에는 sklearn 을 안 올림)
+    from sklearn.preprocessing import MinMaxScaler, StandardScaler
+    if getattr(scaler, 'n_features_in_', None) != n_columns:
+        return None
+    if isinstance(scaler, StandardScaler):
+        return 'standard', scaler.mean_, scaler.scale_
+    if isinstance(scaler, MinMaxScaler) and not scaler.clip:
+        return 'minmax', scaler.scale_, scaler.min_
+    return None
+
+
+def _memory_status():
+    # (현재 RSS, 최대 RSS) MB - 리눅스 /proc/self/status
+    values = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(('VmRSS:', 'VmHWM:')):
+                    values[line.split(':')[0]] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return values.get('VmRSS'), values.get('VmHWM')
+
+
+def measure_memory(func):
+    # func 실행 중 최대 RSS 증가분 / tracemalloc 최대 할당량 / minor page fault 수(새로 잡은 메모리 페이지)
+    import resource
+    import tracemalloc
+
+    try:
+        # 최대 RSS(VmHWM) 초기화 (리눅스 4.0+), 안 되면 프로세스 전체 기준 최대값
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+    rss_before, _ = _memory_status()
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    _, rss_peak = _memory_status()
+    faults = resource.getrusage(resource.RUSAGE_SELF).ru_minflt - faults
+
+    tracemalloc.start()
+    try:
+        func()
+        traced_peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds': round(seconds, 2),
+        'peak_rss_growth_mb': round(rss_peak - rss_before, 1) if rss_before is not None else None,
+        'traced_peak_mb': round(traced_peak / 2**20, 1),
+        'minor_faults': faults,
+    }
+
+
+def memory_report(df, page_fees=np.round(np.linspace(0.0, 10.0, 21), 1)):
+    # 페이지(매출 곡면 생성)와 그리드 탐색(grid_search_optimal_fee_batched)의 메모리 사용량
+    from revenue_surface import RevenueSurface
+    from grid_search_for_best_fee import grid_search_optimal_fee_batched
+    from sw_prediction_file import load_predict_model
+
+    load_predict_model()
+    rows = []
+    for name, func in [('page_surface', lambda: RevenueSurface(df, fees=page_fees)),
+                       ('grid_search', lambda: grid_search_optimal_fee_batched(df))]:
+        rows.append({'case': name, 'rows': len(df), 'dtype': np.dtype(FEATURE_DTYPE).name, **measure_memory(func)})
+    return rows
+
+
+if __name__ == '__main__':
+    from sw_prediction_file import load_data
+
+    df = load_data()
+    df = df[df['host_days'] >= 365].copy()
+    for row in memory_report(df):
+        print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# float32 거리로 뽑는 후보 수 = n_neighbors + CANDIDATE_MARGIN (float32 오차로 순위가 바뀌는 경우 대비)
+CANDIDATE_MARGIN = 8
+# 후보 추리기용 열 묶음 수 (학습 행 수를 이 배수로 채워 둠)
+GROUPS = 16
+KNN_CACHE_DIR = '.cache/models'
+
+
+# KNN 멤버용 정확 최근접 이웃 인덱스
+# 학습 데이터를 float32 로 한 번 변환해 두고 (제곱 노름 포함),
+# 질의 블록마다 GEMM 한 번으로 float32 거리 -> 후보 k + margin 개 -> float64 로 다시 계산해 최종 k 개 선택
+# 예측은 KNeighborsRegressor.predict 와 같은 방식 (uniform 평균 / distance 가중 평균)
+class KnnIndex:
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.n_neighbors = meta['n_neighbors']
+        self.weights = meta['weights']
+
+    @classmethod
+    def from_regressor(cls, knn):
+        metric = getattr(knn, 'effective_metric_', knn.metric)
+        if metric != 'euclidean':
+            raise ValueError(f"지원하지 않는 KNN 거리입니다: {metric}")
+        if knn.weights not in ('uniform', 'distance'):
+            raise ValueError(f"지원하지 않는 KNN 가중치입니다: {knn.weights}")
+        X = np.asarray(knn._fit_X, dtype=np.float64)
+        y = np.asarray(knn._y, dtype=np.float64)
+        if y.ndim != 1:
+            raise ValueError("다중 출력 KNN 은 지원하지 않습니다")
+        # float32 사본은 GROUPS 배수 행으로 채움 (채운 행은 거리 inf)
+        pad = -len(X) % GROUPS
+        X32 = np.zeros((len(X) + pad, X.shape[1]), dtype=np.float32)
+        X32[:len(X)] = X
+        sq32 = np.einsum('ij,ij->i', X32, X32)
+        sq32[len(X):] = np.inf
+        arrays = {
+            'X32': X32,
+            'sq32': sq32,
+            'X': X,
+            'sq': np.einsum('ij,ij->i', X, X),
+            'y': y,
+        }
+        meta = {'n_neighbors': int(knn.n_neighbors), 'weights': knn.weights, 'n_samples': len(X)}
+        return cls(arrays, meta)
+
+    def __len__(self):
+        return self.meta['n_samples']
+
+    def kneighbors(self, X, block_rows=1024):
+        # (거리, 학습 행 번호) - 가까운 순, 거리는 sklearn 과 같은 float64 유클리드 거리
+        a = self.arrays
+        # 질의 행렬 전체를 float64 로 복사하지 않고 블록마다 변환 (입력이 float32 여도 추가 메모리는 블록 크기만큼)
+        k = min(self.n_neighbors, len(self))
+        n_candidates = min(k + CANDIDATE_MARGIN, len(self))
+        dist = np.empty((len(X), k))
+        index = np.empty((len(X), k), dtype=np.int64)
+        for start in range(0, len(X), block_rows):
+            q = np.asarray(X[start:start + block_rows], dtype=np.float64)
+            # 1) float32 GEMM 으로 후보 추리기 (|x|^2 - 2 q.x, 질의 노름은 순위에 영향 없음)
+            d32 = (q.astype(np.float32) * -2) @ a['X32'].T
+            d32 += a['sq32']
+            cand = _smallest(d32, n_candidates)
+            # 2) 후보만 float64 로 다시 계산 (|q|^2 - 2 q.x + |x|^2), 채운 행은 제외
+            padded = cand >= len(self)
+            cand = np.where(padded, 0, cand)
+            Xc = a['X'][cand]
+            d64 = np.einsum('ij,ij->i', q, q)[:, None] - 2 * (Xc @ q[:, :, None])[:, :, 0] + a['sq'][cand]
+            np.maximum(d64, 0, out=d64)
+            d64[padded] = np.inf
+            # 거리가 같으면 학습 행 번호가 작은 쪽 먼저
+            order = np.lexsort((cand, d64), axis=1)[:, :k]
+            rows = np.arange(len(q))[:, None]
+            dist[start:start + len(q)] = np.sqrt(d64[rows, order])
+            index[start:start + len(q)] = cand[rows, order]
+        return dist, index
+
+    def predict(self, X, block_rows=1024):
+        dist, index = self.kneighbors(X, block_rows)
+        y = self.arrays['y'][index]
+        if self.weights == 'uniform':
+            return y.mean(axis=1)
+        # distance: 1/d 가중, 거리 0 인 이웃이 있으면 그 이웃들만 사용 (sklearn _get_weights 와 같음)
+        with np.errstate(divide='ignore'):
+            w = 1.0 / dist
+        exact = np.isinf(w)
+        exact_rows = exact.any(axis=1)
+        w[exact_rows] = exact[exact_rows]
+        return (y * w).sum(axis=1) / w.sum(axis=1)
+
+    def accuracy(self, knn, X):
+        # 라이브러리 KNN 예측과 비교 (최대 절대 오차, 이웃 집합 일치율)
+        expected = knn.predict(X)
+        got = self.predict(X)
+        _, ref_index = knn.kneighbors(X)
+        _, index = self.kneighbors(X)
+        same = np.mean([set(a) == set(b) for a, b in zip(ref_index, index)])
+        return {
+            'rows': len(X),
+            'max_abs_diff': float(np.abs(expected - got).max()) if len(X) else 0.0,
+            'neighbor_agreement': float(same),
+        }
+
+    # ---- 저장/로드 (배열별 .npy -> mmap) ----
+    def save(self, folder):
+        tmp = f"{folder}.{os.getpid()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name, values in self.arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), values)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        if os.path.exists(folder):
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.replace(tmp, folder)
+
+    @classmethod
+    def load(cls, folder, mmap_mode='r'):
+        with open(os.path.join(folder, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in ('X32', 'sq32', 'X', 'sq', 'y')}
+        return cls(arrays, meta)
+
+
+def _smallest(d, k, groups=GROUPS):
+    # 행마다 가장 작은 k 개의 열 번호 (순서 무관)
+    # 열을 groups 개의 연속 구간으로 나눠 같은 위치끼리 한 묶음(i, i+m, i+2m, ...)으로 보고,
+    # 묶음 최솟값이 가장 작은 k 개 묶음 안에서만 다시 고름 (k 개 최솟값은 반드시 그 안에 있음)
+    # -> 전체 행렬 argpartition 대신 원소별 minimum 몇 번 + 작은 argpartition 두 번
+    n = d.shape[1]
+    if n <= k:
+        return np.broadcast_to(np.arange(n), d.shape).copy()
+    m = n // groups
+    if n % groups or m < 4 * k:
+        return np.argpartition(d, k - 1, axis=1)[:, :k]
+    mins = d[:, :m].copy()
+    for j in range(1, groups):
+        np.minimum(mins, d[:, j * m:(j + 1) * m], out=mins)
+    best = np.argpartition(mins, k - 1, axis=1)[:, :k]
+    cols = (best[:, :, None] + m * np.arange(groups)).reshape(len(d), -1)
+    pick = np.argpartition(np.take_along_axis(d, cols, axis=1), k - 1, axis=1)[:, :k]
+    return np.take_along_axis(cols, pick, axis=1)
+
+
+def knn_cache_dir(model_path, digest):
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(KNN_CACHE_DIR, f"{name}.knn-{digest[:12]}")
+
+
+_lock = threading.Lock()
+
+
+def load_or_build(model_path, knn, digest, check_rows=256):
+    # 저장된 인덱스가 있으면 mmap 으로 열고, 없으면 만들어서 학습 데이터 일부로 정확도를 확인한 뒤 저장
+    # 정확도 결과는 meta['accuracy'] 에 남김
+    folder = knn_cache_dir(model_path, digest)
+    with _lock:
+        if not os.path.exists(os.path.join(folder, 'meta.json')):
+            start = time.perf_counter()
+            index = KnnIndex.from_regressor(knn)
+            rng = np.random.default_rng(0)
+            sample = index.arrays['X'][rng.choice(len(index), min(check_rows, len(index)), replace=False)]
+            # 학습 행 그대로 넣으면 거리 0 이웃만 보게 되므로 살짝 흔들어서 확인
+            sample = sample + rng.normal(scale=0.05, size=sample.shape)
+            index.meta['accuracy'] = index.accuracy(knn, sample)
+            try:
+                os.makedirs(KNN_CACHE_DIR, exist_ok=True)
+                index.save(folder)
+            except OSError:
+                return index
+            print(f"🧭 KNN 인덱스 생성: {folder} ({len(index):,}행, {time.perf_counter() - start:.2f}s, "
+                  f"이웃 일치율 {index.meta['accuracy']['neighbor_agreement']:.3f})")
+        return KnnIndex.load(folder)
+
+
+def benchmark(sizes=(1_000, 5_000, 20_000, 50_000), n_features=60, queries=2_000, k=5, seed=0):
+    # 학습 데이터 크기별 KNN 예측 지연 (sklearn brute / kd_tree vs 인덱스)
+    from sklearn.neighbors import KNeighborsRegressor
+
+    rng = np.random.default_rng(seed)
+    rows = []
+    Q = rng.normal(size=(queries, n_features))
+    for n in sizes:
+        X = rng.normal(size=(n, n_features))
+        y = rng.uniform(0, 365, size=n)
+        row = {'train_rows': n, 'queries': queries}
+        for algorithm in ('brute', 'kd_tree'):
+            knn = KNeighborsRegressor(k, algorithm=algorithm).fit(X, y)
+            start = time.perf_counter()
+            expected = knn.predict(Q)
+            row[f'{algorithm}_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        index = KnnIndex.from_regressor(knn)
+        start = time.perf_counter()
+        got = index.predict(Q)
+        row['index_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        row['max_abs_diff'] = float(np.abs(expected - got).max())
+        rows.append(row)
+    return rows
+
+
+if __name__ == '__main__':
+    for row in benchmark():
+        print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,123 @@
+import json
+import time
+
+import folium
+import numpy as np
+from folium.plugins import FastMarkerCluster
+
+# 숙소 URL 은 거의 다 같은 접두어라 숫자 부분만 보내고 브라우저에서 붙임
+URL_PREFIX = 'https://www.airbnb.com/rooms/'
+
+# FastMarkerCluster 가 데이터 한 줄([위도, 경도, url])마다 호출하는 JS (기존 마커/팝업과 같은 모양)
+MARKER_CALLBACK = """
+function (row) {
+    var url = row[2].indexOf('http') === 0 ? row[2] : '%s' + row[2];
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {
+        icon: L.divIcon({html: '<div style="font-size:18px;">🏘️</div>', className: 'empty'})
+    });
+    marker.bindPopup('<a href="' + url + '" target="_blank" ' +
+                     'style="font-size:15px; white-space:nowrap; display:inline;">🔗 URL</a>');
+    return marker;
+}
+""" % URL_PREFIX
+
+
+def marker_payload(location_df):
+    # iterrows 없이 열 단위로 [위도, 경도, url] 목록 생성 (좌표는 소수 5자리 ≈ 1m)
+    lat = np.round(location_df['latitude'].to_numpy(dtype=float), 5)
+    lon = np.round(location_df['longitude'].to_numpy(dtype=float), 5)
+    urls = location_df['listing_url'].astype(str)
+    short = urls.str.startswith(URL_PREFIX)
+    urls = urls.where(~short, urls.str.slice(len(URL_PREFIX)))
+    return [list(row) for row in zip(lat.tolist(), lon.tolist(), urls.tolist())]
+
+
+def map_center(location_df):
+    return [float(location_df['latitude'].mean()), float(location_df['longitude'].mean())]
+
+
+def marker_layer(location_df, name='숙소', payload=None):
+    # 브라우저에서 클러스터링 (줌 레벨에 따라 묶어서 표시)
+    # payload: 미리 만든 marker_payload 결과 (레이어가 행을 복사해 가므로 여러 번 써도 바뀌지 않음)
+    if payload is None:
+        payload = marker_payload(location_df)
+    return FastMarkerCluster(payload, callback=MARKER_CALLBACK, name=name)
+
+
+def listing_map(location_df, zoom_start=12, with_markers=True, payload=None):
+    m = folium.Map(location=map_center(location_df), zoom_start=zoom_start)
+    if with_markers:
+        marker_layer(location_df, payload=payload).add_to(m)
+    return m
+
+
+def _padded_bounds(bounds, pad):
+    # st_folium 이 돌려준 bounds({'_southWest': {lat, lng}, '_northEast': {...}}) -> (남, 서, 북, 동)
+    # pad 만큼(화면 크기 비율) 넓혀서 조금 움직여도 가장자리 마커가 비지 않게 함
+    south, west = bounds['_southWest']['lat'], bounds['_southWest']['lng']
+    north, east = bounds['_northEast']['lat'], bounds['_northEast']['lng']
+    lat_pad, lon_pad = (north - south) * pad, (east - west) * pad
+    return south - lat_pad, west - lon_pad, north + lat_pad, east + lon_pad
+
+
+def viewport_mask(location_df, bounds, pad=0.1):
+    # 화면 안 숙소 (전체 스캔)
+    south, west, north, east = _padded_bounds(bounds, pad)
+    lat = location_df['latitude'].to_numpy()
+    lon = location_df['longitude'].to_numpy()
+    return (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+
+
+def viewport_layer(location_df, bounds=None, index=None, pad=0.1):
+    # 현재 화면 안 숙소만 담은 레이어 (bounds 가 아직 없으면 전체)
+    # index(spatial_index.GridIndex)를 주면 전체 스캔 대신 격자 인덱스로 찾음
+    if bounds and bounds.get('_southWest') and bounds['_southWest'].get('lat') is not None:
+        if index is not None:
+            location_df = location_df.iloc[index.bbox(*_padded_bounds(bounds, pad))]
+        else:
+            location_df = location_df[viewport_mask(location_df, bounds, pad)]
+    group = folium.FeatureGroup(name='화면 안 숙소')
+    marker_layer(location_df).add_to(group)
+    return group, len(location_df)
+
+
+def legacy_listing_map(location_df, zoom_start=12):
+    # 기존 방식 (행마다 folium.Marker) - 비교용
+    m = folium.Map(location=map_center(location_df), zoom_start=zoom_start)
+    for _, row in location_df.iterrows():
+        folium.Marker(
+            location=[row["latitude"], row["longitude"]],
+            icon=folium.DivIcon(html='<div style="font-size:18px;">🏘️</div>'),
+            popup=folium.Popup(
+                html=f'<a href="{row["listing_url"]}" target="_blank" '
+                     f'style="font-size:15px; white-space:nowrap; display:inline;">🔗 URL</a>',
+            )
+        ).add_to(m)
+    return m
+
+
+def render_report(location_df, sizes=(200, 5000, 37000), legacy_max=5000):
+    # 숙소 수별 지도 생성+HTML 렌더 시간 / HTML 크기 (기존 방식은 legacy_max 개까지만 측정)
+    rows = []
+    for n in sizes:
+        subset = location_df.iloc[:n]
+        builders = [('cluster', listing_map)]
+        if n <= legacy_max:
+            builders.append(('legacy', legacy_listing_map))
+        for method, build in builders:
+            start = time.perf_counter()
+            html = build(subset).get_root().render()
+            rows.append({
+                'points': len(subset),
+                'method': method,
+                'seconds': round(time.perf_counter() - start, 3),
+                'html_kb': round(len(html.encode('utf-8')) / 1024, 1),
+            })
+    return rows
+
+
+if __name__ == '__main__':
+    from dataset_store import load_locations
+
+    for row in render_report(load_locations()):
+        print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+import tracemalloc
+
+
+# 프로세스 전역 모델 레지스트리
+# - 번들은 경로별로 한 번만 unpickle 해서 모든 Streamlit 세션/스레드가 공유
+# - 파일 mtime/크기가 바뀌면 해시를 다시 계산하고, 해시가 바뀐 경우에만 재로드
+class _Entry:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.bundle = None
+        self.stat_key = None
+        self.sha256 = None
+        self.load_seconds = None
+        self.memory_bytes = None
+        self.size_bytes = None
+        self.loaded_at = None
+        self.loads = 0
+        self.hits = 0
+        # 로드 없이 계산한 파일 해시 (fingerprint 용)
+        self.digest = None
+        self.digest_stat_key = None
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def measure_unpickled_bytes(path):
+    # 번들을 한 번 더 unpickle 하면서 tracemalloc 으로 할당량을 잰다.
+    # 첫 로드 때 재면 sklearn/lightgbm import 까지 추적돼서 느리고 값도 부풀려지므로,
+    # 이미 로드된 뒤(=import 완료 후) 요청이 있을 때만 따로 측정한다.
+    with open(path, "rb") as f:
+        data = f.read()
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    try:
+        bundle = pickle.loads(data)
+        after, _ = tracemalloc.get_traced_memory()
+        del bundle
+    finally:
+        if started_here:
+            tracemalloc.stop()
+    return max(after - before, 0)
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _entry(self, path):
+        path = os.path.abspath(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                entry = self._entries[path] = _Entry(path)
+            return entry
+
+    def get(self, path):
+        entry = self._entry(path)
+        stat_key = _stat_key(entry.path)
+
+        # 빠른 경로: 파일이 그대로면 락 없이 바로 반환
+        bundle = entry.bundle
+        if bundle is not None and entry.stat_key == stat_key:
+            entry.hits += 1
+            return bundle
+
+        with entry.lock:
+            # 다른 스레드가 먼저 로드했을 수 있으므로 다시 확인
+            stat_key = _stat_key(entry.path)
+            if entry.bundle is not None and entry.stat_key == stat_key:
+                entry.hits += 1
+                return entry.bundle
+
+            digest = file_sha256(entry.path)
+            if entry.bundle is not None and entry.sha256 == digest:
+                # touch 등으로 mtime 만 바뀐 경우
+                entry.stat_key = stat_key
+                entry.hits += 1
+                return entry.bundle
+
+            start = time.perf_counter()
+            with open(entry.path, "rb") as f:
+                bundle = pickle.load(f)
+            entry.load_seconds = time.perf_counter() - start
+            entry.memory_bytes = None
+            entry.size_bytes = stat_key[1]
+            entry.sha256 = digest
+            entry.stat_key = stat_key
+            entry.loaded_at = time.time()
+            entry.loads += 1
+            entry.bundle = bundle
+
+            print(f"📦 모델 번들 로드: {entry.path} ({entry.load_seconds:.2f}s, {entry.size_bytes / 2**20:,.1f}MB, sha256 {digest[:12]})")
+            return bundle
+
+    def fingerprint(self, path):
+        # 번들을 로드하지 않고 파일 해시만 (mtime/크기가 같으면 이전 해시 재사용)
+        entry = self._entry(path)
+        stat_key = _stat_key(entry.path)
+        with entry.lock:
+            if entry.sha256 is None or entry.stat_key != stat_key:
+                if entry.digest_stat_key != stat_key:
+                    entry.digest = file_sha256(entry.path)
+                    entry.digest_stat_key = stat_key
+                return entry.digest
+            return entry.sha256
+
+    def fingerprint_of(self, bundle):
+        # 레지스트리가 로드해 둔 번들이면 그 파일 해시, 아니면 None (번들 객체 자체로 찾음)
+        with self._lock:
+            entries = list(self._entries.values())
+        for e in entries:
+            if e.bundle is bundle:
+                return e.sha256
+        return None
+
+    def evict(self, path):
+        entry = self._entry(path)
+        with entry.lock:
+            entry.bundle = None
+            entry.stat_key = None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self, measure_memory=False):
+        with self._lock:
+            entries = list(self._entries.values())
+        if measure_memory:
+            for e in entries:
+                with e.lock:
+                    if e.bundle is not None and e.memory_bytes is None:
+                        e.memory_bytes = measure_unpickled_bytes(e.path)
+        return [
+            {
+                "path": e.path,
+                "loaded": e.bundle is not None,
+                "sha256": e.sha256,
+                "size_bytes": e.size_bytes,
+                "memory_bytes": e.memory_bytes,
+                "load_seconds": e.load_seconds,
+                "loaded_at": e.loaded_at,
+                "loads": e.loads,
+                "hits": e.hits,
+            }
+            for e in entries
+        ]
+
+
+registry = ModelRegistry()
+
+
+def get_model_bundle(path):
+    return registry.get(path)
@@ -0,0 +1,255 @@
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_STORE_DIR = '.cache/jobs'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# 백그라운드 작업 하나
+# task(job) 이 워커 스레드에서 실행되고, 중간중간 job.report(...) 로 진행 상황을 남김
+# 취소 요청이 들어오면 다음 report 에서 JobCancelled 가 발생해 작업이 멈춤
+# - result: task 의 반환값 (JSON 으로 저장되는 값)
+# - value: task 가 남겨두는 메모리 안의 객체 (예: 매출 곡면) - 저장하지 않음
+# - persist: False 면 결과를 저장소에 남기지 않는 작업 (value 만 만드는 작업)
+# task 는 끝나면 놓음 (task 가 붙잡고 있는 데이터가 작업 목록에 남지 않게)
+class Job:
+    def __init__(self, key, task, persist=True):
+        self.key = key
+        self.task = task
+        self.persist = persist
+        self.status = 'queued'
+        self.evaluated = 0
+        self.total = None
+        self.best = None
+        self.result = None
+        self.value = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in ('done', 'cancelled', 'failed')
+
+    def report(self, evaluated, total, best=None):
+        if self._cancel.is_set():
+            raise JobCancelled()
+        with self._lock:
+            self.evaluated = evaluated
+            self.total = total
+            if best is not None:
+                self.best = best
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+    def progress(self):
+        # 화면 표시용 스냅샷
+        with self._lock:
+            end = self.finished_at or time.time()
+            return {
+                'status': self.status,
+                'evaluated': self.evaluated,
+                'total': self.total,
+                'fraction': self.evaluated / self.total if self.total else 0.0,
+                'best': self.best,
+                'seconds': end - self.started_at if self.started_at else 0.0,
+                'error': self.error,
+            }
+
+
+# 끝난 작업 결과를 키별 JSON 파일로 저장 (재시작 후에도 바로 읽음)
+class JobStore:
+    def __init__(self, folder=JOB_STORE_DIR):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def path(self, key):
+        digest = hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()
+        return os.path.join(self.folder, f"{digest[:24]}.json")
+
+    def load(self, key):
+        try:
+            with open(self.path(key)) as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # 해시 충돌/다른 키 방지
+        if record.get('key') != json.loads(json.dumps(key, default=str)):
+            return None
+        return record['result']
+
+    def save(self, key, result, seconds=None):
+        record = {'key': key, 'result': result, 'seconds': seconds, 'finished_at': time.time()}
+        path = self.path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(record, f, ensure_ascii=False, indent=1, default=str)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"⚠️ 작업 결과 저장 실패: {path} ({e})")
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+
+# 작업 관리자 (프로세스 전역, 여러 세션이 공유)
+# - 같은 키(예: 데이터 지문 + 모델 지문)로 들어온 작업은 하나만 실행하고 나머지는 같은 Job 을 받음
+# - 저장소에 결과가 있으면 실행하지 않고 바로 끝난 Job 을 돌려줌
+# - 취소/실패한 작업은 다시 submit 하면 새로 시작
+# - persist=False 작업은 저장소를 쓰지 않고, 끝난 뒤 value 를 놓았으면(release_values) 다시 submit 할 때 새로 시작
+class JobManager:
+    def __init__(self, store=None, workers=1):
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, task, persist=True):
+        with self._lock:
+            job = self._jobs.get(key)
+            released = job is not None and job.done and not job.persist and job.value is None
+            if job is not None and job.status not in ('cancelled', 'failed') and not released:
+                return job
+            job = Job(key, task, persist)
+            stored = self.store.load(key) if self.store is not None and persist else None
+            if stored is not None:
+                job.status = 'done'
+                job.result = stored
+                job.task = None
+            else:
+                # submit 한 쪽의 컨텍스트(예: 계측 세션 태그)를 작업 스레드에서도 그대로 씀
+                self._pool.submit(contextvars.copy_context().run, self._run, job)
+            self._jobs[key] = job
+            return job
+
+    def get(self, key):
+        with self._lock:
+            return self._jobs.get(key)
+
+    def cancel(self, key):
+        return self._cancel_job(self.get(key))
+
+    def _cancel_job(self, job):
+        if job is not None and not job.done:
+            job.cancel()
+            # 아직 시작 전이면 바로 취소 처리
+            with job._lock:
+                if job.status == 'queued':
+                    job.status = 'cancelled'
+                    job.finished_at = time.time()
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def release_values(self, predicate):
+        # predicate(key) 가 참인 작업의 메모리 객체(value)를 놓음 (result 는 남아서 다시 실행하지 않음)
+        # value 는 task 끝에 남기므로 아직 running 인 작업도 놓음 (끝나기 직전에 도시가 내려간 경우)
+        released = 0
+        for job in self.jobs():
+            if job.value is not None and predicate(job.key):
+                job.value = None
+                released += 1
+        return released
+
+    def drop(self, predicate):
+        # predicate(key) 가 참인 persist=False 작업을 목록에서 뺌 (안 끝난 작업은 취소)
+        # 다음 submit 은 새 작업으로 시작
+        with self._lock:
+            keys = [key for key, job in self._jobs.items() if not job.persist and predicate(key)]
+            dropped = [self._jobs.pop(key) for key in keys]
+        for job in dropped:
+            if not job.done:
+                self._cancel_job(job)
+        return len(dropped)
+
+    def _run(self, job):
+        with job._lock:
+            if job.status != 'queued':
+                job.task = None
+                return
+            job.status = 'running'
+            job.started_at = time.time()
+        try:
+            result = job.task(job)
+        except JobCancelled:
+            status, result = 'cancelled', None
+            print(f"⏹️ 작업 취소: {job.key}")
+        except Exception as e:
+            status, result = 'failed', None
+            job.error = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        else:
+            status = 'done'
+            if self.store is not None and job.persist:
+                self.store.save(job.key, result, time.time() - job.started_at)
+        with job._lock:
+            job.result = result
+            job.status = status
+            job.finished_at = time.time()
+            job.task = None
+
+
+def _build_surface(job, df, model_path, features_dir, best=None, fees=None):
+    # 매출 곡면을 수수료 순서로 만들면서 (완성된 수수료 단계 수 / 전체 수수료 수) 를 보고하고 job.value 로 남김
+    # best(surface, k): 보고할 중간 최적값 (None 이면 보고 안 함), fees: 수수료 격자 (없으면 슬라이더 범위)
+    from revenue_surface import RevenueSurface, SLIDER_FEES
+    from sw_prediction_file import MODEL_PATH
+
+    def on_progress(surface, k):
+        job.report(k, len(surface.fees), None if best is None or job.cancel_requested else best(surface, k))
+
+    surface = RevenueSurface(df() if callable(df) else df, fees=SLIDER_FEES if fees is None else fees,
+                             on_progress=on_progress, model_path=model_path or MODEL_PATH, features_dir=features_dir)
+    job.value = surface
+    return surface
+
+
+def surface_optimization_task(df, best_every=10, model_path=None, max_mid_fee=3.3, min_host_delta=1.5,
+                              features_dir=None, fees=None):
+    # 매출 곡면을 만들면서 진행률을 보고하고, 끝나면 곡면 전체에서 최적 수수료를 찾는 작업
+    # 진행률은 수수료 단계 (예측이 끝난 앞쪽 수수료 수 / 전체 수수료 수), best_every 단계 이상 지날 때마다 중간 최적값도 보고
+    # model_path / max_mid_fee / min_host_delta: 도시별 모델과 수수료 조건 (없으면 기본 모델)
+    # df: DataFrame 또는 DataFrame 을 돌려주는 함수 (작업이 시작될 때 만들고 곡면을 만든 뒤 놓음 - 작업이 들고 있지 않게)
+    def run(job):
+        reported = [0]
+
+        def best(surface, k):
+            if k - reported[0] < best_every and k < len(surface.fees):
+                return None
+            reported[0] = k
+            return surface.best_fee_map(max_mid_fee, min_host_delta, n_fees=k)
+
+        surface = _build_surface(job, df, model_path, features_dir, best, fees)
+        return {'best_fee_map': surface.best_fee_map(max_mid_fee, min_host_delta)}
+    return run
+
+
+def surface_build_task(df, model_path=None, features_dir=None):
+    # 매출 곡면만 다시 만드는 작업 (persist=False 로 submit)
+    # 최적 수수료 결과는 저장소에서 읽었지만 곡면은 메모리에 없을 때 (재시작 후, 도시가 내려가 곡면을 놓은 뒤)
+    def run(job):
+        _build_surface(job, df, model_path, features_dir)
+    return run
@@ -0,0 +1,196 @@
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from sw_prediction_file import load_predict_model, MODEL_PATH
+from grid_search_for_best_fee import build_fee_triples, triple_to_fee_map, evaluate_fee_blocks, original_host_revenue
+from incremental_features import IncrementalFeatures
+
+
+# 여러 배열을 공유 메모리에 한 번 올려두고, 워커에서는 복사 없이 붙어서 읽기만 함
+class SharedArrays:
+    def __init__(self, arrays):
+        self._blocks = []
+        self.specs = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self._blocks.append(block)
+            self.specs[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(specs):
+        blocks, arrays = [], {}
+        for name, (block_name, shape, dtype) in specs.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        return blocks, arrays
+
+    def close(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# 워커 프로세스 전역 상태 (initializer 에서 한 번만 채움)
+_worker = {}
+
+
+def _init_worker(specs, meta, model_path, max_block_rows):
+    _worker.update(
+        specs=specs,
+        meta=meta,
+        model_bundle=load_predict_model(model_path),
+        max_block_rows=max_block_rows,
+    )
+
+
+def _evaluate_chunk(start, triples):
+    # 공유 메모리는 묶음마다 붙었다가 끝나면 바로 닫음 (워커가 종료될 때 닫히지 않은 핸들이 남지 않게)
+    # 붙이는 비용은 mmap 몇 번이라 묶음 하나(조합 수 x 전체 숙소 예측)에 비하면 무시할 수준
+    fee_maps = [triple_to_fee_map(t) for t in triples]
+    blocks, arrays = SharedArrays.attach(_worker['specs'])
+    try:
+        features = IncrementalFeatures.from_arrays(_worker['model_bundle']['scaler'], arrays, _worker['meta'])
+        airbnb, host = evaluate_fee_blocks(
+            features, arrays['price'], _worker['model_bundle'], fee_maps, _worker['max_block_rows'])
+    finally:
+        # 공유 메모리를 가리키는 배열을 먼저 놓아야 close 가 됨
+        features = arrays = None
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                pass  # 예외 traceback 이 아직 배열을 잡고 있으면 프로세스가 끝날 때 풀림 (원래 예외를 가리지 않게)
+    return start, airbnb, host
+
+
+# 결과가 도착하는 대로 최적 조합을 갱신
+# deterministic=True 면 수익이 같을 때 조합 순서(기존 루프 순서)가 앞선 것을 고르므로
+# 워커 수/도착 순서와 상관없이 항상 같은 답이 나옴
+class BestTracker:
+    def __init__(self, triples, orig_host_total, min_host_delta=1.5, deterministic=True):
+        self.triples = triples
+        self.orig_host_total = orig_host_total
+        self.min_host_delta = min_host_delta
+        self.deterministic = deterministic
+        self.evaluated = 0
+        self.best_index = None
+        self.best_airbnb_revenue = -np.inf
+        self.best_host_revenue = None
+
+    def update(self, start, airbnb_revenue, host_revenue):
+        self.evaluated += len(airbnb_revenue)
+        host_delta = (host_revenue - self.orig_host_total) / self.orig_host_total * 100
+        # ✅ 조건: 호스트 수익 1.5% 이상 증가 + Airbnb 수익 최대화
+        for i in np.flatnonzero(host_delta >= self.min_host_delta):
+            index = start + int(i)
+            revenue = airbnb_revenue[i]
+            better = revenue > self.best_airbnb_revenue
+            if self.deterministic and revenue == self.best_airbnb_revenue:
+                better = index < self.best_index
+            if better:
+                self.best_index = index
+                self.best_airbnb_revenue = revenue
+                self.best_host_revenue = host_revenue[i]
+
+    @property
+    def best_fee(self):
+        return None if self.best_index is None else self.triples[self.best_index]
+
+    def progress(self):
+        found = self.best_index is not None
+        return {
+            'evaluated': self.evaluated,
+            'total': len(self.triples),
+            'best_fee': tuple(float(f) for f in self.best_fee) if found else None,
+            'best_airbnb_revenue': float(self.best_airbnb_revenue) if found else None,
+            'best_host_revenue': float(self.best_host_revenue) if found else None,
+        }
+
+
+def parallel_grid_search(df_raw, fee_range=np.arange(0.00, 0.061, 0.005), max_mid_fee=0.033, min_host_delta=1.5,
+                         workers=None, chunk_size=8, deterministic=True, max_block_rows=250_000,
+                         model_path=MODEL_PATH, on_progress=None, start_method=None, verbose=True):
+    # grid_search_optimal_fee_batched 의 멀티프로세스 버전
+    # - 기본 데이터/수수료 무관 피처는 공유 메모리에 한 번만 올림
+    # - 워커는 시작할 때 모델 번들을 한 번 로드하고, chunk_size 개 조합씩 평가
+    # - 결과는 끝나는 순서대로 받아서 최적값/제약 조건을 바로 갱신 (on_progress 로 중간 상태 전달)
+    workers = workers or os.cpu_count() or 1
+    triples = build_fee_triples(fee_range, max_mid_fee)
+    tracker = BestTracker(triples, original_host_revenue(df_raw), min_host_delta, deterministic)
+    if not triples:
+        return None, tracker
+
+    model_bundle = load_predict_model(model_path)
+    features = IncrementalFeatures(df_raw, model_bundle['scaler'])
+    arrays, meta = features.to_arrays()
+    arrays['price'] = df_raw['price'].to_numpy(dtype=float)
+
+    context = mp.get_context(start_method)
+    with SharedArrays(arrays) as shared:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                                 initargs=(shared.specs, meta, model_path, max_block_rows)) as pool:
+            futures = [pool.submit(_evaluate_chunk, start, triples[start:start + chunk_size])
+                       for start in range(0, len(triples), chunk_size)]
+            for future in as_completed(futures):
+                tracker.update(*future.result())
+                if on_progress is not None:
+                    on_progress(tracker.progress())
+
+    best_fee = tracker.best_fee
+    if best_fee is None:
+        if verbose:
+            print("❌ 조건을 만족하는 최적 수수료를 찾지 못했습니다.")
+        return None, tracker
+
+    if verbose:
+        print(f"🏆 최적 수수료 비율 (short, mid, long): "
+              f"{round(best_fee[0]*100, 3)}%, {round(best_fee[1]*100, 3)}%, {round(best_fee[2]*100, 3)}%")
+        print(f"✅ 최적 Airbnb 수익: ${tracker.best_airbnb_revenue:,.0f}")
+        print(f"✅ 해당 호스트 수익: ${tracker.best_host_revenue:,.0f}")
+    best_fee_map = {
+        'high': round(float(best_fee[0])*100, 3),
+        'mid': round(float(best_fee[1])*100, 3),
+        'low': round(float(best_fee[2])*100, 3)
+    }
+    return best_fee_map, tracker
+
+
+def scaling_report(df_raw, max_workers=None, **kwargs):
+    # 워커 수 1..N 별 소요 시간 / 처리량 / 속도 향상
+    max_workers = max_workers or os.cpu_count() or 1
+    rows = []
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        best_fee_map, tracker = parallel_grid_search(df_raw, workers=workers, verbose=False, **kwargs)
+        seconds = time.perf_counter() - start
+        rows.append({
+            'workers': workers,
+            'seconds': seconds,
+            'scenarios_per_sec': tracker.evaluated / seconds,
+            'best_fee_map': best_fee_map,
+        })
+    report = pd.DataFrame(rows)
+    report['speedup'] = report['seconds'].iloc[0] / report['seconds']
+    return report
+
+
+if __name__ == '__main__':
+    df = pd.read_csv('assets/inside_airbnb_merged_final_data.csv')
+    df = df[df['host_days'] >= 365].copy()
+    print(scaling_report(df).to_string(index=False))
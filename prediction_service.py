@@ -0,0 +1,320 @@
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import REQUIRED_COLUMNS
+from sa_simulation_file import update_columns_by_fee_change, assign_booked_group
+from sw_prediction_file import load_data, load_predict_model, make_features, scale_X, predict_ensemble, MODEL_PATH
+from profiling import span
+
+# 숙소 한 개 예측 서비스 ("이번 달 내 수수료는?")
+# 모델/스케일러를 한 번 올려 두고, 요청(숙소 원본 속성 dict)은 큐에 넣어 배치 작업 스레드가 모아서 한 번에 예측
+# 한 배치의 비용은 행 수보다 pandas 고정 비용(update/make_features/scale ~20ms)이 대부분이라
+# 동시에 들어온 요청을 묶으면 요청당 비용이 크게 줄어듦
+SCENARIO_FEE_MAP = {'high': 2.4, 'mid': 3.3, 'low': 5.5}
+REFERENCE_PATH = 'assets/inside_airbnb_merged_final_data.csv'
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_MS = 1.0
+
+
+class PredictionService:
+    # fee_map: 그룹별 수수료 (show_scenario 와 같은 %)
+    # reference_path: 열 순서와 is_popular 기준값(수수료 반영 후 number_of_reviews 평균)을 정하는 데이터
+    # popular_threshold 를 직접 주면 reference 평균 대신 사용
+    # max_batch: 한 번에 묶을 최대 요청 수, max_wait_ms: 첫 요청 뒤 다른 요청을 기다리는 최대 시간
+    def __init__(self, fee_map=SCENARIO_FEE_MAP, reference_path=REFERENCE_PATH, popular_threshold=None,
+                 max_batch=DEFAULT_MAX_BATCH, max_wait_ms=DEFAULT_MAX_WAIT_MS, model_path=MODEL_PATH):
+        self.fee_map = dict(fee_map)
+        self.model_bundle = load_predict_model(model_path)
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        reference = load_data(reference_path)
+        self.columns = list(reference.columns)
+        # id 열은 모델 입력에서 빠지므로 없으면 NaN 으로 채움
+        required = set(REQUIRED_COLUMNS['merged']()) - {'id', 'listing_id'}
+        self.required = [c for c in self.columns if c in required]
+        if popular_threshold is None:
+            popular_threshold = float(update_columns_by_fee_change(reference.copy(), self.fee_map)['number_of_reviews'].mean())
+        self.popular_threshold = popular_threshold
+
+        self.stats = {'requests': 0, 'batches': 0, 'max_batch_seen': 0}
+        self._stats_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._closed = False
+
+        # 트리 배열/KNN 인덱스 첫 호출 비용을 요청 전에 치름
+        self.predict_many([reference.iloc[0].to_dict()])
+
+        self._worker = threading.Thread(target=self._loop, name='prediction-batcher', daemon=True)
+        self._worker.start()
+
+    def _row(self, record):
+        # dict / pandas Series -> columns 순서의 float 목록 (빠지거나 숫자가 아니면 ValueError)
+        record = dict(record)
+        missing = [c for c in self.required if record.get(c) is None]
+        if missing:
+            raise ValueError(f"필수 속성이 없습니다: {missing}")
+        row = []
+        for c in self.columns:
+            value = record.get(c)
+            try:
+                row.append(np.nan if value is None else float(value))
+            except (TypeError, ValueError):
+                raise ValueError(f"{c} 값이 숫자가 아닙니다: {value!r}") from None
+        return row
+
+    def predict_many(self, records):
+        # 큐를 거치지 않고 바로 한 번에 예측 (결과는 records 순서)
+        return self._predict_rows([self._row(r) for r in records])
+
+    def _predict_rows(self, rows):
+        with span('service.batch', len(rows)):
+            df = pd.DataFrame(np.array(rows, dtype=float).reshape(len(rows), len(self.columns)), columns=self.columns)
+            df = update_columns_by_fee_change(df, self.fee_map)
+            df = make_features(df, self.popular_threshold)
+            booked_new = predict_ensemble(scale_X(df, self.model_bundle['scaler']), self.model_bundle)
+
+            # show_scenario 와 같이 예측 예약일수로 그룹을 다시 나누고 그 그룹의 수수료를 부과
+            groups = assign_booked_group(pd.Series(booked_new))
+        results = []
+        for days, group in zip(booked_new, groups):
+            group = None if pd.isna(group) else str(group)
+            results.append({
+                'booked_new': float(days),
+                'booked_group': group,
+                'fee': None if group is None else float(self.fee_map[group]),
+            })
+        return results
+
+    def submit(self, record):
+        # 큐에 넣고 Future 를 돌려줌 (입력 오류는 바로 ValueError)
+        if self._closed:
+            raise RuntimeError("예측 서비스가 종료되었습니다.")
+        future = Future()
+        self._queue.put((self._row(record), future))
+        return future
+
+    def predict(self, record, timeout=None):
+        return self.submit(record).result(timeout)
+
+    def _collect(self, first):
+        # 첫 요청 뒤 max_wait 동안 (또는 max_batch 가 찰 때까지) 들어온 요청을 모음
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if item is None:
+                self._queue.put(None)  # 종료 신호는 다음 루프에서 처리
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [(row, future) for row, future in self._collect(item) if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self._predict_rows([row for row, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            with self._stats_lock:
+                self.stats['requests'] += len(batch)
+                self.stats['batches'] += 1
+                self.stats['max_batch_seen'] = max(self.stats['max_batch_seen'], len(batch))
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._worker.join()
+
+
+def _handler(service):
+    class PredictionHandler(BaseHTTPRequestHandler):
+        # POST /predict: 숙소 하나(dict) 또는 여러 개(list) -> 같은 모양의 결과
+        # GET /health: 처리한 요청/배치 수
+        def _send(self, status, body):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path != '/health':
+                return self._send(404, {'error': 'not found'})
+            with service._stats_lock:
+                stats = dict(service.stats)
+            self._send(200, {'status': 'ok', **stats})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                return self._send(404, {'error': 'not found'})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'null')
+                records = body if isinstance(body, list) else [body]
+                if not all(isinstance(r, dict) for r in records):
+                    raise ValueError("요청 본문은 숙소 속성 객체 또는 그 목록이어야 합니다.")
+                futures = [service.submit(r) for r in records]
+            except ValueError as e:
+                return self._send(400, {'error': str(e)})
+            try:
+                results = [f.result() for f in futures]
+            except Exception as e:
+                return self._send(500, {'error': str(e)})
+            self._send(200, results if isinstance(body, list) else results[0])
+
+        def log_message(self, format, *args):
+            pass
+
+    return PredictionHandler
+
+
+class _PredictionServer(ThreadingHTTPServer):
+    # 동시 접속이 많을 때 연결이 거부되지 않도록 listen 대기열을 늘림 (기본 5)
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def serve(service, host='127.0.0.1', port=8765):
+    # 로컬 HTTP 엔드포인트 (요청마다 스레드, 예측은 서비스 큐에서 배치로)
+    return _PredictionServer((host, port), _handler(service))
+
+
+def http_client(url):
+    # load_test 에 넘길 predict 함수 (HTTP 로 숙소 하나씩)
+    def predict(record):
+        request = urllib.request.Request(f"{url}/predict", data=json.dumps(record).encode(),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+    return predict
+
+
+def load_test(predict, records, concurrency=16, requests=2000):
+    # concurrency 개 스레드가 records 를 돌아가며 predict(record) 를 호출 -> 지연시간 백분위와 처리량
+    latencies = np.empty(requests)
+    counter = iter(range(requests))
+    counter_lock = threading.Lock()
+    errors = []
+
+    def worker():
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                predict(records[i % len(records)])
+            except Exception as e:
+                errors.append(e)
+            latencies[i] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    seconds = time.perf_counter() - start
+
+    ms = latencies * 1000
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': len(errors),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'max_ms': round(float(ms.max()), 2),
+        'throughput_rps': round(requests / seconds, 1),
+    }
+
+
+def benchmark(reference_path=REFERENCE_PATH, concurrency=(1, 16, 64), requests=1000, max_batch=DEFAULT_MAX_BATCH,
+              max_wait_ms=DEFAULT_MAX_WAIT_MS, http=False):
+    # 묶지 않음(max_batch=1) vs 배치 큐, 선택적으로 HTTP 경유까지 같은 부하로 비교
+    records = [row.to_dict() for _, row in load_data(reference_path).head(500).iterrows()]
+    modes = [('unbatched', 1, 0.0), ('batched', max_batch, max_wait_ms)]
+    results = []
+    for mode, batch, wait in modes:
+        service = PredictionService(reference_path=reference_path, max_batch=batch, max_wait_ms=wait)
+        targets = [(mode, service.predict)]
+        server = None
+        if http:
+            server = serve(service, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            targets.append((f"{mode}+http", http_client(f"http://127.0.0.1:{server.server_address[1]}")))
+        try:
+            for name, predict in targets:
+                for c in concurrency:
+                    service.stats.update(requests=0, batches=0, max_batch_seen=0)
+                    row = {'mode': name, **load_test(predict, records, c, requests)}
+                    row['avg_batch'] = round(service.stats['requests'] / max(service.stats['batches'], 1), 1)
+                    results.append(row)
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            service.close()
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='숙소 한 개 예측 서비스')
+    parser.add_argument('--reference', default=REFERENCE_PATH)
+    parser.add_argument('--serve', action='store_true', help='로컬 HTTP 엔드포인트 실행')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--http', action='store_true', help='부하 테스트에 HTTP 경유도 포함')
+    args = parser.parse_args()
+
+    if args.serve:
+        service = PredictionService(reference_path=args.reference, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+        server = serve(service, args.host, args.port)
+        print(f"🚀 예측 서비스: http://{args.host}:{args.port}/predict")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            service.close()
+    else:
+        for row in benchmark(args.reference, requests=args.requests, max_batch=args.max_batch,
+                             max_wait_ms=args.max_wait_ms, http=args.http):
+            print(json.dumps(row, ensure_ascii=False))
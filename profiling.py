@@ -0,0 +1,245 @@
+import contextlib
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+
+import numpy as np
+
+# 단계별 계측 (load_data, make_features, 모델 predict, 렌더링 등)
+# 꺼져 있으면 span() 은 아무것도 하지 않는 공용 객체를 돌려줌 -> 함수 호출 한 번 정도의 비용
+# 환경변수 PIPELINE_PROFILE=1 이면 프로세스 전체가 켜진 상태로 시작
+# 앱의 사이드바 토글은 그 세션만 켬 (with profiler.session(태그): 안에서 실행된 span 만 기록, 기록에도 태그가 붙음)
+# 세션이 시작한 백그라운드 작업도 그 세션 태그로 기록됨 (JobManager 가 submit 한 쪽의 컨텍스트를 복사해서 실행)
+PERCENTILES = (50, 90, 99)
+
+# 지금 실행 중인 세션 태그 (Streamlit 은 세션마다 스크립트를 자기 스레드에서 실행하므로 스레드/컨텍스트별 값)
+_current_session = contextvars.ContextVar('profile_session', default=None)
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_rows(self, rows):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def _rss_bytes():
+    # 현재 RSS (리눅스 /proc, 없으면 None)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _memory_bytes():
+    # tracemalloc 이 켜져 있으면 파이썬/numpy 할당량, 아니면 RSS
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return _rss_bytes()
+
+
+class Span:
+    def __init__(self, profiler, stage, rows=None, session=None):
+        self.profiler = profiler
+        self.stage = stage
+        self.rows = rows
+        self.session = session
+
+    def set_rows(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        self.memory = _memory_bytes()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        seconds = time.perf_counter() - self.start
+        memory = _memory_bytes()
+        delta = memory - self.memory if memory is not None and self.memory is not None else None
+        self.profiler.record(self.stage, seconds, self.rows, delta, failed=exc_type is not None, session=self.session)
+        return False
+
+
+class Profiler:
+    def __init__(self, window=200, log_size=10_000, enabled=False):
+        # enabled: 프로세스 전체 (환경변수/관리자용), 세션별로 켜는 것은 enable_session
+        self.enabled = enabled
+        self.window = window
+        self._sessions = set()
+        # 전체 기록 (단계별 백분위 / JSON lines 내보내기용)
+        self._log = deque(maxlen=log_size)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def session(self, tag):
+        # 이 안에서 실행되는 span 에 세션 태그를 붙임 (그 세션이 켜져 있으면 기록)
+        token = _current_session.set(tag)
+        try:
+            yield
+        finally:
+            _current_session.reset(token)
+
+    def enable_session(self, tag, enabled=True):
+        # 세션 하나만 켜고 끔 (끄면 그 세션 기록도 지움)
+        with self._lock:
+            if enabled:
+                self._sessions.add(tag)
+            else:
+                self._sessions.discard(tag)
+        if not enabled:
+            self.clear(tag)
+
+    def prune_sessions(self, alive):
+        # alive(태그) 가 거짓인 세션(끝난 세션)을 끄고 그 기록도 지움
+        with self._lock:
+            ended = [tag for tag in self._sessions if not alive(tag)]
+        for tag in ended:
+            self.enable_session(tag, False)
+        return ended
+
+    def session_enabled(self, tag):
+        return self.enabled or tag in self._sessions
+
+    def span(self, stage, rows=None):
+        if not self.enabled and not self._sessions:
+            return _NULL_SPAN
+        session = _current_session.get()
+        if not self.enabled and session not in self._sessions:
+            return _NULL_SPAN
+        return Span(self, stage, rows, session)
+
+    def record(self, stage, seconds, rows=None, memory_delta=None, failed=False, session=None):
+        entry = {
+            'stage': stage,
+            'ts': time.time(),
+            'ms': seconds * 1000,
+            'rows': rows,
+            'mem_delta_mb': None if memory_delta is None else memory_delta / 2**20,
+            'thread': threading.current_thread().name,
+            'session': session,
+            'failed': failed,
+        }
+        with self._lock:
+            self._log.append(entry)
+
+    def _entries(self, session=None):
+        # session 이 None 이면 전체, 아니면 그 세션 기록만
+        with self._lock:
+            entries = list(self._log)
+        return entries if session is None else [e for e in entries if e['session'] == session]
+
+    def summary(self, session=None):
+        # 단계별 최근 window 개 기록의 백분위 (ms), 평균 행 수, 평균 메모리 변화
+        stages = defaultdict(lambda: deque(maxlen=self.window))
+        for e in self._entries(session):
+            stages[e['stage']].append(e)
+        rows = []
+        for stage, entries in stages.items():
+            ms = np.array([e['ms'] for e in entries])
+            row = {'stage': stage, 'count': len(entries)}
+            for p, value in zip(PERCENTILES, np.percentile(ms, PERCENTILES)):
+                row[f'p{p}_ms'] = round(float(value), 3)
+            row['max_ms'] = round(float(ms.max()), 3)
+            counted = [e['rows'] for e in entries if e['rows'] is not None]
+            row['rows'] = int(np.mean(counted)) if counted else None
+            deltas = [e['mem_delta_mb'] for e in entries if e['mem_delta_mb'] is not None]
+            row['mem_delta_mb'] = round(float(np.mean(deltas)), 3) if deltas else None
+            rows.append(row)
+        return sorted(rows, key=lambda r: -r['p50_ms'] * r['count'])
+
+    def to_jsonl(self, session=None):
+        return ''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in self._entries(session))
+
+    def export_jsonl(self, path, session=None):
+        with open(path, 'w') as f:
+            f.write(self.to_jsonl(session))
+        return path
+
+    def clear(self, session=None):
+        with self._lock:
+            if session is None:
+                self._log.clear()
+            else:
+                kept = [e for e in self._log if e['session'] != session]
+                self._log.clear()
+                self._log.extend(kept)
+
+
+profiler = Profiler(enabled=os.environ.get('PIPELINE_PROFILE') == '1')
+
+
+def span(stage, rows=None):
+    return profiler.span(stage, rows)
+
+
+# 한 번의 실행(rerun)만 cProfile + tracemalloc 으로 자세히 보기
+# with capture() as snapshot: ... 이 끝나면 snapshot['profile'], snapshot['allocations'] 에 텍스트 결과
+class capture:
+    def __init__(self, top=25, allocations=15):
+        self.top = top
+        self.allocations = allocations
+        self.snapshot = {}
+
+    def __enter__(self):
+        self._started_tracemalloc = not tracemalloc.is_tracing()
+        if self._started_tracemalloc:
+            tracemalloc.start()
+        self._profile = cProfile.Profile()
+        self._start = time.perf_counter()
+        self._profile.enable()
+        return self.snapshot
+
+    def __exit__(self, *exc):
+        self._profile.disable()
+        self.snapshot['seconds'] = time.perf_counter() - self._start
+
+        # 프로파일러 자체가 쓴 메모리는 빼고 할당 위치별 상위 목록
+        current, peak = tracemalloc.get_traced_memory()
+        traces = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ])
+        stats = traces.statistics('lineno')[:self.allocations]
+        self.snapshot['peak_mb'] = peak / 2**20
+        self.snapshot['allocations'] = '\n'.join(str(s) for s in stats)
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+        out = io.StringIO()
+        pstats.Stats(self._profile, stream=out).sort_stats('cumulative').print_stats(self.top)
+        self.snapshot['profile'] = out.getvalue()
+        return False
+
+
+def overhead(n=100_000):
+    # 꺼진 상태 / 켜진 상태 span 한 번의 비용 (마이크로초)
+    test = Profiler(window=10, log_size=10)
+    result = {}
+    for enabled in (False, True):
+        test.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(n):
+            with test.span('noop'):
+                pass
+        result['enabled_us' if enabled else 'disabled_us'] = (time.perf_counter() - start) / n * 1e6
+    return result
+
+
+if __name__ == '__main__':
+    print(json.dumps(overhead(), ensure_ascii=False))
@@ -0,0 +1,296 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from sw_prediction_file import predict_ensemble, predict_members, blend_members, member_spread, load_predict_model, MEMBERS, MODEL_PATH
+from sa_simulation_file import assign_booked_group, BOOKED_LABELS, FEE_BEFORE
+from incremental_features import IncrementalFeatures, load_or_build
+
+# 사이드바 슬라이더 범위 (0~10%, 0.1 단위, 101개)
+SLIDER_FEES = np.round(np.linspace(0.0, 10.0, 101), 1)
+
+
+# 그룹별로 분리된 매출 곡면
+# 숙소의 수수료는 자기 booked_group 에만 의존하므로
+#   매출(high, mid, low) = f_high(high) + f_mid(mid) + f_low(low)
+# 로 분해된다. 유일한 결합 항은 make_features 의 is_popular 가 쓰는 전체 number_of_reviews 평균(M)인데,
+# M 은 그룹별 리뷰 수 합의 합이라 그룹별로 미리 구해둘 수 있다.
+# 슬라이더 범위 안에서 M 이 움직일 수 있는 구간 [M_lo, M_hi] 에 리뷰 수가 걸친 숙소(경계 숙소)만
+# is_popular 0/1 두 경우를 모두 예측해 두고, 조회 시 M 보다 리뷰가 많은 경계 숙소의 차이만 더한다.
+class RevenueSurface:
+    def __init__(self, df, fees=SLIDER_FEES, revenue_unit=100, max_block_rows=250_000, on_progress=None,
+                 model_path=MODEL_PATH, features_dir=None):
+        # revenue_unit: 수수료 값을 매출 비율로 바꿀 때 나누는 값 (슬라이더 % 단위면 100, 비율이면 1)
+        # on_progress(surface, k): 블록 예측이 끝날 때마다 앞쪽 k 개 수수료까지 모든 그룹이 끝났으면 호출
+        #   (블록 하나에 수수료 여러 개가 들어가므로 k 는 여러 칸씩 건너뛸 수 있음, 마지막은 항상 전체 수)
+        #   -> 그 시점에 best_fee_map(n_fees=k) 로 지금까지의 최적 조합을 볼 수 있음 (예외를 던지면 중단)
+        # model_path: 예측에 쓸 모델 번들 (도시마다 다를 수 있음)
+        # features_dir: 그룹별 기본 피처를 저장/mmap 으로 열 폴더 (feature_cache_dir(데이터 지문, 모델 지문))
+        #   -> 같은 데이터로 곡면을 만드는 다른 서버 워커 프로세스는 계산 없이 같은 페이지를 씀
+        self.fees = np.asarray(fees, dtype=float)
+        self.revenue_unit = revenue_unit
+        self.model_path = model_path
+
+        booked_group = assign_booked_group(df['booked'])
+        masks = [(booked_group == label).to_numpy() for label in BOOKED_LABELS]
+        price = df['price'].to_numpy(dtype=float)
+        self.price = price
+        self.n_rows = len(df)
+        self.positions = [np.flatnonzero(mask) for mask in masks]
+        self.prices = [price[mask] for mask in masks]
+        self.group_counts = np.array([mask.sum() for mask in masks])
+        self.n_grouped = int(self.group_counts.sum())
+        self.original_gross = float((df['price'] * df['booked']).sum())
+        self.original_total = self.original_gross * FEE_BEFORE
+
+        n_groups, n_fees = len(BOOKED_LABELS), len(self.fees)
+        model_bundle = load_predict_model(self.model_path)
+        # 그룹별로 수수료와 무관한 피처는 한 번만 계산
+        if features_dir is None:
+            subsets = [IncrementalFeatures(df[mask], model_bundle['scaler']) if mask.any() else None for mask in masks]
+        else:
+            subsets = [load_or_build(os.path.join(features_dir, label), df[mask], model_bundle['scaler'])
+                       if mask.any() else None for label, mask in zip(BOOKED_LABELS, masks)]
+        self.features = subsets
+
+        # 1단계: 모델 없이 그룹별 리뷰 수 합 S[g, f] 만 계산 -> M 의 범위
+        self.review_sums = np.zeros((n_groups, n_fees))
+        for g, (label, features) in enumerate(zip(BOOKED_LABELS, subsets)):
+            if features is None:
+                continue
+            for f, fee in enumerate(self.fees):
+                self.review_sums[g, f] = features.fee_columns({label: fee})['number_of_reviews'].sum()
+        denom = max(self.n_grouped, 1)
+        m_lo = self.review_sums.min(axis=1).sum() / denom
+        m_hi = self.review_sums.max(axis=1).sum() / denom
+
+        # 2단계: (그룹, 수수료) 마다 바뀌는 피처만 다시 계산하고 블록 단위로 앙상블 예측
+
+        self.booked_sums = np.zeros((n_groups, n_fees))
+        self.gross_sums = np.zeros((n_groups, n_fees))
+        # 숙소별 예측값 (경계 숙소는 is_popular=0 기준): 그룹마다 (수수료 수, 그룹 숙소 수)
+        self.listing_booked = [np.zeros((n_fees, len(p))) for p in self.positions]
+        # 경계 숙소: 리뷰 수(오름차순), 그룹 내 위치, is_popular=1 예측값,
+        # 그리고 그 위치부터 끝까지의 (is_popular 1 - 0) 차이 누적합
+        self.boundary_reviews = [[np.zeros(0)] * n_fees for _ in range(n_groups)]
+        self.boundary_rows = [[np.zeros(0, dtype=int)] * n_fees for _ in range(n_groups)]
+        self.boundary_popular = [[np.zeros(0)] * n_fees for _ in range(n_groups)]
+        self.boundary_booked = [[np.zeros(1)] * n_fees for _ in range(n_groups)]
+        self.boundary_gross = [[np.zeros(1)] * n_fees for _ in range(n_groups)]
+
+        # 수수료 순서로 (모든 그룹) 예측 -> 앞쪽 수수료 구간의 곡면이 먼저 완성됨
+        # 예측할 행렬은 미리 잡아둔 블록 버퍼에 (그룹, 수수료) 마다 이어 쓰고, 버퍼가 차면 한 번에 예측
+        built = [features for features in subsets if features is not None]
+        largest = 2 * max((len(p) for p in self.positions), default=0)
+        capacity = max(min(max_block_rows, 2 * self.n_grouped * n_fees), largest)
+        block = np.empty((capacity, len(built[0].columns)), dtype=built[0].dtype) if built else None
+        scratch = np.empty((largest // 2, block.shape[1]), dtype=block.dtype) if built else None
+
+        pending, pending_rows, completed = [], 0, 0
+        for f, fee in enumerate(self.fees):
+            for g, (label, features) in enumerate(zip(BOOKED_LABELS, subsets)):
+                if features is None:
+                    continue
+                fee_map = {label: fee}
+                reviews = features.fee_columns(fee_map)['number_of_reviews']
+                boundary = (reviews > m_lo) & (reviews <= m_hi)
+                n_group, n_boundary = len(reviews), int(boundary.sum())
+                if pending_rows + n_group + n_boundary > capacity:
+                    self._predict_pending(pending, block[:pending_rows], model_bundle)
+                    pending, pending_rows = [], 0
+                    # 지금 수수료(f)의 앞 그룹까지 예측됨 -> 앞쪽 f 개 수수료 완성
+                    if on_progress is not None and f > completed:
+                        completed = f
+                        on_progress(self, f)
+
+                # 경계 숙소는 is_popular=0 으로, 나머지는 M 과 무관하게 확정된 값으로 만든 뒤
+                # 경계 숙소만 is_popular=1 인 행을 뒤에 덧붙임
+                features.transform(fee_map, popular_threshold=m_hi, out=block[pending_rows:pending_rows + n_group])
+                if n_boundary:
+                    X_popular = features.transform(fee_map, popular_threshold=m_lo, out=scratch[:n_group])
+                    block[pending_rows + n_group:pending_rows + n_group + n_boundary] = X_popular[boundary]
+                pending.append((g, f, n_group + n_boundary, reviews, boundary))
+                pending_rows += n_group + n_boundary
+        self._predict_pending(pending, block[:pending_rows] if built else None, model_bundle)
+        if on_progress is not None:
+            on_progress(self, n_fees)
+
+    @property
+    def nbytes(self):
+        # 곡면이 들고 있는 배열 크기 (그룹별 기본 피처 포함) - 도시 상주 메모리 상한 계산용
+        arrays = [self.price, self.review_sums, self.booked_sums, self.gross_sums,
+                  *self.positions, *self.prices, *self.listing_booked]
+        for per_group in (self.boundary_reviews, self.boundary_rows, self.boundary_popular,
+                          self.boundary_booked, self.boundary_gross):
+            for per_fee in per_group:
+                arrays.extend(per_fee)
+        return int(sum(a.nbytes for a in arrays) + sum(f.nbytes for f in self.features if f is not None))
+
+    def _predict_pending(self, pending, X_block, model_bundle):
+        if not pending:
+            return
+        booked_new = predict_ensemble(X_block, model_bundle)
+        offset = 0
+        for g, f, n_item, reviews, boundary in pending:
+            pred = booked_new[offset:offset + n_item]
+            offset += n_item
+
+            price = self.prices[g]
+            base, popular = pred[:len(price)], pred[len(price):]
+            self.listing_booked[g][f] = base
+            self.booked_sums[g, f] = np.nansum(base)
+            self.gross_sums[g, f] = np.nansum(base * price)
+
+            delta = popular - base[boundary]
+            order = np.argsort(reviews[boundary], kind='stable')
+            self.boundary_reviews[g][f] = reviews[boundary][order]
+            self.boundary_rows[g][f] = np.flatnonzero(boundary)[order]
+            self.boundary_popular[g][f] = popular[order]
+            self.boundary_booked[g][f] = _suffix_sums(delta[order])
+            self.boundary_gross[g][f] = _suffix_sums((delta * price[boundary])[order])
+
+    def fee_index(self, fee):
+        idx = int(np.argmin(np.abs(self.fees - fee)))
+        if not np.isclose(self.fees[idx], fee, atol=1e-6):
+            raise ValueError(f"수수료 {fee} 는 매출 곡면 격자에 없습니다.")
+        return idx
+
+    def popular_threshold(self, fee_idx):
+        return sum(self.review_sums[g, f] for g, f in enumerate(fee_idx)) / max(self.n_grouped, 1)
+
+    def lookup(self, fee_map):
+        fee_idx = [self.fee_index(fee_map[label]) for label in BOOKED_LABELS]
+        threshold = self.popular_threshold(fee_idx)
+
+        booked, gross = np.zeros(len(BOOKED_LABELS)), np.zeros(len(BOOKED_LABELS))
+        for g, f in enumerate(fee_idx):
+            j = np.searchsorted(self.boundary_reviews[g][f], threshold, side='right')
+            booked[g] = self.booked_sums[g, f] + self.boundary_booked[g][f][j]
+            gross[g] = self.gross_sums[g, f] + self.boundary_gross[g][f][j]
+
+        fee_rate = np.clip(self.fees[fee_idx], 0.0, None) / self.revenue_unit
+        group_sales = gross * fee_rate
+        simulated_total = float(group_sales.sum())
+        return {
+            'original_total': self.original_total,
+            'simulated_total': simulated_total,
+            'revenue_change': (simulated_total - self.original_total) / self.original_total * 100,
+            'group_sales': pd.Series(group_sales, index=BOOKED_LABELS),
+            'group_booked': pd.Series(booked, index=BOOKED_LABELS),
+            'host_total': float((gross - group_sales).sum()),
+        }
+
+    def simulate(self, fee_map):
+        # 숙소별 booked_new / sales 와 집계값 (전체 파이프라인 결과와 같은 값, 모델 호출 없음)
+        # 구간 밖 숙소(booked_group 이 NaN)는 수수료가 없어서 NaN 으로 둠
+        fee_idx = [self.fee_index(fee_map[label]) for label in BOOKED_LABELS]
+        threshold = self.popular_threshold(fee_idx)
+
+        booked_new = np.full(self.n_rows, np.nan)
+        sales = np.full(self.n_rows, np.nan)
+        for g, f in enumerate(fee_idx):
+            booked = self.listing_booked[g][f].copy()
+            j = np.searchsorted(self.boundary_reviews[g][f], threshold, side='right')
+            booked[self.boundary_rows[g][f][j:]] = self.boundary_popular[g][f][j:]
+            booked_new[self.positions[g]] = booked
+            sales[self.positions[g]] = booked * self.prices[g] * (max(self.fees[f], 0.0) / self.revenue_unit)
+
+        result = self.lookup(fee_map)
+        return {
+            'booked_new': booked_new,
+            'sales': sales,
+            'original_total': result['original_total'],
+            'simulated_total': result['simulated_total'],
+            'revenue_change': result['revenue_change'],
+            'group_sales': result['group_sales'].to_dict(),
+            'group_booked': result['group_booked'].to_dict(),
+        }
+
+    def member_predictions(self, fee_map):
+        # 숙소별 멤버 예측값 (n_rows x MEMBERS, 구간 밖 숙소는 NaN) - 모델 호출이 필요하므로 결과는 캐시해서 사용
+        # is_popular 기준은 이 수수료 조합의 실제 리뷰 수 평균 (전체 파이프라인과 같음)
+        fee_idx = [self.fee_index(fee_map[label]) for label in BOOKED_LABELS]
+        threshold = self.popular_threshold(fee_idx)
+        model_bundle = load_predict_model(self.model_path)
+        members = np.full((self.n_rows, len(MEMBERS)), np.nan)
+        for g, (label, features) in enumerate(zip(BOOKED_LABELS, self.features)):
+            if features is None:
+                continue
+            X = features.transform({label: self.fees[fee_idx[g]]}, popular_threshold=threshold)
+            members[self.positions[g]] = predict_members(X, model_bundle)
+        return members
+
+    def reweight(self, members, fee_map, weights=None):
+        # 캐시된 멤버 예측값을 가중치만 바꿔 다시 블렌드 (모델 호출 없음)
+        # 멤버별 단독 매출(member_totals)과 숙소별 멤버 간 편차도 같이 반환
+        fee_idx = [self.fee_index(fee_map[label]) for label in BOOKED_LABELS]
+        rate = np.full(self.n_rows, np.nan)
+        for g, f in enumerate(fee_idx):
+            rate[self.positions[g]] = max(self.fees[f], 0.0) / self.revenue_unit
+
+        booked_new = blend_members(members, weights)
+        sales = booked_new * self.price * rate
+        simulated_total = float(np.nansum(sales))
+        member_totals = np.nansum(members * (self.price * rate)[:, None], axis=0)
+        spread = member_spread(members)
+        return {
+            'booked_new': booked_new,
+            'sales': sales,
+            'booked_std': spread['std'],
+            'booked_low': spread['low'],
+            'booked_high': spread['high'],
+            'original_total': self.original_total,
+            'simulated_total': simulated_total,
+            'revenue_change': (simulated_total - self.original_total) / self.original_total * 100,
+            'group_sales': {label: float(np.nansum(sales[self.positions[g]])) for g, label in enumerate(BOOKED_LABELS)},
+            'member_totals': {m: float(t) for m, t in zip(MEMBERS, member_totals)},
+        }
+
+    def _gross_grid(self, n_fees=None):
+        # 모든 (high, mid, low) 조합의 그룹별 gross 합 (n_fees^3 격자, n_fees 를 주면 앞쪽 수수료만)
+        n_fees = len(self.fees) if n_fees is None else n_fees
+        h, m, l = (BOOKED_LABELS.index(label) for label in ('high', 'mid', 'low'))
+        threshold = (self.review_sums[h][:n_fees, None, None]
+                     + self.review_sums[m][None, :n_fees, None]
+                     + self.review_sums[l][None, None, :n_fees]) / max(self.n_grouped, 1)
+
+        grids = {}
+        for g, axis in ((h, 0), (m, 1), (l, 2)):
+            grid = np.empty((n_fees, n_fees, n_fees))
+            for f in range(n_fees):
+                # g 그룹 수수료가 f 인 단면에서 M 값들로 경계 보정
+                section = np.take(threshold, f, axis=axis)
+                j = np.searchsorted(self.boundary_reviews[g][f], section, side='right')
+                corrected = self.gross_sums[g, f] + self.boundary_gross[g][f][j]
+                index = [slice(None)] * 3
+                index[axis] = f
+                grid[tuple(index)] = corrected
+            grids[BOOKED_LABELS[g]] = grid
+        return grids
+
+    def best_fee_map(self, max_mid_fee=3.3, min_host_delta=1.5, n_fees=None):
+        # 곡면 전체를 전수 탐색: 상위 < 중위 < 하위, 중위 <= max_mid_fee, 호스트 수익 min_host_delta% 이상 증가
+        # n_fees 를 주면 앞쪽 n_fees 개 수수료 조합만 탐색 (곡면을 만드는 중간의 최적값)
+        grids = self._gross_grid(n_fees)
+        fees = self.fees[:n_fees]
+        rate = np.clip(fees, 0.0, None) / self.revenue_unit
+        high, mid, low = fees[:, None, None], fees[None, :, None], fees[None, None, :]
+
+        airbnb = (grids['high'] * rate[:, None, None]
+                  + grids['mid'] * rate[None, :, None]
+                  + grids['low'] * rate[None, None, :])
+        host = grids['high'] + grids['mid'] + grids['low'] - airbnb
+        orig_host_total = self.original_gross * (1 - FEE_BEFORE)
+        host_delta = (host - orig_host_total) / orig_host_total * 100
+
+        feasible = (high < mid) & (mid < low) & (mid <= max_mid_fee + 1e-9) & (host_delta >= min_host_delta)
+        if not feasible.any():
+            return None
+        best = np.unravel_index(np.argmax(np.where(feasible, airbnb, -np.inf)), airbnb.shape)
+        return {label: float(fees[i]) for label, i in zip(('high', 'mid', 'low'), best)}
+
+
+def _suffix_sums(values):
+    # out[j] = values[j:].sum(), out[len] = 0
+    return np.append(np.cumsum(values[::-1])[::-1], 0.0)
@@ -1,31 +1,52 @@
 import pandas as pd
 
+from profiling import span
+
+# 예약일수 기준 그룹 구간 / 기존 고정 수수료
+BOOKED_BINS = [-1, 120, 240, 365]
+BOOKED_LABELS = ['low', 'mid', 'high']
+FEE_BEFORE = 0.033
+
+# 수수료 변화 1단위당 변수 변화량 (수수료에 반응하는 열은 이 다섯 개뿐)
+base_coefficients = {
+    'review_scores_cleanliness': -0.0003,
+    'review_scores_communication': -0.0018,
+    'review_scores_checkin': -0.002,
+    'review_scores_value': -0.0035,
+    'number_of_reviews': -0.002
+}
+# 수수료를 올리면 리뷰 수가 음수로 내려갈 수 있음 -> 0 에서 자름 (리뷰 0개 숙소가 -1 아래로 가면 log_reviews 가 NaN)
+NON_NEGATIVE_COLUMNS = ['number_of_reviews']
+
+
+def assign_booked_group(booked):
+    return pd.cut(booked, bins=BOOKED_BINS, labels=BOOKED_LABELS)
+
+
 # 2. 변수 수정만 수행하는 함수
 def update_columns_by_fee_change(df, fee_dict):
-    
-    # 예약량 기준 그룹 분류
-    df['booked_group'] = pd.cut(df['booked'], bins=[-1, 120, 240, 365], labels=['low', 'mid', 'high'])
+    with span('update_columns_by_fee_change', len(df)):
+        # 예약량 기준 그룹 분류
+        df['booked_group'] = assign_booked_group(df['booked'])
 
 
-    df['fee_before'] = 0.033
-    df['fee_rate'] = df['booked_group'].map(fee_dict).astype(float).clip(lower=0.0)
-    fee_delta = (df['fee_rate'] - df['fee_before']) * 100 # 수수료 변화 차이
+        df['fee_before'] = FEE_BEFORE
+        df['fee_rate'] = df['booked_group'].map(fee_dict).astype(float).clip(lower=0.0)
+        fee_delta = (df['fee_rate'] - df['fee_before']) * 100 # 수수료 변화 차이
 
-    # 변수 변화량 반영 (기존 열 업데이트)
-    base_coefficients = {
-        'review_scores_cleanliness': -0.0003,
-        'review_scores_communication': -0.0018,
-        'review_scores_checkin': -0.002,
-        'review_scores_value': -0.0035,
-        'number_of_reviews': -0.002
-    }
-
-    for col, coef in base_coefficients.items():
-        df[col] += coef * fee_delta
+        # 변수 변화량 반영 (기존 열 업데이트)
+        for col, coef in base_coefficients.items():
+            df[col] += coef * fee_delta
+        for col in NON_NEGATIVE_COLUMNS:
+            df[col] = df[col].clip(lower=0)
 
     return df
 
 def calculate_revenue(df):
+    with span('calculate_revenue', len(df)):
+        return _calculate_revenue(df)
+
+def _calculate_revenue(df):
     # 수익 계산
     original_total = (df['price'] * df['booked'] * (3.3/ 100)).sum()
     simulated_total = (df['price'] * df['booked_new'] * (df['fee'].astype(float) / 100)).sum()
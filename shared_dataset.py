@@ -0,0 +1,67 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from sa_simulation_file import assign_booked_group, BOOKED_LABELS
+from sw_prediction_file import dataset_fingerprint
+
+
+# 공유 기본 데이터(load_dataset 의 읽기 전용 mmap DataFrame)에서 조건에 맞는 행만 고른 보기
+# 필터 결과를 세션마다 .copy() 하지 않고 행 번호 배열 하나를 모든 세션이 같이 씀
+# 수수료와 무관한 값(데이터 지문, booked_group)은 보기마다 한 번만 계산
+# 수수료에 따라 바뀌는 값은 매출 곡면에서 읽으므로 세션은 숙소별 열을 따로 들고 있지 않음 (시뮬레이션 결과만)
+class SharedView:
+    def __init__(self, base, rows):
+        self.base = base
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.rows.flags.writeable = False
+        self._lock = threading.Lock()
+        self._key = None
+        self._group_codes = None
+
+    @classmethod
+    def at_least(cls, base, column, minimum):
+        # base[base[column] >= minimum] 과 같은 행 (순서 그대로)
+        return cls(base, np.flatnonzero(base[column].to_numpy() >= minimum))
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        # 보기가 따로 가지는 메모리 (기본 데이터 제외)
+        codes = self._group_codes
+        return self.rows.nbytes + (codes.nbytes if codes is not None else 0)
+
+    def column(self, name):
+        # 이 보기의 열 하나 (새 배열)
+        return np.take(self.base[name].to_numpy(), self.rows)
+
+    def frame(self, columns=None):
+        # 부분집합 DataFrame (원래 행 번호를 인덱스로, 필터 후 .copy() 한 것과 같은 값)
+        # 매출 곡면 만들기처럼 한 번 쓰고 놓는 용도 - 세션에 들고 있지 않도록
+        base = self.base if columns is None else self.base[columns]
+        return base.take(self.rows)
+
+    @property
+    def key(self):
+        # dataset_fingerprint(self.frame()) - 캐시/작업 키, 한 번만 계산
+        with self._lock:
+            if self._key is None:
+                self._key = dataset_fingerprint(self.frame())
+            return self._key
+
+    def group_codes(self):
+        # BOOKED_LABELS 순서의 booked_group 코드 (-1: 구간 밖)
+        with self._lock:
+            if self._group_codes is None:
+                codes = np.asarray(assign_booked_group(self.column('booked')).codes)
+                codes.flags.writeable = False
+                self._group_codes = codes
+            return self._group_codes
+
+    def group_counts(self):
+        codes = self.group_codes()
+        counts = np.bincount(codes[codes >= 0], minlength=len(BOOKED_LABELS))
+        return pd.Series(counts, index=BOOKED_LABELS)
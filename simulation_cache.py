@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 배열 말고 나머지(집계값, dict)의 대략적인 크기
+_ENTRY_OVERHEAD = 1024
+
+
+def simulation_key(dataset_key, model_key, fee_map, ndigits=3):
+    # (데이터 지문, 모델 지문, 반올림한 수수료) -> 캐시 키
+    fees = tuple(sorted((group, round(float(fee), ndigits)) for group, fee in fee_map.items()))
+    return ('simulation', dataset_key, model_key, fees)
+
+
+def _entry_bytes(value):
+    return _ENTRY_OVERHEAD + sum(v.nbytes for v in value.values() if isinstance(v, np.ndarray))
+
+
+# 시뮬레이션 결과 캐시 (프로세스 전역, 여러 세션이 공유)
+# - 메모리: max_bytes 안에서 LRU 로 유지, 넘치면 가장 오래 안 쓴 항목부터 제거
+# - 디스크(선택): spill_dir 을 주면 저장할 때 .npz 로도 써두고, 메모리에 없으면 디스크에서 읽음
+#   -> 재시작 후에도 이전에 본 슬라이더 조합은 바로 나옴
+# 값은 {이름: numpy 배열 | 숫자 | 문자열 | dict} 형태
+class SimulationCache:
+    def __init__(self, max_bytes=256 * 2**20, spill_dir=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+        # 디스크 파일 크기 합 (쓸 때마다 더하고, 상한을 넘을 때만 폴더를 다시 훑어 정리하면서 실제 값으로 맞춤)
+        self.disk_bytes = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            if max_disk_bytes:
+                self._prune_disk()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self._read_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, value)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._insert(key, value)
+        self._write_disk(key, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _insert(self, key, value):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= _entry_bytes(old)
+        size = _entry_bytes(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = value
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= _entry_bytes(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_writes': self.disk_writes,
+                'disk_bytes': self.disk_bytes,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+    # ---- 디스크 계층 ----
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        return os.path.join(self.spill_dir, f"{digest}.npz")
+
+    def _write_disk(self, key, value):
+        if not self.spill_dir:
+            return
+        arrays = {k: v for k, v in value.items() if isinstance(v, np.ndarray)}
+        meta = {k: v for k, v in value.items() if not isinstance(v, np.ndarray)}
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, __key__=np.array(repr(key)), __meta__=np.array(json.dumps(meta)), **arrays)
+        size = os.path.getsize(tmp)
+        try:
+            size -= os.path.getsize(path)  # 같은 키를 덮어쓰면 차이만
+        except OSError:
+            pass
+        os.replace(tmp, path)
+        with self._lock:
+            self.disk_writes += 1
+            self.disk_bytes += size
+            over = self.max_disk_bytes and self.disk_bytes > self.max_disk_bytes
+        if over:
+            self._prune_disk()
+
+    def _read_disk(self, key):
+        if not self.spill_dir:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data['__key__']) != repr(key):
+                    return None
+                value = json.loads(str(data['__meta__']))
+                value.update({k: data[k] for k in data.files if not k.startswith('__')})
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)  # 디스크 정리 시 최근 사용으로 취급
+        except OSError:
+            pass
+        return value
+
+    def _prune_disk(self):
+        # 폴더 전체를 훑어 오래 안 쓴 파일부터 지움 (다른 프로세스가 쓴 파일도 포함해 disk_bytes 를 다시 맞춤)
+        files = []
+        for name in os.listdir(self.spill_dir):
+            path = os.path.join(self.spill_dir, name)
+            try:
+                if name.endswith('.npz'):
+                    files.append((os.stat(path), path))
+            except OSError:
+                pass  # 다른 프로세스가 방금 지운 파일
+        # 상한의 90% 까지 지워서 상한 근처에서 쓸 때마다 다시 훑지 않게
+        target = self.max_disk_bytes * 0.9
+        total = sum(st.st_size for st, _ in files)
+        for st, path in sorted(files, key=lambda item: item[0].st_mtime):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= st.st_size
+            except OSError:
+                pass
+        with self._lock:
+            self.disk_bytes = total
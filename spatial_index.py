@@ -0,0 +1,184 @@
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+EARTH_RADIUS_M = 6_371_000.0
+# 셀 수가 너무 많아지면(넓은 지역) 셀 크기를 키움
+MAX_CELLS = 4_000_000
+
+
+# 숙소 좌표 격자 인덱스
+# 도시 중심 기준 등장방형 투영(미터)으로 바꾼 뒤 cell_m 크기 격자 셀로 나누고,
+# 셀 번호 순으로 정렬한 행 번호(order)와 셀별 시작 위치(cell_start)만 들고 있음
+# -> 박스/반경/kNN 질의는 겹치는 셀의 행만 보고 정확한 거리로 한 번 더 거름
+# 반환값은 모두 원본 DataFrame 의 행 위치(iloc) 배열
+class GridIndex:
+    def __init__(self, lat, lon, cell_m=250.0):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        self.lat0, self.lon0 = float(lat.mean()), float(lon.mean())
+        self.m_per_lat = EARTH_RADIUS_M * np.pi / 180
+        self.m_per_lon = self.m_per_lat * np.cos(np.radians(self.lat0))
+        x, y = self.project(lat, lon)
+
+        self.x_min, self.y_min = float(x.min()), float(y.min())
+        width, height = float(x.max()) - self.x_min, float(y.max()) - self.y_min
+        while (width / cell_m + 1) * (height / cell_m + 1) > MAX_CELLS:
+            cell_m *= 2
+        self.cell_m = cell_m
+        self.nx = int(width // cell_m) + 1
+        self.ny = int(height // cell_m) + 1
+
+        cells = self._cell_x(x) * self.ny + self._cell_y(y)
+        self.order = np.argsort(cells, kind='stable')
+        # 셀 c 의 행: order[cell_start[c]:cell_start[c + 1]]
+        self.cell_start = np.searchsorted(cells[self.order], np.arange(self.nx * self.ny + 1))
+        self.xs, self.ys = x[self.order], y[self.order]
+
+    @classmethod
+    def from_frame(cls, location_df, cell_m=250.0):
+        return cls(location_df['latitude'].to_numpy(), location_df['longitude'].to_numpy(), cell_m)
+
+    def __len__(self):
+        return len(self.order)
+
+    def project(self, lat, lon):
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        return (lon - self.lon0) * self.m_per_lon, (lat - self.lat0) * self.m_per_lat
+
+    def _cell_x(self, x):
+        return np.clip(((np.asarray(x) - self.x_min) // self.cell_m).astype(np.int64), 0, self.nx - 1)
+
+    def _cell_y(self, y):
+        return np.clip(((np.asarray(y) - self.y_min) // self.cell_m).astype(np.int64), 0, self.ny - 1)
+
+    def _candidates(self, x0, x1, y0, y1):
+        # 박스와 겹치는 셀들의 정렬 위치 (셀 열(cx)마다 cy 구간이 연속이라 열당 슬라이스 하나)
+        cx = np.arange(self._cell_x(x0), self._cell_x(x1) + 1)
+        cells = cx * self.ny
+        starts = self.cell_start[cells + self._cell_y(y0)]
+        ends = self.cell_start[cells + self._cell_y(y1) + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int64)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(total)
+
+    def bbox(self, south, west, north, east):
+        # 위경도 박스 안의 행 위치
+        x0, y0 = self.project(south, west)
+        x1, y1 = self.project(north, east)
+        if x1 < x0 or y1 < y0:
+            return np.empty(0, dtype=np.int64)
+        pos = self._candidates(x0, x1, y0, y1)
+        xs, ys = self.xs[pos], self.ys[pos]
+        pos = pos[(xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)]
+        return np.sort(self.order[pos])
+
+    def radius(self, lat, lon, radius_m):
+        # 점에서 radius_m 미터 안의 행 위치
+        cx, cy = self.project(lat, lon)
+        pos = self._candidates(cx - radius_m, cx + radius_m, cy - radius_m, cy + radius_m)
+        dist2 = (self.xs[pos] - cx) ** 2 + (self.ys[pos] - cy) ** 2
+        return np.sort(self.order[pos[dist2 <= radius_m ** 2]])
+
+    def knn(self, lat, lon, k=10):
+        # 가까운 k 개의 (행 위치, 거리(m)) - 가까운 순
+        # 셀 크기 반경부터 두 배씩 넓히면서, k 번째 거리가 탐색 반경 안에 들어오면 종료
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        cx, cy = self.project(lat, lon)
+        reach = self.cell_m
+        max_reach = np.hypot(self.nx, self.ny) * self.cell_m + np.hypot(cx - self.x_min, cy - self.y_min)
+        while True:
+            pos = self._candidates(cx - reach, cx + reach, cy - reach, cy + reach)
+            if len(pos) >= k:
+                dist = np.hypot(self.xs[pos] - cx, self.ys[pos] - cy)
+                nearest = np.argpartition(dist, k - 1)[:k]
+                if dist[nearest].max() <= reach or reach >= max_reach:
+                    nearest = nearest[np.lexsort((self.order[pos[nearest]], dist[nearest]))]
+                    return self.order[pos[nearest]], dist[nearest]
+            reach *= 2
+
+    def cell_counts(self):
+        # 숙소가 있는 셀별 개수와 셀 중심 좌표 (밀도 지도/지역별 집계용)
+        counts = np.diff(self.cell_start)
+        cells = np.flatnonzero(counts)
+        x = self.x_min + (cells // self.ny + 0.5) * self.cell_m
+        y = self.y_min + (cells % self.ny + 0.5) * self.cell_m
+        return pd.DataFrame({
+            'latitude': self.lat0 + y / self.m_per_lat,
+            'longitude': self.lon0 + x / self.m_per_lon,
+            'count': counts[cells],
+        })
+
+
+def _haversine_m(lat, lon, lat0, lon0):
+    lat, lon = np.radians(lat), np.radians(lon)
+    lat0, lon0 = np.radians(lat0), np.radians(lon0)
+    a = np.sin((lat - lat0) / 2) ** 2 + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def _median_ms(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return round(float(np.median(times)) * 1000, 4), result
+
+
+def benchmark(location_df, repeats=200, seed=0):
+    # 인덱스 질의 vs pandas 전체 스캔 (중앙값 ms, 결과 일치 여부)
+    rng = np.random.default_rng(seed)
+    center = location_df.iloc[int(rng.integers(len(location_df)))]
+    lat, lon = float(center['latitude']), float(center['longitude'])
+    south, north, west, east = lat - 0.01, lat + 0.01, lon - 0.015, lon + 0.015
+
+    start = time.perf_counter()
+    index = GridIndex.from_frame(location_df)
+    build_ms = round((time.perf_counter() - start) * 1000, 2)
+    lat_all = location_df['latitude'].astype(float)
+    lon_all = location_df['longitude'].astype(float)
+
+    def pandas_bbox():
+        mask = lat_all.between(south, north) & lon_all.between(west, east)
+        return np.flatnonzero(mask.to_numpy())
+
+    def pandas_radius():
+        return np.flatnonzero(_haversine_m(lat_all, lon_all, lat, lon).to_numpy() <= 500)
+
+    def pandas_knn():
+        return _haversine_m(lat_all, lon_all, lat, lon).reset_index(drop=True).nsmallest(10).index.to_numpy()
+
+    rows = [{'query': 'build', 'index_ms': build_ms}]
+    for name, naive, indexed in [
+        ('bbox', pandas_bbox, lambda: index.bbox(south, west, north, east)),
+        ('radius_500m', pandas_radius, lambda: index.radius(lat, lon, 500)),
+        ('knn_10', pandas_knn, lambda: index.knn(lat, lon, 10)[0]),
+    ]:
+        pandas_ms, expected = _median_ms(naive, repeats)
+        index_ms, got = _median_ms(indexed, repeats)
+        rows.append({
+            'query': name,
+            'rows': len(got),
+            'pandas_ms': pandas_ms,
+            'index_ms': index_ms,
+            'speedup': round(pandas_ms / index_ms, 1),
+            # 반경/kNN 은 투영 거리 vs 구면 거리라 경계에 걸린 한두 개는 다를 수 있음
+            'overlap': round(len(np.intersect1d(expected, got)) / max(len(expected), 1), 4),
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    from dataset_store import load_locations
+
+    for row in benchmark(load_locations()):
+        print(json.dumps(row, ensure_ascii=False))
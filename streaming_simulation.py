@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import validate_schema
+from sa_simulation_file import update_columns_by_fee_change, calculate_revenue, base_coefficients, BOOKED_LABELS
+from sw_prediction_file import predict_booked_days
+from profiling import span
+
+# 청크 단위 시뮬레이션 (데이터 전체를 한 DataFrame 으로 올리지 않음)
+# 1차: 필요한 열만 읽어서 수수료 반영 후 number_of_reviews 전체 평균(is_popular 기준값) 계산
+# 2차: 청크마다 update -> make_features -> scale -> 앙상블 -> 매출, 합계/그룹별 매출은 누적만
+# 메모리는 청크 크기에 비례 (숙소별 결과는 output_path 로 청크마다 이어 씀)
+DEFAULT_CHUNK_ROWS = 20_000
+OUTPUT_COLUMNS = ['id', 'booked_group', 'fee', 'booked', 'booked_new', 'sales']
+
+
+def _chunks(path, chunksize, columns=None, row_filter=None, filter_columns=()):
+    usecols = None if columns is None else list(dict.fromkeys(list(columns) + list(filter_columns)))
+    for chunk in pd.read_csv(path, chunksize=chunksize, usecols=usecols):
+        if row_filter is not None:
+            try:
+                mask = row_filter(chunk)
+            except KeyError as e:
+                if usecols is None:
+                    raise
+                # 1차 패스는 일부 열만 읽으므로 거르는 데 쓰는 열은 filter_columns 로 알려줘야 함
+                raise ValueError(f"row_filter 가 읽지 않은 열 {e} 을(를) 씁니다. "
+                                 f"filter_columns 에 그 열을 넣어 주세요 (예: filter_columns=['host_days'])") from e
+            chunk = chunk[mask].copy()
+        if len(chunk):
+            yield chunk
+
+
+def popular_threshold(path, fee_map, chunksize=DEFAULT_CHUNK_ROWS, row_filter=None, filter_columns=()):
+    # 수수료 반영 후 number_of_reviews 전체 평균 (NaN 제외, pandas mean 과 같음)
+    # update_columns_by_fee_change 가 건드리는 열만 읽음
+    columns = ['booked'] + list(base_coefficients)
+    total, count = 0.0, 0
+    with span('stream.first_pass'):
+        for chunk in _chunks(path, chunksize, columns, row_filter, filter_columns):
+            reviews = update_columns_by_fee_change(chunk, fee_map)['number_of_reviews']
+            total += float(reviews.sum())
+            count += int(reviews.count())
+    return total / count if count else np.nan
+
+
+def simulate_stream(path, fee_map, chunksize=DEFAULT_CHUNK_ROWS, row_filter=None, filter_columns=(),
+                    weights=None, output_path=None, output_columns=OUTPUT_COLUMNS, verbose=False):
+    # 반환: 합계/그룹별 매출과 처리 통계 (show_city_fee 의 predict_booked_days + calculate_revenue 와 같은 값)
+    # row_filter(chunk) -> bool Series 로 행을 거름 (예: host_days >= 365), filter_columns 는 거르는 데 필요한 열
+    # (1차 패스는 일부 열만 읽으므로 거기 없는 열을 쓰는데 filter_columns 에 빠져 있으면 ValueError)
+    start = time.perf_counter()
+    threshold = popular_threshold(path, fee_map, chunksize, row_filter, filter_columns)
+
+    original_total = simulated_total = 0.0
+    group_sales = {label: 0.0 for label in BOOKED_LABELS}
+    rows = chunks = 0
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+
+    try:
+        for chunk in _chunks(path, chunksize, row_filter=row_filter):
+            if chunks == 0:
+                validate_schema(chunk.columns, 'merged')
+            with span('stream.chunk', len(chunk)):
+                chunk = update_columns_by_fee_change(chunk, fee_map)
+                chunk = predict_booked_days(chunk, weights, popular_threshold=threshold)
+                chunk['fee'] = chunk['booked_group'].map(fee_map)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    chunk['sales'], original, simulated, _ = calculate_revenue(chunk)
+                original_total += float(original)
+                simulated_total += float(simulated)
+                for label, sales in chunk.groupby('booked_group', observed=False)['sales'].sum().items():
+                    group_sales[label] += float(sales)
+
+                if output_path:
+                    columns = [c for c in output_columns if c in chunk.columns]
+                    chunk[columns].to_csv(tmp_path, mode='w' if chunks == 0 else 'a', header=chunks == 0, index=False)
+            rows += len(chunk)
+            chunks += 1
+            if verbose:
+                print(f"🧩 청크 {chunks}: 누적 {rows:,}행 ({time.perf_counter() - start:.1f}s)")
+        if output_path and chunks:
+            os.replace(tmp_path, output_path)
+    finally:
+        if output_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {
+        'original_total': original_total,
+        'simulated_total': simulated_total,
+        'revenue_change': (simulated_total - original_total) / original_total * 100 if original_total else np.nan,
+        'group_sales': group_sales,
+        'popular_threshold': threshold,
+        'rows': rows,
+        'chunks': chunks,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def simulate_in_memory(path, fee_map, row_filter=None, weights=None):
+    # 기존 방식 (전체 DataFrame) - 비교용
+    df = pd.read_csv(path)
+    if row_filter is not None:
+        df = df[row_filter(df)].copy()
+    df = update_columns_by_fee_change(df, fee_map)
+    df = predict_booked_days(df, weights)
+    df['fee'] = df['booked_group'].map(fee_map)
+    df['sales'], original_total, simulated_total, revenue_change = calculate_revenue(df)
+    group_sales = df.groupby('booked_group', observed=False)['sales'].sum()
+    return {
+        'original_total': float(original_total),
+        'simulated_total': float(simulated_total),
+        'revenue_change': float(revenue_change),
+        'group_sales': {label: float(v) for label, v in group_sales.items()},
+        'rows': len(df),
+    }
+
+
+def _peak_mb(func):
+    tracemalloc.start()
+    try:
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, peak / 2**20
+
+
+def memory_report(path, fee_map, chunk_sizes=(2_000, 10_000, 50_000), row_filter=None, filter_columns=()):
+    # 전체 DataFrame 방식 vs 청크 크기별: 최대 할당 메모리(tracemalloc), 시간, 결과 차이
+    start = time.perf_counter()
+    expected, peak = _peak_mb(lambda: simulate_in_memory(path, fee_map, row_filter))
+    rows = [{'mode': 'in_memory', 'chunk_rows': None, 'peak_mb': round(peak, 1),
+             'seconds': round(time.perf_counter() - start, 2), 'max_rel_diff': 0.0}]
+    for chunksize in chunk_sizes:
+        start = time.perf_counter()
+        got, peak = _peak_mb(lambda: simulate_stream(path, fee_map, chunksize, row_filter, filter_columns))
+        diffs = [abs(got[k] - expected[k]) / max(abs(expected[k]), 1e-9) for k in ('original_total', 'simulated_total')]
+        diffs += [abs(got['group_sales'][g] - expected['group_sales'][g]) / max(abs(expected['group_sales'][g]), 1e-9)
+                  for g in BOOKED_LABELS]
+        rows.append({'mode': 'stream', 'chunk_rows': chunksize, 'peak_mb': round(peak, 1),
+                     'seconds': round(time.perf_counter() - start, 2), 'max_rel_diff': max(diffs)})
+    return rows
+
+
+def host_days_filter(min_days=365):
+    # show_city_fee 와 같은 조건 (호스트 경력 min_days 일 이상)
+    return lambda df: df['host_days'] >= min_days
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='청크 단위 수수료 시뮬레이션')
+    parser.add_argument('path', nargs='?', default='assets/inside_airbnb_merged_final_data.csv')
+    parser.add_argument('--high', type=float, default=3.0)
+    parser.add_argument('--mid', type=float, default=3.2)
+    parser.add_argument('--low', type=float, default=4.0)
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument('--output', default=None, help='숙소별 결과 CSV 경로')
+    parser.add_argument('--report', action='store_true', help='전체 DataFrame 방식과 메모리/결과 비교')
+    args = parser.parse_args()
+
+    fee_map = {'high': args.high, 'mid': args.mid, 'low': args.low}
+    if args.report:
+        for row in memory_report(args.path, fee_map, row_filter=host_days_filter(), filter_columns=['host_days']):
+            print(json.dumps(row, ensure_ascii=False))
+    else:
+        result = simulate_stream(args.path, fee_map, args.chunk_rows, host_days_filter(), ['host_days'],
+                                 output_path=args.output, verbose=True)
+        print(json.dumps(result, ensure_ascii=False, indent=1))
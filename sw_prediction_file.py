@@ -1,84 +1,307 @@
 import pandas as pd
 import numpy as np
-import pickle
-import gdown
+import hashlib
 import os
+import threading
+from collections import namedtuple
 
+from dataset_store import load_dataset
+from model_registry import get_model_bundle, registry
+from tree_ensemble import load_or_export
+from knn_index import load_or_build
+from profiling import span
 
-def make_features(df):
-    df['host_response_gap'] = df['host_response_rate'] - df['host_acceptance_rate']
-    df['review_density'] = df['number_of_reviews'] / (df['accommodates'] + 1e-5)
-    df['recent_review_ratio'] = df['number_of_reviews_ltm'] / (df['number_of_reviews'] + 1)
-    df['host_activity_score'] = df['host_response_rate'] * df['host_is_superhost']
-    df['reviews_x_beds'] = df['number_of_reviews'] * df['bedrooms']
-    df['acceptance_per_bed'] = df['host_acceptance_rate'] / (df['bedrooms'] + 1)
-    df['monthly_review_score'] = df['reviews_per_month'] * df['has_hygiene_score']
-    df['sleep_x_work'] = df['has_sleep_score'] * df['has_work_score']
-    df['log_reviews'] = np.log1p(df['number_of_reviews'])
-    df['log_beds'] = np.log1p(df['bedrooms'])
-    df['log_accommodates'] = np.log1p(df['accommodates'])
-    df['is_popular'] = (df['number_of_reviews'] > df['number_of_reviews'].mean()).astype(int)
-    df['size_category'] = pd.cut(df['accommodates'], bins=[0, 2, 4, 10, np.inf], labels=[0, 1, 2, 3])
-    df['bedroom_category'] = pd.cut(df['bedrooms'], bins=[-0.1, 1, 2, 3, np.inf], labels=[0, 1, 2, 3])
-    df['is_premium'] = ((df['host_is_superhost'] == 1.0) & (df['instant_bookable'] == 1.0)).astype(int)
-    df['log_checkin_score'] = np.log1p(df['has_checkin_score'])
-    df['log_longterm_score'] = np.log1p(df['has_longterm_score'])
-    facility_scores = [
-        'has_basic_score', 'has_safety_score', 'has_hygiene_score',
-        'has_cooking_score', 'has_sleep_score', 'has_appliances_score',
-        'has_work_score', 'has_checkin_score', 'has_pet_score', 'has_longterm_score']
-    df['avg_facility_score'] = df[facility_scores].mean(axis=1)
-    df['sum_facility_score'] = df[facility_scores].sum(axis=1)
+
+facility_scores = [
+    'has_basic_score', 'has_safety_score', 'has_hygiene_score',
+    'has_cooking_score', 'has_sleep_score', 'has_appliances_score',
+    'has_work_score', 'has_checkin_score', 'has_pet_score', 'has_longterm_score']
+
+# 파생 피처 정의: (이름, 입력 열, 계산 함수) — 목록 순서가 곧 열 순서
+# 계산 함수는 (d, stats) 를 받음. d 는 DataFrame 이어도 되고 열 이름 -> numpy 배열 dict 여도 됨
+# stats['popular_threshold']: is_popular 기준값 (number_of_reviews 전체 평균)
+Feature = namedtuple('Feature', ['name', 'inputs', 'func'])
+
+FEATURES = [
+    Feature('host_response_gap', ['host_response_rate', 'host_acceptance_rate'],
+            lambda d, s: d['host_response_rate'] - d['host_acceptance_rate']),
+    Feature('review_density', ['number_of_reviews', 'accommodates'],
+            lambda d, s: d['number_of_reviews'] / (d['accommodates'] + 1e-5)),
+    Feature('recent_review_ratio', ['number_of_reviews_ltm', 'number_of_reviews'],
+            lambda d, s: d['number_of_reviews_ltm'] / (d['number_of_reviews'] + 1)),
+    Feature('host_activity_score', ['host_response_rate', 'host_is_superhost'],
+            lambda d, s: d['host_response_rate'] * d['host_is_superhost']),
+    Feature('reviews_x_beds', ['number_of_reviews', 'bedrooms'],
+            lambda d, s: d['number_of_reviews'] * d['bedrooms']),
+    Feature('acceptance_per_bed', ['host_acceptance_rate', 'bedrooms'],
+            lambda d, s: d['host_acceptance_rate'] / (d['bedrooms'] + 1)),
+    Feature('monthly_review_score', ['reviews_per_month', 'has_hygiene_score'],
+            lambda d, s: d['reviews_per_month'] * d['has_hygiene_score']),
+    Feature('sleep_x_work', ['has_sleep_score', 'has_work_score'],
+            lambda d, s: d['has_sleep_score'] * d['has_work_score']),
+    Feature('log_reviews', ['number_of_reviews'],
+            lambda d, s: np.log1p(d['number_of_reviews'])),
+    Feature('log_beds', ['bedrooms'],
+            lambda d, s: np.log1p(d['bedrooms'])),
+    Feature('log_accommodates', ['accommodates'],
+            lambda d, s: np.log1p(d['accommodates'])),
+    Feature('is_popular', ['number_of_reviews'],
+            lambda d, s: (d['number_of_reviews'] > s['popular_threshold']).astype(int)),
+    Feature('size_category', ['accommodates'],
+            lambda d, s: pd.cut(d['accommodates'], bins=[0, 2, 4, 10, np.inf], labels=[0, 1, 2, 3])),
+    Feature('bedroom_category', ['bedrooms'],
+            lambda d, s: pd.cut(d['bedrooms'], bins=[-0.1, 1, 2, 3, np.inf], labels=[0, 1, 2, 3])),
+    Feature('is_premium', ['host_is_superhost', 'instant_bookable'],
+            lambda d, s: ((d['host_is_superhost'] == 1.0) & (d['instant_bookable'] == 1.0)).astype(int)),
+    Feature('log_checkin_score', ['has_checkin_score'],
+            lambda d, s: np.log1p(d['has_checkin_score'])),
+    Feature('log_longterm_score', ['has_longterm_score'],
+            lambda d, s: np.log1p(d['has_longterm_score'])),
+    Feature('avg_facility_score', facility_scores,
+            lambda d, s: d[facility_scores].mean(axis=1)),
+    Feature('sum_facility_score', facility_scores,
+            lambda d, s: d[facility_scores].sum(axis=1)),
+]
+
+
+def features_depending_on(columns):
+    # 입력 열이 바뀌었을 때 다시 계산해야 하는 파생 피처 (파생 피처끼리의 의존도 따라감)
+    dirty = set(columns)
+    names = []
+    for feature in FEATURES:
+        if dirty.intersection(feature.inputs):
+            names.append(feature.name)
+            dirty.add(feature.name)
+    return names
+
+
+# popular_threshold: is_popular 기준값. 없으면 df 의 number_of_reviews 평균을 사용
+# names: 일부 피처만 계산할 때 (None 이면 전부)
+def make_features(df, popular_threshold=None, names=None):
+    with span('make_features', len(df)):
+        if popular_threshold is None:
+            popular_threshold = df['number_of_reviews'].mean()
+        stats = {'popular_threshold': popular_threshold}
+        for feature in FEATURES:
+            if names is None or feature.name in names:
+                df[feature.name] = feature.func(df, stats)
     return df
     
 
+# 모델 입력에서 빠지는 열
+NON_FEATURE_COLUMNS = ['booked', 'id', 'listing_id', 'fee_before', 'booked_group', 'fee_rate']
+
 def scale_X(df, scaler):
-    X = df.drop(columns=['booked', 'id', 'listing_id', 'fee_before', 'booked_group', 'fee_rate'])   # 타겟 나중에 넣어야 됨
+    with span('scale_X', len(df)):
+        X = df.drop(columns=NON_FEATURE_COLUMNS)   # 타겟 나중에 넣어야 됨
 
-    X_scaled = scaler.transform(X)
+        X_scaled = scaler.transform(X)
     return X_scaled
 
-def load_predict_model():# 모델 경로 및 Google Drive 파일 ID
-    model_path = "models/ensemble_model.pkl" # rf_model_best.pkl"
-    file_id = "1bN03Jkdnf2umoCwOW58Gbqt6ORWE13YI"
+MODEL_PATH = "models/ensemble_model.pkl" # rf_model_best.pkl"
+MODEL_FILE_ID = "1bN03Jkdnf2umoCwOW58Gbqt6ORWE13YI"
+# 모델 경로별 Google Drive 파일 ID (도시별 모델은 city_registry 에서 file_id 로 넘김)
+MODEL_FILE_IDS = {MODEL_PATH: MODEL_FILE_ID}
+_download_lock = threading.Lock()
+
+
+def download_predict_model(model_path=MODEL_PATH, file_id=None):# 모델 경로 및 Google Drive 파일 ID
+    # 모델 파일 없을 때만 다운로드 (여러 세션이 동시에 받지 않도록 잠금)
+    if os.path.exists(model_path):
+        return
+    file_id = file_id or MODEL_FILE_IDS.get(model_path)
+    if file_id is None:
+        raise FileNotFoundError(f"모델 파일이 없고 다운로드 경로도 없습니다: {model_path}")
     url = f"https://drive.google.com/uc?id={file_id}"
 
     # models 폴더 없으면 생성
-    os.makedirs("models", exist_ok=True)
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+
+    with _download_lock:
+        if not os.path.exists(model_path):
+            import gdown  # 실제로 받을 때만 import (requests 등까지 딸려 와서 시작이 느려짐)
+            print("📥 모델 다운로드 중...")
+            gdown.download(url, model_path, quiet=False)
 
-    # 모델 파일 없을 때만 다운로드
-    if not os.path.exists(model_path):
-        print("📥 모델 다운로드 중...")
-        gdown.download(url, model_path, quiet=False)
 
-    with open(model_path, "rb") as f:
-        model_bundle = pickle.load(f)
-    print("### 모델 번들 : ", model_bundle)
+def load_predict_model(model_path=MODEL_PATH, file_id=None):
+    # 번들은 프로세스 전역 레지스트리에서 한 번만 로드되고, 파일이 바뀌면 다시 로드됨
+    download_predict_model(model_path, file_id)
+    model_bundle = get_model_bundle(model_path)
+    digest = registry.fingerprint_of(model_bundle)
+    if digest is not None:
+        evaluators = _evaluators.get(digest, {})
+        if USE_TREE_ARRAYS and 'trees' not in evaluators:
+            attach_tree_arrays(model_path, model_bundle, digest)
+        if USE_KNN_INDEX and 'knn_index' not in evaluators:
+            attach_knn_index(model_path, model_bundle, digest)
     return model_bundle
 
 
+# 번들에서 만든 평가기(트리 배열, KNN 인덱스)는 공유 번들 dict 를 고치지 않고 모델 파일 해시별로 따로 보관
+# {sha256: {'trees': TreeEnsemble 또는 None, 'knn_index': KNNIndex 또는 None}}
+_evaluators = {}
+
+
+def model_evaluators(model_bundle):
+    # 레지스트리가 로드한 번들이면 그 해시의 평가기, 아니면 빈 dict (라이브러리 predict 사용)
+    return _evaluators.get(registry.fingerprint_of(model_bundle), {})
+
+
+def _store_evaluator(digest, name, value):
+    # _attach_lock 안에서 호출. 지금 로드돼 있지 않은 모델 해시의 평가기는 같이 정리
+    if digest not in _evaluators:
+        live = {m['sha256'] for m in registry.metrics() if m['loaded']}
+        for stale in [d for d in _evaluators if d not in live]:
+            del _evaluators[stale]
+        _evaluators[digest] = {}
+    _evaluators[digest][name] = value
+
+
+# 작은 배치는 rf/gb/lgb 를 배열 기반 평가기(tree_ensemble)로 예측
+# (라이브러리 predict 는 호출당 검증/스레드 오버헤드가 커서 몇 행짜리 예측에서 느림,
+#  큰 배치는 라이브러리의 C 구현이 더 빨라서 그대로 사용)
+USE_TREE_ARRAYS = True
+TREE_ARRAY_MAX_ROWS = 256
+_attach_lock = threading.Lock()
+
+
+def attach_tree_arrays(model_path, model_bundle, digest):
+    with _attach_lock:
+        if 'trees' in _evaluators.get(digest, {}):
+            return
+        try:
+            trees = load_or_export(model_path, model_bundle, digest)
+        except (ValueError, KeyError, AttributeError) as e:
+            print(f"⚠️ 트리 배열 변환 실패, 라이브러리 predict 사용: {e}")
+            trees = None
+        _store_evaluator(digest, 'trees', trees)
+
+
+# KNN 멤버는 저장해 둔 float32 GEMM 인덱스(knn_index)로 예측
+# 만들 때 라이브러리 예측과 비교해서 오차가 KNN_MAX_ABS_DIFF 를 넘으면 쓰지 않음
+USE_KNN_INDEX = True
+KNN_MAX_ABS_DIFF = 1e-6
+
+
+def attach_knn_index(model_path, model_bundle, digest):
+    with _attach_lock:
+        if 'knn_index' in _evaluators.get(digest, {}):
+            return
+        try:
+            index = load_or_build(model_path, model_bundle['knn'], digest)
+        except (ValueError, KeyError, AttributeError) as e:
+            print(f"⚠️ KNN 인덱스 생성 실패, 라이브러리 predict 사용: {e}")
+            index = None
+        if index is not None and index.meta['accuracy']['max_abs_diff'] > KNN_MAX_ABS_DIFF:
+            print(f"⚠️ KNN 인덱스 오차가 커서 라이브러리 predict 사용: {index.meta['accuracy']}")
+            index = None
+        _store_evaluator(digest, 'knn_index', index)
+
+
 def load_data(path='assets/inside_airbnb_merged_final_data.csv'):
-    df = pd.read_csv(path)
+    # 첫 호출 때 CSV 를 열별 .npy(작은 dtype)로 바꿔 두고 이후엔 그걸 읽음 (프로세스 안에서는 메모리 공유)
+    # 호출하는 쪽에서 열을 고치므로 복사본을 돌려줌
+    with span('load_data') as s:
+        df = load_dataset(path).copy()
+        s.set_rows(len(df))
     return df
 
-def predict_booked_days(df):
-    df = make_features(df)
-    model_bundle = load_predict_model()
-    scaler = model_bundle['scaler']
+def dataset_fingerprint(df):
+    # 데이터 내용(값+인덱스+열 이름) 기준 해시. 캐시/메모 키로 사용
+    h = hashlib.sha256()
+    h.update(",".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+# 앙상블 멤버와 기본 블렌드 가중치: (rf*4 + lgb*2 + gb*2 + knn*2) / 10
+MEMBERS = ('rf', 'lgb', 'gb', 'knn')
+DEFAULT_WEIGHTS = {'rf': 4, 'lgb': 2, 'gb': 2, 'knn': 2}
+
+
+def weight_vector(weights=None):
+    # {멤버: 가중치} -> MEMBERS 순서의 합이 1 인 벡터 (빠진 멤버는 0)
+    weights = DEFAULT_WEIGHTS if weights is None else weights
+    w = np.array([float(weights.get(m, 0.0)) for m in MEMBERS])
+    if (w < 0).any() or w.sum() <= 0:
+        raise ValueError(f"앙상블 가중치가 올바르지 않습니다: {weights}")
+    return w / w.sum()
+
+
+def predict_members(X_scaled, model_bundle):
+    # 멤버별 예측값 (행: 숙소, 열: MEMBERS 순서) -> 가중치만 바꿔 다시 블렌드할 때 사용
+    evaluators = model_evaluators(model_bundle)
+    knn = evaluators.get("knn_index")
+    if knn is None:
+        knn = model_bundle["knn"]
+    trees = evaluators.get("trees")
+    rows = len(X_scaled)
+    if trees is not None and rows <= TREE_ARRAY_MAX_ROWS:
+        with span('predict.trees', rows):
+            preds = trees.predict_members(X_scaled)
+    else:
+        preds = {}
+        for m in ('rf', 'lgb', 'gb'):
+            with span(f'predict.{m}', rows):
+                preds[m] = model_bundle[m].predict(X_scaled)
+    with span('predict.knn', rows):
+        preds['knn'] = knn.predict(X_scaled)
+    return np.column_stack([preds[m] for m in MEMBERS])
+
+
+def blend_members(member_preds, weights=None):
+    return member_preds @ weight_vector(weights)
 
-    X_scaled = scale_X(df, scaler)
+
+def member_spread(member_preds):
+    # 멤버 간 불일치: 숙소별 표준편차와 최소/최대 예측 구간
+    return {
+        'std': member_preds.std(axis=1),
+        'low': member_preds.min(axis=1),
+        'high': member_preds.max(axis=1),
+    }
+
+
+def predict_ensemble(X_scaled, model_bundle, weights=None):
+    if weights is not None:
+        return blend_members(predict_members(X_scaled, model_bundle), weights)
+
+    evaluators = model_evaluators(model_bundle)
+    knn = evaluators.get("knn_index")
+    if knn is None:
+        knn = model_bundle["knn"]
+    trees = evaluators.get("trees")
+    rows = len(X_scaled)
+    if trees is not None and rows <= TREE_ARRAY_MAX_ROWS:
+        # 블렌드 가중치가 트리 리프 값에 이미 들어 있음 -> knn 항만 더함
+        with span('predict.trees', rows):
+            tree_pred = trees.predict(X_scaled)
+        with span('predict.knn', rows):
+            return tree_pred + knn.predict(X_scaled) * 2 / 10
 
     rf = model_bundle["rf"]
     lgbm = model_bundle["lgb"]
     gb = model_bundle["gb"]
-    knn = model_bundle["knn"]
 
-    rf_pred = rf.predict(X_scaled)
-    lgb_pred = lgbm.predict(X_scaled)
-    gb_pred = gb.predict(X_scaled)
-    knn_pred = knn.predict(X_scaled)
+    with span('predict.rf', rows):
+        rf_pred = rf.predict(X_scaled)
+    with span('predict.lgb', rows):
+        lgb_pred = lgbm.predict(X_scaled)
+    with span('predict.gb', rows):
+        gb_pred = gb.predict(X_scaled)
+    with span('predict.knn', rows):
+        knn_pred = knn.predict(X_scaled)
 
-    df['booked_new'] = (rf_pred * 4 + lgb_pred * 2 + gb_pred * 2 + knn_pred * 2) / 10
+    return (rf_pred * 4 + lgb_pred * 2 + gb_pred * 2 + knn_pred * 2) / 10
 
-    return df
+# popular_threshold: 청크 단위로 나눠 예측할 때 전체 데이터 기준 is_popular 기준값을 넘겨줌
+def predict_booked_days(df, weights=None, popular_threshold=None):
+    df = make_features(df, popular_threshold)
+    model_bundle = load_predict_model()
+    scaler = model_bundle['scaler']
+
+    X_scaled = scale_X(df, scaler)
 
+    df['booked_new'] = predict_ensemble(X_scaled, model_bundle, weights)
+
+    return df
@@ -0,0 +1,319 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# predict_ensemble 의 (rf*4 + lgb*2 + gb*2 + knn*2) / 10 가중치
+BLEND_WEIGHTS = {'rf': 0.4, 'lgb': 0.2, 'gb': 0.2, 'knn': 0.2}
+TREE_MEMBERS = ('rf', 'gb', 'lgb')
+# 출력 변환이 없는(항등) LightGBM 목적 함수만 지원
+LGB_IDENTITY_OBJECTIVES = ('regression', 'regression_l1', 'huber', 'fair', 'quantile', 'mape')
+# LightGBM 의 IsZero 기준 (kZeroThreshold)
+LGB_ZERO_THRESHOLD = 1e-35
+
+# 노드 배열 이름 -> dtype (입력 트리에는 right 도 있지만 저장할 때는 left 만 남김)
+NODE_ARRAYS = {
+    'feature': np.int32,
+    'threshold': np.float64,
+    'left': np.int32,          # 왼쪽 자식 (오른쪽 = 왼쪽 + 1, 리프는 -1)
+    'value': np.float64,       # 리프 값 (블렌드 가중치까지 곱해 둠)
+    'default_left': np.bool_,  # 결측/0 일 때 왼쪽으로
+    'nan_to_zero': np.bool_,   # LightGBM missing_type=None/Zero: NaN 을 0 으로 보고 비교
+    'zero_default': np.bool_,  # LightGBM missing_type=Zero: 0 이면 기본 방향
+    'nan_default': np.bool_,   # sklearn / LightGBM missing_type=NaN: NaN 이면 기본 방향
+}
+
+
+class _Nodes:
+    # 여러 트리의 노드를 하나의 연속 배열로 이어 붙임 (자식 번호는 전체 배열 기준)
+    # 트리마다 너비 우선 순서로 번호를 다시 매겨 오른쪽 자식 = 왼쪽 자식 + 1 이 되게 함
+    # 리프는 left = -1
+    def __init__(self):
+        self.columns = {name: [] for name in NODE_ARRAYS}
+        self.roots = []
+        self.size = 0
+
+    def add_tree(self, nodes):
+        left = np.asarray(nodes['left'])
+        right = np.asarray(nodes['right'])
+        order, new_left = [0], {}
+        for old in order:
+            if left[old] != old:
+                new_left[old] = len(order)
+                order += [left[old], right[old]]
+        order = np.asarray(order)
+        offset = self.size
+        self.roots.append(offset)
+        for name in NODE_ARRAYS:
+            values = np.asarray(nodes[name], dtype=NODE_ARRAYS[name])[order]
+            if name == 'left':
+                values = np.array([new_left[old] + offset if old in new_left else -1 for old in order],
+                                  dtype=np.int32)
+            self.columns[name].append(values)
+        self.size += len(order)
+
+    def arrays(self):
+        return {name: np.concatenate(parts).astype(NODE_ARRAYS[name]) for name, parts in self.columns.items()} | \
+            {'roots': np.asarray(self.roots, dtype=np.int32)}
+
+
+def _sklearn_tree(tree, n_features, weight):
+    # sklearn 은 입력을 float32 로 바꾼 뒤 x <= threshold 로 비교 -> float32 열(n_features 뒤쪽)을 보게 함
+    t = tree.tree_
+    n = t.node_count
+    leaf = t.children_left == -1
+    index = np.arange(n)
+    missing_left = getattr(t, 'missing_go_to_left', np.zeros(n, dtype=np.uint8)).astype(bool)
+    return {
+        'feature': np.where(leaf, 0, t.feature) + n_features,
+        'threshold': np.where(leaf, np.inf, t.threshold),
+        # 입력용으로만 리프가 자기 자신을 가리키게 둠 (_Nodes 에서 다시 번호를 매김)
+        'left': np.where(leaf, index, t.children_left),
+        'right': np.where(leaf, index, t.children_right),
+        'value': np.where(leaf, t.value[:, 0, 0] * weight, 0.0),
+        'default_left': missing_left | leaf,
+        'nan_to_zero': np.zeros(n, dtype=bool),
+        'zero_default': np.zeros(n, dtype=bool),
+        'nan_default': ~leaf,
+    }
+
+
+def _lgb_tree(structure, weight):
+    # dump_model() 의 중첩 dict -> 노드 배열 (double 비교, missing_type 별 규칙은 LightGBM NumericalDecision 과 동일)
+    nodes = {name: [] for name in list(NODE_ARRAYS) + ['right']}
+
+    def visit(node):
+        i = len(nodes['feature'])
+        for name in nodes:
+            nodes[name].append(None)
+        if 'leaf_value' in node:
+            nodes['feature'][i], nodes['threshold'][i] = 0, np.inf
+            nodes['left'][i] = nodes['right'][i] = i
+            nodes['value'][i] = node['leaf_value'] * weight
+            nodes['default_left'][i] = True
+            nodes['nan_to_zero'][i] = nodes['zero_default'][i] = nodes['nan_default'][i] = False
+            return i
+        if node['decision_type'] != '<=':
+            raise ValueError(f"지원하지 않는 LightGBM 분기입니다: {node['decision_type']}")
+        missing = node['missing_type']
+        nodes['feature'][i] = node['split_feature']
+        nodes['threshold'][i] = node['threshold']
+        nodes['value'][i] = 0.0
+        nodes['default_left'][i] = node['default_left']
+        nodes['nan_to_zero'][i] = missing != 'NaN'
+        nodes['zero_default'][i] = missing == 'Zero'
+        nodes['nan_default'][i] = missing == 'NaN'
+        nodes['left'][i] = visit(node['left_child'])
+        nodes['right'][i] = visit(node['right_child'])
+        return i
+
+    visit(structure)
+    return nodes
+
+
+def export_trees(model_bundle):
+    # 번들의 rf/gb/lgb 를 하나의 노드 배열 묶음 + 메타데이터로 변환 (블렌드 가중치 포함)
+    rf, gb, lgbm = model_bundle['rf'], model_bundle['gb'], model_bundle['lgb']
+    n_features = int(rf.n_features_in_)
+    nodes = _Nodes()
+    members = {}
+    bias = 0.0
+
+    start = len(nodes.roots)
+    rf_weight = BLEND_WEIGHTS['rf'] / len(rf.estimators_)
+    for tree in rf.estimators_:
+        nodes.add_tree(_sklearn_tree(tree, n_features, rf_weight))
+    members['rf'] = {'trees': [start, len(nodes.roots)], 'weight': BLEND_WEIGHTS['rf'], 'bias': 0.0}
+
+    if getattr(gb, 'loss', 'squared_error') != 'squared_error':
+        raise ValueError(f"지원하지 않는 GradientBoosting loss 입니다: {gb.loss}")
+    start = len(nodes.roots)
+    # 초기 예측값: init_ 추정기(기본 DummyRegressor=학습 타깃 평균)의 예측, init='zero' 면 0
+    gb_init = 0.0 if isinstance(gb.init_, str) else float(np.ravel(gb.init_.predict(np.zeros((1, n_features))))[0])
+    gb_weight = BLEND_WEIGHTS['gb'] * gb.learning_rate
+    for tree in gb.estimators_[:, 0]:
+        nodes.add_tree(_sklearn_tree(tree, n_features, gb_weight))
+    members['gb'] = {'trees': [start, len(nodes.roots)], 'weight': BLEND_WEIGHTS['gb'], 'bias': gb_init}
+    bias += BLEND_WEIGHTS['gb'] * gb_init
+
+    dump = lgbm.booster_.dump_model()
+    objective = dump['objective'].split()[0]
+    if objective not in LGB_IDENTITY_OBJECTIVES or dump.get('average_output') or dump['num_class'] != 1:
+        raise ValueError(f"지원하지 않는 LightGBM 모델입니다: {dump['objective']}")
+    start = len(nodes.roots)
+    best = getattr(lgbm, 'best_iteration_', None) or len(dump['tree_info'])
+    for info in dump['tree_info'][:best]:
+        nodes.add_tree(_lgb_tree(info['tree_structure'], BLEND_WEIGHTS['lgb']))
+    members['lgb'] = {'trees': [start, len(nodes.roots)], 'weight': BLEND_WEIGHTS['lgb'], 'bias': 0.0}
+
+    arrays = nodes.arrays()
+    meta = {
+        'n_features': n_features,
+        'bias': bias,
+        'members': members,
+    }
+    return arrays, meta
+
+
+# 배열 기반 트리 앙상블 평가기
+# 샘플 블록의 모든 (샘플, 트리) 쌍을 한 층씩 동시에 내려가고, 리프에 닿은 쌍은 값을 더한 뒤 빼버림
+# predict() 는 rf/gb/lgb 블렌드 부분 (= predict_ensemble 에서 knn 항을 뺀 값)
+class TreeEnsemble:
+    def __init__(self, arrays, meta):
+        self.arrays = arrays
+        self.meta = meta
+        self.n_features = meta['n_features']
+        # LightGBM missing_type=Zero 분기가 없으면 0 검사 생략
+        self._has_zero_default = bool(np.any(arrays['zero_default']))
+
+    def __len__(self):
+        return len(self.arrays['roots'])
+
+    def _leaf_sum(self, X, roots, block_rows):
+        a = self.arrays
+        feature, threshold, left, value = a['feature'], a['threshold'], a['left'], a['value']
+        X = np.asarray(X, dtype=np.float64)
+        # 앞쪽 n_features 열: double(LightGBM), 뒤쪽: float32 로 반올림한 값(sklearn)
+        X_both = np.concatenate([X, X.astype(np.float32).astype(np.float64)], axis=1)
+        width = X_both.shape[1]
+        special = bool(np.isnan(X).any()) or self._has_zero_default
+        out = np.zeros(len(X))
+        for start in range(0, len(X), block_rows):
+            xb = X_both[start:start + block_rows].ravel()
+            n = len(xb) // width
+            node = np.tile(roots, n)
+            row = np.repeat(np.arange(n, dtype=np.int32), len(roots))
+            while len(node):
+                child = left[node]
+                leaf = child < 0
+                if leaf.any():
+                    out[start:start + n] += np.bincount(row[leaf], weights=value[node[leaf]], minlength=n)
+                    keep = ~leaf
+                    node, row, child = node[keep], row[keep], child[keep]
+                x = xb[row * width + feature[node]]
+                if special:
+                    go_right = ~self._go_left(x, node)
+                else:
+                    go_right = x > threshold[node]
+                node = child + go_right
+        return out
+
+    def _go_left(self, x, node):
+        # 결측/0 처리 규칙 (sklearn missing_go_to_left, LightGBM NumericalDecision)
+        a = self.arrays
+        nan = np.isnan(x)
+        x = np.where(nan & a['nan_to_zero'][node], 0.0, x)
+        use_default = (nan & a['nan_default'][node]) | \
+                      (a['zero_default'][node] & (np.abs(x) <= LGB_ZERO_THRESHOLD))
+        return np.where(use_default, a['default_left'][node], x <= a['threshold'][node])
+
+    def predict(self, X, block_rows=4096):
+        return self.meta['bias'] + self._leaf_sum(X, self.arrays['roots'], block_rows)
+
+    def predict_members(self, X, block_rows=4096):
+        # 멤버별 원래 예측값 (가중치 적용 전)
+        out = {}
+        for name, member in self.meta['members'].items():
+            lo, hi = member['trees']
+            raw = self._leaf_sum(X, self.arrays['roots'][lo:hi], block_rows)
+            out[name] = member['bias'] + raw / member['weight']
+        return out
+
+    # ---- 저장/로드 (배열별 .npy -> mmap 으로 바로 열림) ----
+    def save(self, folder):
+        tmp = f"{folder}.{os.getpid()}.tmp"
+        os.makedirs(tmp, exist_ok=True)
+        for name, values in self.arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), values)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f, indent=1)
+        if os.path.exists(folder):
+            shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            os.replace(tmp, folder)
+
+    @classmethod
+    def load(cls, folder, mmap_mode='r'):
+        with open(os.path.join(folder, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(folder, f"{name}.npy"), mmap_mode=mmap_mode)
+                  for name in list(NODE_ARRAYS) + ['roots']}
+        return cls(arrays, meta)
+
+    @classmethod
+    def from_bundle(cls, model_bundle):
+        return cls(*export_trees(model_bundle))
+
+
+TREE_CACHE_DIR = '.cache/models'
+
+
+def tree_cache_dir(model_path, digest):
+    # 모델 파일 해시별 변환본 위치 (모델이 바뀌면 새로 변환)
+    name = os.path.splitext(os.path.basename(model_path))[0]
+    return os.path.join(TREE_CACHE_DIR, f"{name}.trees-{digest[:12]}")
+
+
+_lock = threading.Lock()
+
+
+def load_or_export(model_path, model_bundle, digest):
+    # 변환본이 있으면 mmap 으로 열고, 없으면 번들에서 변환해 저장
+    folder = tree_cache_dir(model_path, digest)
+    with _lock:
+        if not os.path.exists(os.path.join(folder, 'meta.json')):
+            start = time.perf_counter()
+            ensemble = TreeEnsemble.from_bundle(model_bundle)
+            try:
+                os.makedirs(TREE_CACHE_DIR, exist_ok=True)
+                ensemble.save(folder)
+            except OSError:
+                return ensemble
+            print(f"🌲 트리 배열 변환: {folder} ({len(ensemble)}개 트리, {time.perf_counter() - start:.2f}s)")
+        return TreeEnsemble.load(folder)
+
+
+def benchmark(model_path, sizes=(1, 4, 100, 1000, 20000), seed=0):
+    # 라이브러리 predict 3개 vs 배열 평가기 (배치 크기별 ms, 최대 오차) + 로드 시간
+    import pickle
+    from model_registry import file_sha256
+
+    start = time.perf_counter()
+    with open(model_path, 'rb') as f:
+        bundle = pickle.load(f)
+    rows = [{'case': 'load', 'pickle_ms': round((time.perf_counter() - start) * 1000, 1)}]
+    folder = tree_cache_dir(model_path, file_sha256(model_path))
+    load_or_export(model_path, bundle, file_sha256(model_path))
+    start = time.perf_counter()
+    ensemble = TreeEnsemble.load(folder)
+    rows[0]['arrays_ms'] = round((time.perf_counter() - start) * 1000, 1)
+
+    rng = np.random.default_rng(seed)
+    for n in sizes:
+        X = rng.normal(size=(n, ensemble.n_features))
+        repeats = max(1, 2000 // n)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            expected = (bundle['rf'].predict(X) * 4 + bundle['lgb'].predict(X) * 2 + bundle['gb'].predict(X) * 2) / 10
+        library_ms = (time.perf_counter() - start) / repeats * 1000
+        start = time.perf_counter()
+        for _ in range(repeats):
+            got = ensemble.predict(X)
+        arrays_ms = (time.perf_counter() - start) / repeats * 1000
+        rows.append({
+            'case': f'predict_{n}',
+            'library_ms': round(library_ms, 2),
+            'arrays_ms': round(arrays_ms, 2),
+            'max_abs_diff': float(np.abs(expected - got).max()),
+        })
+    return rows
+
+
+if __name__ == '__main__':
+    import sys
+
+    for row in benchmark(sys.argv[1] if len(sys.argv) > 1 else 'models/ensemble_model.pkl'):
+        print(json.dumps(row, ensure_ascii=False))
@@ -0,0 +1,60 @@
+import importlib
+import os
+import threading
+import time
+
+# 앱 시작 직후 백그라운드 스레드에서 첫 요청이 기다리던 일을 미리 해 둠
+# (기본 도시 데이터/모델 번들, 지도 위치 데이터, 시나리오 예측 서비스, 페이지에서만 쓰는 무거운 모듈 import)
+# 환경변수 APP_WARMUP=1 일 때만 켬 (끄면 지금처럼 처음 쓰는 페이지에서 올림 - 메모리를 아끼는 쪽)
+# 단계 하나가 실패해도 나머지는 계속하고, 실패한 단계는 그 페이지의 첫 요청에서 원래대로 다시 시도됨
+PAGE_MODULES = ('folium', 'streamlit_folium', 'map_view', 'altair')
+
+_lock = threading.Lock()
+_done = threading.Event()
+_thread = None
+status = {'state': 'idle', 'steps': [], 'seconds': None}
+
+
+def enabled(variable='APP_WARMUP'):
+    return os.environ.get(variable, '0').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def import_step(name):
+    return (f"import {name}", lambda: importlib.import_module(name))
+
+
+def _run(steps):
+    start = time.perf_counter()
+    status['state'] = 'running'
+    for name, func in steps:
+        step_start = time.perf_counter()
+        try:
+            func()
+        except Exception as e:
+            status['steps'].append({'step': name, 'seconds': round(time.perf_counter() - step_start, 3),
+                                    'error': f"{type(e).__name__}: {e}"})
+            print(f"⚠️ 워밍업 실패: {name} ({e})")
+        else:
+            status['steps'].append({'step': name, 'seconds': round(time.perf_counter() - step_start, 3)})
+    status['seconds'] = round(time.perf_counter() - start, 3)
+    status['state'] = 'done'
+    print(f"🔥 워밍업 완료 ({status['seconds']:.2f}s)")
+    _done.set()
+
+
+def start(steps):
+    # steps: [(이름, 함수), ...] 순서대로 실행. 프로세스에서 한 번만 시작 (두 번째부터는 기존 스레드 반환)
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, args=(list(steps),), name='app-warmup', daemon=True)
+            _thread.start()
+        return _thread
+
+
+def wait(timeout=None):
+    # 워밍업이 끝날 때까지 기다린 뒤 상태 반환 (시작하지 않았으면 바로 None)
+    if _thread is None:
+        return None
+    _done.wait(timeout)
+    return dict(status)